@@ -5,9 +5,16 @@ App to quickly solve buffer titration and adjustment problems.
 """
 
 # Imports
+# import PySimpleGUIQt as sg  # Alternate backend
 import PySimpleGUI as sg  # Requires version 4.0 or greater
 
-# import PySimpleGUIQt as sg  # Alternate backend
+from buffer_core import (  # noqa: F401  (batch API re-exported for callers)
+    RECIPE_DTYPE,
+    STATUS_MESSAGES,
+    STATUS_OK,
+    buffer_solver_batch,
+    solve_recipe,
+)
 
 # Functions
 
@@ -106,81 +113,28 @@ def buffer_solver(
     Take in buffer adjustment parameters and return an adjustment recipe.
     """
 
-    # Sanitize input and catch unusable input
-    try:
-        buffer_conc_initial = float(_buffer_conc_initial)
-        buffer_conc_final = float(_buffer_conc_final)
-        buffer_pKa = float(_buffer_pKa)
-        total_volume = float(_total_volume)
-        HCl_stock_conc = float(_HCl_stock_conc)
-        NaOH_stock_conc = float(_NaOH_stock_conc)
-        initial_pH = float(_initial_pH)
-        final_pH = float(_final_pH)
-    except ValueError:
-        return "Invalid input values, try again"
-
-    # Remove common nonsense conditions
-    if not (0.0 < buffer_conc_initial <= 100.0):
-        return "Invalid initial buffer concentration"
-    if not (0.0 < buffer_conc_final <= 100.0):
-        return "Invalid final buffer concentration"
-    if not (0.0 < HCl_stock_conc <= 100.0):
-        return "Invalid HCl concentration"
-    if not (0.0 < NaOH_stock_conc <= 100.0):
-        return "Invalid NaOH concentration"
-    if buffer_conc_final > buffer_conc_initial:
-        return "Can't increase concentration through dilution"
-    if not (0.0 < buffer_pKa <= 100.0):
-        return "Invalid pKa value"
-    if not (0.0 < initial_pH <= 20.0):
-        return "Invalid initial pH"
-    if not (0.0 < final_pH <= 20.0):
-        return "Invalid final pH"
-
-    # Perform buffer math
-
-    # First find moles of buffer and volume of buffer:
-    buffer_volume = (buffer_conc_final * total_volume) / buffer_conc_initial
-    moles_of_buffer = buffer_volume * buffer_conc_initial
-
-    # Then, find initial conditions:
-    initial_ratio = 10 ** (initial_pH - buffer_pKa)
-    initial_HA = moles_of_buffer / (1.0 + initial_ratio)
-
-    # Then, final conditions:
-    final_ratio = 10 ** (final_pH - buffer_pKa)
-    final_HA = moles_of_buffer / (1.0 + final_ratio)
-
-    # Then, solve for delta-HA:
-    difference = final_HA - initial_HA
-    if difference == 0.0:  # Catch no-change situations
-        return "Invalid conditions"
-
-    # Set titrant
-    if difference < 0.0:
-        titrant = "NaOH"
-        difference = abs(difference)
-        volume_titrant = difference / NaOH_stock_conc
-    else:
-        titrant = "HCl"
-        volume_titrant = difference / HCl_stock_conc
-
-    # Solve for volume of water
-    volume_water = total_volume - (volume_titrant + buffer_volume)
-
-    # Catch invalid recipe conditions
-    if (volume_water <= 0.0) or (volume_titrant <= 0.0):
-        return "Invalid conditions"
+    recipe = solve_recipe(
+        _buffer_conc_initial,
+        _buffer_conc_final,
+        _buffer_pKa,
+        _total_volume,
+        _HCl_stock_conc,
+        _NaOH_stock_conc,
+        _initial_pH,
+        _final_pH,
+    )
+    if recipe.status != STATUS_OK:
+        return recipe.message
 
     # Return functional recipe
     return (
         "Buffer recipe:\nadd {0} liters stock buffer, \
             \n{1} liters of stock {2},\nand {3} liters of water"
     ).format(
-        round(buffer_volume, 4),
-        round(volume_titrant, 4),
-        titrant,
-        round(volume_water, 4),
+        round(recipe.buffer_volume, 4),
+        round(recipe.titrant_volume, 4),
+        recipe.titrant,
+        round(recipe.water_volume, 4),
     )
 
 
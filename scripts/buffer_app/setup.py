@@ -1,10 +1,10 @@
-"""Setup module for buffer_app.
-"""
+"""Setup module for buffer_app."""
 
 # Always prefer setuptools over distutils
-from setuptools import setup
 from pathlib import Path
 
+from setuptools import setup
+
 here = Path(__file__).parent.resolve()
 
 # Get the long description from the README file
@@ -13,7 +13,7 @@ long_description = (here / "README.md").read_text(encoding="utf-8")
 # Setup via pip
 setup(
     name="buffer_app",
-    version="1.0.0",
+    version="1.2.0",
     author="Andrew J. Bonham",
     author_email="abonham@msudenver.edu",
     description="A quick GUI to quickly calculate buffer dilution and adjustment.",
@@ -34,7 +34,7 @@ setup(
     ],
     keywords="chemistry, buffer, biochemistry",
     python_requires=">=3.6",
-    install_requires=["PySimpleGUI"],
+    install_requires=["PySimpleGUI", "buffer_core[batch]>=1.0.0"],
     entry_points={
         "gui_scripts": ["buffer_app = buffer_app:app_view"],
     },
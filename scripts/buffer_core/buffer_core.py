@@ -0,0 +1,445 @@
+"""
+Pure-compute core for buffer titration and adjustment recipes.
+
+Shared by the buffer_app GUI and the dash_buffers webapp. This module must stay
+free of GUI and web imports so batch workers can import it cheaply; numpy is only
+imported when the batch solver is called. javascript_solver gives the same solver
+as JavaScript source, for browsers.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Tuple, Union
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy
+    from numpy.typing import ArrayLike
+
+    NDArray = numpy.ndarray[Any, numpy.dtype[Any]]
+
+# Status codes for buffer recipes, in the order the checks are applied
+STATUS_OK = 0
+STATUS_INVALID_INPUT = 1
+STATUS_INVALID_INITIAL_BUFFER = 2
+STATUS_INVALID_FINAL_BUFFER = 3
+STATUS_INVALID_HCL = 4
+STATUS_INVALID_NAOH = 5
+STATUS_DILUTION_INCREASE = 6
+STATUS_INVALID_PKA = 7
+STATUS_INVALID_INITIAL_PH = 8
+STATUS_INVALID_FINAL_PH = 9
+STATUS_INVALID_CONDITIONS = 10
+
+STATUS_MESSAGES: Dict[int, str] = {
+    STATUS_OK: "Valid recipe",
+    STATUS_INVALID_INPUT: "Invalid input values, try again",
+    STATUS_INVALID_INITIAL_BUFFER: "Invalid initial buffer concentration",
+    STATUS_INVALID_FINAL_BUFFER: "Invalid final buffer concentration",
+    STATUS_INVALID_HCL: "Invalid HCl concentration",
+    STATUS_INVALID_NAOH: "Invalid NaOH concentration",
+    STATUS_DILUTION_INCREASE: "Can't increase concentration through dilution",
+    STATUS_INVALID_PKA: "Invalid pKa value",
+    STATUS_INVALID_INITIAL_PH: "Invalid initial pH",
+    STATUS_INVALID_FINAL_PH: "Invalid final pH",
+    STATUS_INVALID_CONDITIONS: "Invalid conditions",
+}
+
+# JavaScript port of solve_recipe; javascript_solver fills in the status codes
+# and messages. The checks and math mirror _parameter_checks and _titration_math
+# line for line, operation order included, so results match to the last bit
+# wherever Math.pow agrees with the C library pow.
+JAVASCRIPT_SOLVER = r"""(function () {
+    var STATUS = __STATUS__;
+    var MESSAGES = __MESSAGES__;
+
+    // Python float(): numbers pass through, strings must be Python float syntax
+    function toFloat(value) {
+        if (typeof value === "number") {
+            return value;
+        }
+        if (typeof value !== "string") {
+            return null;
+        }
+        var text = value.trim();
+        if (/^[+-]?(inf|infinity)$/i.test(text)) {
+            return text.charAt(0) === "-" ? -Infinity : Infinity;
+        }
+        if (/^[+-]?nan$/i.test(text)) {
+            return NaN;
+        }
+        if (!/^[+-]?(\d(_?\d)*(\.(\d(_?\d)*)?)?|\.\d(_?\d)*)([eE][+-]?\d(_?\d)*)?$/.test(text)) {
+            return null;
+        }
+        return Number(text.replace(/_/g, ""));
+    }
+
+    function recipe(status, bufferVolume, titrantVolume, titrant, waterVolume) {
+        return {
+            status: status,
+            message: MESSAGES[status],
+            buffer_volume: bufferVolume === undefined ? NaN : bufferVolume,
+            titrant_volume: titrantVolume === undefined ? NaN : titrantVolume,
+            titrant: titrant === undefined ? "" : titrant,
+            water_volume: waterVolume === undefined ? NaN : waterVolume
+        };
+    }
+
+    return function (
+        _buffer_conc_initial,
+        _buffer_conc_final,
+        _buffer_pKa,
+        _total_volume,
+        _HCl_stock_conc,
+        _NaOH_stock_conc,
+        _initial_pH,
+        _final_pH
+    ) {
+        // Sanitize input and catch unusable input
+        var values = Array.prototype.slice.call(arguments, 0, 8).map(toFloat);
+        if (values.length < 8 || values.indexOf(null) >= 0) {
+            return recipe(STATUS.INVALID_INPUT);
+        }
+        var buffer_conc_initial = values[0];
+        var buffer_conc_final = values[1];
+        var buffer_pKa = values[2];
+        var total_volume = values[3];
+        var HCl_stock_conc = values[4];
+        var NaOH_stock_conc = values[5];
+        var initial_pH = values[6];
+        var final_pH = values[7];
+
+        // Remove common nonsense conditions
+        var checks = [
+            [STATUS.INVALID_INITIAL_BUFFER,
+             0.0 < buffer_conc_initial && buffer_conc_initial <= 100.0],
+            [STATUS.INVALID_FINAL_BUFFER,
+             0.0 < buffer_conc_final && buffer_conc_final <= 100.0],
+            [STATUS.INVALID_HCL, 0.0 < HCl_stock_conc && HCl_stock_conc <= 100.0],
+            [STATUS.INVALID_NAOH, 0.0 < NaOH_stock_conc && NaOH_stock_conc <= 100.0],
+            [STATUS.DILUTION_INCREASE, buffer_conc_final <= buffer_conc_initial],
+            [STATUS.INVALID_PKA, 0.0 < buffer_pKa && buffer_pKa <= 100.0],
+            [STATUS.INVALID_INITIAL_PH, 0.0 < initial_pH && initial_pH <= 20.0],
+            [STATUS.INVALID_FINAL_PH, 0.0 < final_pH && final_pH <= 20.0]
+        ];
+        for (var i = 0; i < checks.length; i++) {
+            if (!checks[i][1]) {
+                return recipe(checks[i][0]);
+            }
+        }
+
+        // Perform buffer math
+        var buffer_volume = (buffer_conc_final * total_volume) / buffer_conc_initial;
+        var moles_of_buffer = buffer_volume * buffer_conc_initial;
+        var initial_HA = moles_of_buffer / (1.0 + Math.pow(10, initial_pH - buffer_pKa));
+        var final_HA = moles_of_buffer / (1.0 + Math.pow(10, final_pH - buffer_pKa));
+        var difference = final_HA - initial_HA;
+        if (difference === 0.0) {  // Catch no-change situations
+            return recipe(STATUS.INVALID_CONDITIONS);
+        }
+
+        // Set titrant
+        var titrant, volume_titrant;
+        if (difference < 0.0) {
+            titrant = "NaOH";
+            volume_titrant = Math.abs(difference) / NaOH_stock_conc;
+        } else {
+            titrant = "HCl";
+            volume_titrant = difference / HCl_stock_conc;
+        }
+
+        // Solve for volume of water
+        var volume_water = total_volume - (volume_titrant + buffer_volume);
+
+        // Catch invalid recipe conditions
+        if (volume_water <= 0.0 || volume_titrant <= 0.0) {
+            return recipe(STATUS.INVALID_CONDITIONS);
+        }
+
+        return recipe(STATUS.OK, buffer_volume, volume_titrant, titrant, volume_water);
+    };
+})()"""
+
+# Structured dtype (as accepted by numpy.dtype) returned by buffer_solver_batch
+RECIPE_DTYPE: List[Tuple[str, str]] = [
+    ("buffer_volume", "f8"),
+    ("titrant_volume", "f8"),
+    ("titrant", "U4"),
+    ("water_volume", "f8"),
+    ("status", "i1"),
+]
+
+
+class BufferRecipe(NamedTuple):
+    """A solved buffer recipe; volumes are NaN unless status is STATUS_OK."""
+
+    status: int
+    buffer_volume: float = float("nan")
+    titrant_volume: float = float("nan")
+    titrant: str = ""
+    water_volume: float = float("nan")
+
+    @property
+    def message(self) -> str:
+        """Human-readable description of the recipe status."""
+        return STATUS_MESSAGES[self.status]
+
+
+def _parameter_checks(
+    buffer_conc_initial: Any,
+    buffer_conc_final: Any,
+    buffer_pKa: Any,
+    HCl_stock_conc: Any,
+    NaOH_stock_conc: Any,
+    initial_pH: Any,
+    final_pH: Any,
+) -> List[Tuple[int, Any]]:
+    """
+    Return (status, is_valid) pairs for the common nonsense conditions.
+
+    Works on floats or numpy arrays alike, so the scalar and batch solvers
+    apply the same checks in the same order.
+    """
+    return [
+        (
+            STATUS_INVALID_INITIAL_BUFFER,
+            (0.0 < buffer_conc_initial) & (buffer_conc_initial <= 100.0),
+        ),
+        (
+            STATUS_INVALID_FINAL_BUFFER,
+            (0.0 < buffer_conc_final) & (buffer_conc_final <= 100.0),
+        ),
+        (STATUS_INVALID_HCL, (0.0 < HCl_stock_conc) & (HCl_stock_conc <= 100.0)),
+        (STATUS_INVALID_NAOH, (0.0 < NaOH_stock_conc) & (NaOH_stock_conc <= 100.0)),
+        (STATUS_DILUTION_INCREASE, buffer_conc_final <= buffer_conc_initial),
+        (STATUS_INVALID_PKA, (0.0 < buffer_pKa) & (buffer_pKa <= 100.0)),
+        (STATUS_INVALID_INITIAL_PH, (0.0 < initial_pH) & (initial_pH <= 20.0)),
+        (STATUS_INVALID_FINAL_PH, (0.0 < final_pH) & (final_pH <= 20.0)),
+    ]
+
+
+def _power10(exponent: Any) -> Any:
+    """
+    Return 10 ** exponent for a float or a numpy array.
+
+    Arrays are raised element by element with Python's float pow rather than
+    numpy's vectorized power, which can differ from it in the last bit, so the
+    batch solver gives exactly the recipes that solve_recipe does. Exponents
+    too large for a float (only possible on rows that fail the checks) give inf.
+    """
+    if isinstance(exponent, float):
+        return 10**exponent
+    import numpy
+
+    powers = numpy.fromiter(
+        (
+            10**value if value < 308.0 else float("inf")
+            for value in exponent.ravel().tolist()
+        ),
+        dtype=numpy.float64,
+        count=exponent.size,
+    )
+    return powers.reshape(exponent.shape)
+
+
+def _titration_math(
+    buffer_conc_initial: Any,
+    buffer_conc_final: Any,
+    buffer_pKa: Any,
+    total_volume: Any,
+    initial_pH: Any,
+    final_pH: Any,
+) -> Tuple[Any, Any]:
+    """
+    Return buffer volume and change in moles of HA (floats or numpy arrays).
+    """
+
+    # First find moles of buffer and volume of buffer:
+    buffer_volume = (buffer_conc_final * total_volume) / buffer_conc_initial
+    moles_of_buffer = buffer_volume * buffer_conc_initial
+
+    # Then, find initial conditions:
+    initial_ratio = _power10(initial_pH - buffer_pKa)
+    initial_HA = moles_of_buffer / (1.0 + initial_ratio)
+
+    # Then, final conditions:
+    final_ratio = _power10(final_pH - buffer_pKa)
+    final_HA = moles_of_buffer / (1.0 + final_ratio)
+
+    # Then, solve for delta-HA:
+    difference = final_HA - initial_HA
+
+    return buffer_volume, difference
+
+
+def solve_recipe(
+    _buffer_conc_initial: Union[str, float],
+    _buffer_conc_final: Union[str, float],
+    _buffer_pKa: Union[str, float],
+    _total_volume: Union[str, float],
+    _HCl_stock_conc: Union[str, float],
+    _NaOH_stock_conc: Union[str, float],
+    _initial_pH: Union[str, float],
+    _final_pH: Union[str, float],
+) -> BufferRecipe:
+    """
+    Take in buffer adjustment parameters and return a solved BufferRecipe.
+    """
+
+    # Sanitize input and catch unusable input
+    try:
+        buffer_conc_initial = float(_buffer_conc_initial)
+        buffer_conc_final = float(_buffer_conc_final)
+        buffer_pKa = float(_buffer_pKa)
+        total_volume = float(_total_volume)
+        HCl_stock_conc = float(_HCl_stock_conc)
+        NaOH_stock_conc = float(_NaOH_stock_conc)
+        initial_pH = float(_initial_pH)
+        final_pH = float(_final_pH)
+    except (TypeError, ValueError):
+        return BufferRecipe(STATUS_INVALID_INPUT)
+
+    # Remove common nonsense conditions
+    for status, is_valid in _parameter_checks(
+        buffer_conc_initial,
+        buffer_conc_final,
+        buffer_pKa,
+        HCl_stock_conc,
+        NaOH_stock_conc,
+        initial_pH,
+        final_pH,
+    ):
+        if not is_valid:
+            return BufferRecipe(status)
+
+    # Perform buffer math
+    buffer_volume, difference = _titration_math(
+        buffer_conc_initial,
+        buffer_conc_final,
+        buffer_pKa,
+        total_volume,
+        initial_pH,
+        final_pH,
+    )
+    if difference == 0.0:  # Catch no-change situations
+        return BufferRecipe(STATUS_INVALID_CONDITIONS)
+
+    # Set titrant
+    if difference < 0.0:
+        titrant = "NaOH"
+        difference = abs(difference)
+        volume_titrant = difference / NaOH_stock_conc
+    else:
+        titrant = "HCl"
+        volume_titrant = difference / HCl_stock_conc
+
+    # Solve for volume of water
+    volume_water = total_volume - (volume_titrant + buffer_volume)
+
+    # Catch invalid recipe conditions
+    if (volume_water <= 0.0) or (volume_titrant <= 0.0):
+        return BufferRecipe(STATUS_INVALID_CONDITIONS)
+
+    return BufferRecipe(STATUS_OK, buffer_volume, volume_titrant, titrant, volume_water)
+
+
+def buffer_solver_batch(
+    buffer_conc_initial: "ArrayLike",
+    buffer_conc_final: "ArrayLike",
+    buffer_pKa: "ArrayLike",
+    total_volume: "ArrayLike",
+    HCl_stock_conc: "ArrayLike",
+    NaOH_stock_conc: "ArrayLike",
+    initial_pH: "ArrayLike",
+    final_pH: "ArrayLike",
+) -> "NDArray":
+    """
+    Solve many buffer recipes at once from columnar arrays of parameters.
+
+    Inputs are broadcast against each other, so scalars may be mixed with
+    arrays. Returns a structured array of RECIPE_DTYPE with one row per recipe;
+    rows whose status is not STATUS_OK hold NaN volumes and an empty titrant,
+    and STATUS_MESSAGES maps each status to the scalar solver's error text.
+    """
+    import numpy
+
+    # Sanitize input; non-numeric values raise ValueError here
+    (
+        bci,
+        bcf,
+        pka,
+        volume,
+        hcl,
+        naoh,
+        ph_initial,
+        ph_final,
+    ) = numpy.broadcast_arrays(
+        *(
+            numpy.atleast_1d(numpy.asarray(column, dtype=numpy.float64))
+            for column in (
+                buffer_conc_initial,
+                buffer_conc_final,
+                buffer_pKa,
+                total_volume,
+                HCl_stock_conc,
+                NaOH_stock_conc,
+                initial_pH,
+                final_pH,
+            )
+        )
+    )
+
+    # Flag common nonsense conditions; the first failing check wins
+    status = numpy.full(bci.shape, STATUS_OK, dtype=numpy.int8)
+    for code, is_valid in _parameter_checks(
+        bci, bcf, pka, hcl, naoh, ph_initial, ph_final
+    ):
+        status[(status == STATUS_OK) & ~is_valid] = code
+
+    # Perform buffer math for every row, discarding invalid rows afterwards
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        buffer_volume, difference = _titration_math(
+            bci, bcf, pka, volume, ph_initial, ph_final
+        )
+        status[(status == STATUS_OK) & (difference == 0.0)] = STATUS_INVALID_CONDITIONS
+
+        # Set titrant
+        use_naoh = difference < 0.0
+        volume_titrant = numpy.where(
+            use_naoh, numpy.abs(difference) / naoh, difference / hcl
+        )
+
+        # Solve for volume of water
+        volume_water = volume - (volume_titrant + buffer_volume)
+
+    # Catch invalid recipe conditions
+    status[
+        (status == STATUS_OK) & ((volume_water <= 0.0) | (volume_titrant <= 0.0))
+    ] = STATUS_INVALID_CONDITIONS
+
+    valid = status == STATUS_OK
+    recipes: NDArray = numpy.empty(bci.shape, dtype=RECIPE_DTYPE)
+    recipes["buffer_volume"] = numpy.where(valid, buffer_volume, numpy.nan)
+    recipes["titrant_volume"] = numpy.where(valid, volume_titrant, numpy.nan)
+    recipes["titrant"] = numpy.where(valid, numpy.where(use_naoh, "NaOH", "HCl"), "")
+    recipes["water_volume"] = numpy.where(valid, volume_water, numpy.nan)
+    recipes["status"] = status
+
+    return recipes
+
+
+def javascript_solver() -> str:
+    """
+    Return solve_recipe as a JavaScript function expression, for browsers.
+
+    The function takes the same eight arguments (strings or numbers) and
+    returns an object with the status, message, buffer_volume, titrant_volume,
+    titrant and water_volume of the BufferRecipe that solve_recipe gives.
+    """
+    import json  # only needed here; kept out of the core's cold import
+
+    status = {
+        name[len("STATUS_") :]: value
+        for name, value in globals().items()
+        if name.startswith("STATUS_") and isinstance(value, int)
+    }
+    return JAVASCRIPT_SOLVER.replace("__STATUS__", json.dumps(status)).replace(
+        "__MESSAGES__", json.dumps(STATUS_MESSAGES)
+    )
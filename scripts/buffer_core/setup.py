@@ -0,0 +1,38 @@
+"""Setup module for buffer_core, the compute core of buffer_app and dash_buffers."""
+
+# Always prefer setuptools over distutils
+from pathlib import Path
+
+from setuptools import setup
+
+here = Path(__file__).parent.resolve()
+
+# Get the long description from the README file
+long_description = (here / "README.md").read_text(encoding="utf-8")
+
+# Setup via pip
+setup(
+    name="buffer_core",
+    version="1.0.0",
+    author="Andrew J. Bonham",
+    author_email="abonham@msudenver.edu",
+    description="Dependency-free buffer dilution and adjustment recipe math.",
+    license="GPLv3",
+    long_description=long_description,
+    long_description_content_type="text/markdown",
+    url="https://github.com/Paradoxdruid/pychemistry/tree/master/scripts/buffer_core",
+    py_modules=["buffer_core"],
+    classifiers=[
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3 :: Only",
+        "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
+        "Operating System :: OS Independent",
+    ],
+    keywords="chemistry, buffer, biochemistry",
+    python_requires=">=3.7",
+    install_requires=[],
+    extras_require={"batch": ["numpy"]},
+)
@@ -0,0 +1,45 @@
+"""Tests for buffer_core."""
+
+import numpy
+
+from buffer_core import STATUS_INVALID_PKA, STATUS_OK, buffer_solver_batch, solve_recipe
+
+
+def test_batch_matches_scalar_solver_exactly() -> None:
+    rng = numpy.random.default_rng(0)
+    n = 20000
+    columns = [
+        rng.uniform(0.01, 5.0, n),
+        rng.uniform(0.001, 2.0, n),
+        rng.uniform(2.0, 12.0, n),
+        rng.uniform(0.001, 20.0, n),
+        rng.uniform(0.1, 15.0, n),
+        rng.uniform(0.1, 15.0, n),
+        rng.uniform(1.0, 13.0, n),
+        rng.uniform(1.0, 13.0, n),
+    ]
+    recipes = buffer_solver_batch(*columns)
+
+    valid = 0
+    for row, batch in enumerate(recipes):
+        recipe = solve_recipe(*(float(column[row]) for column in columns))
+        assert batch["status"] == recipe.status
+        if recipe.status == STATUS_OK:
+            valid += 1
+            assert batch["buffer_volume"] == recipe.buffer_volume
+            assert batch["titrant_volume"] == recipe.titrant_volume
+            assert batch["titrant"] == recipe.titrant
+            assert batch["water_volume"] == recipe.water_volume
+    assert valid > n // 2
+
+
+def test_batch_flags_out_of_range_rows() -> None:
+    recipes = buffer_solver_batch(
+        1.0, 0.5, [-1e6, float("nan"), 7.0], 2.0, 6.0, 6.0, 8.0, 7.0
+    )
+    assert list(recipes["status"]) == [
+        STATUS_INVALID_PKA,
+        STATUS_INVALID_PKA,
+        STATUS_OK,
+    ]
+    assert numpy.isnan(recipes["buffer_volume"][:2]).all()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Check the clientside buffer solver against the server-side Buffer_Solver.
+
+Runs CLIENTSIDE_BUFFER_SOLVER under Node.js on random and edge-case inputs and
+reports any recipe text, visibility or color that differs from the Python path.
+
+Usage:
+    python check_clientside.py [random cases, default 20000]
+"""
+
+import json
+import random
+import subprocess
+import sys
+from typing import Any, List, Tuple
+
+from dash_buffers import CLIENTSIDE_BUFFER_SOLVER, Buffer_Solver
+
+EDGE_VALUES = ["", " 1.0 ", "1_000", "1__0", ".5", "1.", "0x10", "1e1", "inf"]
+EDGE_VALUES += ["-inf", "nan", "abc", "0", "-1", "100", "100.0001", "20", "1e-9"]
+
+
+def random_case(rng: random.Random) -> List[Any]:
+    """Return the arguments of one Buffer_Solver call."""
+    values: List[Any] = [
+        f"{rng.uniform(0.01, 5.0):.{rng.randint(0, 6)}f}",
+        f"{rng.uniform(0.001, 2.0):.{rng.randint(0, 6)}f}",
+        f"{rng.uniform(2.0, 12.0):.{rng.randint(0, 3)}f}",
+        f"{rng.uniform(0.001, 20.0):.{rng.randint(0, 4)}f}",
+        f"{rng.uniform(0.1, 15.0):.{rng.randint(0, 2)}f}",
+        f"{rng.uniform(0.1, 15.0):.{rng.randint(0, 2)}f}",
+        f"{rng.uniform(1.0, 13.0):.{rng.randint(0, 2)}f}",
+        f"{rng.uniform(1.0, 13.0):.{rng.randint(0, 2)}f}",
+    ]
+    if rng.random() < 0.05:
+        values[rng.randrange(8)] = rng.choice(EDGE_VALUES)
+    if rng.random() < 0.05:
+        values[rng.randrange(8)] = rng.uniform(0.0, 20.0)  # numeric input
+    if rng.random() < 0.01:
+        values[rng.randrange(8)] = None  # cleared input
+    return [rng.choice([0, 1, 7]), *values, rng.random() < 0.5]
+
+
+def run_clientside(cases: List[List[Any]]) -> List[Tuple[str, bool, str]]:
+    """Evaluate the clientside solver on every case under Node.js."""
+    script = (
+        f"const solver = {CLIENTSIDE_BUFFER_SOLVER};\n"
+        "const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));\n"
+        "process.stdout.write(JSON.stringify("
+        "cases.map((args) => solver.apply(null, args))));\n"
+    )
+    completed = subprocess.run(
+        ["node", "-e", script],
+        input=json.dumps(cases),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [tuple(result) for result in json.loads(completed.stdout)]
+
+
+def main() -> None:
+    n_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(0)
+    cases = [random_case(rng) for _ in range(n_cases)]
+
+    mismatches = 0
+    for args, clientside in zip(cases, run_clientside(cases)):
+        server = Buffer_Solver(*args)
+        if clientside != server:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"{args}\n  server:     {server}\n  clientside: {clientside}")
+    print(f"{n_cases} cases, {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
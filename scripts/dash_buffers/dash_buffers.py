@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import json
+import os
 from typing import Tuple
 
 import dash
@@ -6,6 +8,8 @@ import dash_bootstrap_components as dbc
 from dash import html
 from dash.dependencies import Input, Output, State
 
+from buffer_core import STATUS_OK, javascript_solver, solve_recipe
+
 # Set up dash server
 app = dash.Dash(
     __name__,
@@ -15,6 +19,14 @@ app = dash.Dash(
 app.title = "Buffer Adjustment Calculator"
 server = app.server  # Export server for use by Passenger framework
 
+# Recipes are solved in the browser unless DASH_BUFFERS_SERVER_SIDE is set
+SERVER_SIDE = os.environ.get("DASH_BUFFERS_SERVER_SIDE", "") not in ("", "0")
+
+RECIPE_TEXT = (
+    "Buffer recipe: add {0} liters stock buffer, "
+    "{1} liters of stock {2}, and {3} liters of water."
+)
+
 # Components for Layout
 init_buffer_input = html.Div(
     [
@@ -195,23 +207,25 @@ app.layout = dbc.Container(
 
 
 # Display recipe on submit, hide initially
-@app.callback(
+RECIPE_OUTPUTS = [
     Output(component_id="output-div", component_property="children"),
     Output(component_id="recipe", component_property="is_open"),
     Output(component_id="recipe", component_property="color"),
-    [Input("submit-button", "n_clicks")],
-    [
-        State("buff_init_conc", "value"),
-        State("buff_final_conc", "value"),
-        State("buff_pka", "value"),
-        State("final_volume", "value"),
-        State("hcl_conc", "value"),
-        State("naoh_conc", "value"),
-        State("init_ph", "value"),
-        State("final_ph", "value"),
-        State("recipe", "is_open"),
-    ],
-)  # type: ignore[misc]
+]
+RECIPE_INPUTS = [Input("submit-button", "n_clicks")]
+RECIPE_STATES = [
+    State("buff_init_conc", "value"),
+    State("buff_final_conc", "value"),
+    State("buff_pka", "value"),
+    State("final_volume", "value"),
+    State("hcl_conc", "value"),
+    State("naoh_conc", "value"),
+    State("init_ph", "value"),
+    State("final_ph", "value"),
+    State("recipe", "is_open"),
+]
+
+
 def Buffer_Solver(
     n_clicks: int,
     _buffer_conc_initial: str,
@@ -224,83 +238,114 @@ def Buffer_Solver(
     _final_pH: str,
     is_open: bool,
 ) -> Tuple[str, bool, str]:
-    # Sanitize input and catch unusable input
-    try:
-        buffer_conc_initial = float(_buffer_conc_initial)
-        buffer_conc_final = float(_buffer_conc_final)
-        buffer_pKa = float(_buffer_pKa)
-        total_volume = float(_total_volume)
-        HCl_stock_conc = float(_HCl_stock_conc)
-        NaOH_stock_conc = float(_NaOH_stock_conc)
-        initial_pH = float(_initial_pH)
-        final_pH = float(_final_pH)
-    except ValueError:
-        return "Invalid input values, try again", True, "warning"
-
-    # Remove common nonsense conditions
-    if not (0.0 < buffer_conc_initial <= 100.0):
-        return "Invalid initial buffer concentration", True, "warning"
-    if not (0.0 < buffer_conc_final <= 100.0):
-        return "Invalid final buffer concentration", True, "warning"
-    if not (0.0 < HCl_stock_conc <= 100.0):
-        return "Invalid HCl concentration", True, "warning"
-    if not (0.0 < NaOH_stock_conc <= 100.0):
-        return "Invalid NaOH concentration", True, "warning"
-    if buffer_conc_final > buffer_conc_initial:
-        return "Can't increase concentration through dilution", True, "warning"
-    if not (0.0 < buffer_pKa <= 100.0):
-        return "Invalid pKa value", True, "warning"
-    if not (0.0 < initial_pH <= 20.0):
-        return "Invalid initial pH", True, "warning"
-    if not (0.0 < final_pH <= 20.0):
-        return "Invalid final pH", True, "warning"
-
-    # First find moles of buffer and volume of buffer:
-    buffer_volume = (buffer_conc_final * total_volume) / buffer_conc_initial
-    moles_of_buffer = buffer_volume * buffer_conc_initial
-
-    # Then, find initial conditions:
-    initial_ratio = 10 ** (initial_pH - buffer_pKa)
-    initial_HA = moles_of_buffer / (1 + initial_ratio)
-
-    # Then, final conditions:
-    final_ratio = 10 ** (final_pH - buffer_pKa)
-    final_HA = moles_of_buffer / (1 + final_ratio)
-
-    # Then, solve for titrant:
-    difference = final_HA - initial_HA
-
-    # Set titrant
-    if difference < 0:
-        titrant = "NaOH"
-        difference = abs(difference)
-        volume_titrant = difference / NaOH_stock_conc
-    else:
-        titrant = "HCl"
-        volume_titrant = difference / HCl_stock_conc
-
-    # Solve for volume of water
-    volume_water = total_volume - (volume_titrant + buffer_volume)
+    recipe = solve_recipe(
+        _buffer_conc_initial,
+        _buffer_conc_final,
+        _buffer_pKa,
+        _total_volume,
+        _HCl_stock_conc,
+        _NaOH_stock_conc,
+        _initial_pH,
+        _final_pH,
+    )
+    if recipe.status != STATUS_OK:
+        return recipe.message, True, "warning"
 
     # Return functional recipe
     if n_clicks == 0:  # Initial non-clicked state
         return ("", False, "warning")
     else:
         return (
-            (
-                "Buffer recipe: add {0} liters stock buffer, "
-                "{1} liters of stock {2}, and {3} liters of water."
-            ).format(
-                round(buffer_volume, 4),
-                round(volume_titrant, 4),
-                titrant,
-                round(volume_water, 4),
+            RECIPE_TEXT.format(
+                round(recipe.buffer_volume, 4),
+                round(recipe.titrant_volume, 4),
+                recipe.titrant,
+                round(recipe.water_volume, 4),
             ),
             True,
             "success",
         )
 
 
+# Buffer_Solver in JavaScript: javascript_solver from buffer_core, with the
+# recipe text formatted as Python's round() and str() would
+CLIENTSIDE_BUFFER_SOLVER = """
+(function () {
+    var solve = %s;
+    var TEXT = %s;
+
+    // round(value, 4): half to even on the exact value, like Python
+    function round4(value) {
+        if (!isFinite(value) || Math.abs(value) >= 1e16) {
+            return value;
+        }
+        // toFixed(100) is exact for doubles this size; toFixed(4) rounds ties up
+        var exact = Math.abs(value).toFixed(100);
+        var point = exact.indexOf(".");
+        if (/\\.\\d{4}50*$/.test(exact) && exact.charAt(point + 4) %% 2 === 0) {
+            return Math.sign(value) * Number(exact.slice(0, point + 5));
+        }
+        return Number(value.toFixed(4));
+    }
+
+    // str(value) for a float, like Python
+    function floatText(value) {
+        if (isNaN(value)) {
+            return "nan";
+        }
+        if (!isFinite(value)) {
+            return value > 0 ? "inf" : "-inf";
+        }
+        if (value === 0) {
+            return Object.is(value, -0) ? "-0.0" : "0.0";
+        }
+        var magnitude = Math.abs(value);
+        if (magnitude >= 1e16 || magnitude < 1e-4) {
+            return value.toExponential().replace(/e([+-])(\\d)$/, "e$10$2");
+        }
+        return Number.isInteger(value) ? value + ".0" : String(value);
+    }
+
+    return function (n_clicks) {
+        var args = Array.prototype.slice.call(arguments, 1, 9);
+        var recipe = solve.apply(null, args);
+        if (recipe.status !== %d) {
+            return [recipe.message, true, "warning"];
+        }
+
+        // Return functional recipe
+        if (n_clicks === 0) {  // Initial non-clicked state
+            return ["", false, "warning"];
+        }
+        var fields = [
+            floatText(round4(recipe.buffer_volume)),
+            floatText(round4(recipe.titrant_volume)),
+            recipe.titrant,
+            floatText(round4(recipe.water_volume))
+        ];
+        return [
+            TEXT.replace(/\\{(\\d)\\}/g, function (match, index) {
+                return fields[index];
+            }),
+            true,
+            "success"
+        ];
+    };
+})()
+""" % (
+    javascript_solver(),
+    json.dumps(RECIPE_TEXT),
+    STATUS_OK,
+)
+
+if SERVER_SIDE:
+    app.callback(RECIPE_OUTPUTS, RECIPE_INPUTS, RECIPE_STATES)(Buffer_Solver)
+else:
+    app.clientside_callback(  # type: ignore[no-untyped-call]
+        CLIENTSIDE_BUFFER_SOLVER, RECIPE_OUTPUTS, RECIPE_INPUTS, RECIPE_STATES
+    )
+
+
 # Main magic
 if __name__ == "__main__":
     app.run_server(debug=True)
@@ -0,0 +1,7 @@
+"""Let the tests import fit_core from its source directory when not installed."""
+
+import sys
+from pathlib import Path
+
+# Prepended, so the tests run against this checkout's fit_core
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "fit_core"))
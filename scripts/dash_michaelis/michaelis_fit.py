@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+"""
+Headless Michaelis-Menten fitting, shared by the dash_michaelis app.
+
+Only numpy is imported up front, so screening jobs can fit thousands of curves
+at once without loading Dash or Plotly; scipy and pandas are imported when the
+single-curve fit or the table reader first need them.
+
+Usage:
+    python michaelis_fit.py <data.csv | data.parquet> ... [-o results.csv]
+"""
+
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
+
+import numpy
+
+import fit_core
+from fit_core import (
+    FTOL,
+    MAX_ITERATIONS,
+    WEIGHTING,
+    XTOL,
+    BatchFit,
+    CurveModel,
+    FitCache,
+    FitResult,
+    FitStatistics,
+    fit_statistics,
+    fit_tables_main,
+    point_weights,
+    summarize_replicates,
+    table_curves,
+    weight_sigma,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+    from numpy.typing import ArrayLike
+
+    # Subscripting ndarray at runtime needs numpy 1.22 and Python 3.9
+    NDArray = numpy.ndarray[Any, numpy.dtype[numpy.float64]]
+
+# Columns of the table written by fit_table, after the curve name
+RESULT_COLUMNS = [
+    "vmax",
+    "vmax_err",
+    "km",
+    "km_err",
+    "r_squared",
+    "adjusted_r_squared",
+    "rmse",
+    "aic",
+    "bic",
+    "converged",
+]
+
+
+def equation(x: "NDArray", vmax: Any, km: Any) -> "NDArray":
+    """Michaelis-Menten equation for testing and plotting.
+
+    Args:
+        x (numpy.ndarray): x values
+        vmax (float): guess or value for Vmax, or an array broadcasting with x
+        km (float): guess or value for Km, or an array broadcasting with x
+
+    Returns:
+        numpy.ndarray: return predicted y values
+    """
+    y: "NDArray" = (vmax * x) / (km + x)
+    return y
+
+
+def jacobian(x: "NDArray", vmax: Any, km: Any) -> "NDArray":
+    """Analytic derivatives of the Michaelis-Menten equation.
+
+    Args:
+        x (numpy.ndarray): x values
+        vmax (float): value for Vmax, or an array broadcasting with x
+        km (float): value for Km, or an array broadcasting with x
+
+    Returns:
+        numpy.ndarray: d/dVmax and d/dKm at each x, stacked on the last axis
+    """
+    d_vmax = x / (km + x)
+    d_km = -vmax * d_vmax / (km + x)
+    derivatives: "NDArray" = numpy.stack(numpy.broadcast_arrays(d_vmax, d_km), axis=-1)
+    return derivatives
+
+
+def initial_guess(
+    x: "ArrayLike", y: "ArrayLike", y_std: Optional["ArrayLike"] = None
+) -> "NDArray":
+    """Estimate (Vmax, Km) for one curve from an Eadie-Hofstee regression.
+
+    Args:
+        x (ArrayLike): x values
+        y (ArrayLike): average y values
+        y_std (ArrayLike, optional): y std dev values, used as weights
+
+    Returns:
+        numpy.ndarray: initial (Vmax, Km)
+    """
+    y_values = numpy.atleast_2d(numpy.asarray(y, dtype=numpy.float64))
+    x_values = numpy.broadcast_to(numpy.asarray(x, dtype=numpy.float64), y_values.shape)
+    weights = point_weights(x_values, y_values, y_std)
+    guess: "NDArray" = initial_guesses(
+        numpy.where(weights > 0, x_values, 0.0),
+        numpy.where(weights > 0, y_values, 0.0),
+        weights,
+    )[0]
+    return guess
+
+
+def initial_guesses(x: "NDArray", y: "NDArray", weights: "NDArray") -> "NDArray":
+    """Estimate (Vmax, Km) for each curve from an Eadie-Hofstee regression.
+
+    Fits y = Vmax - Km * (y / x) by weighted linear least squares over the
+    points with x > 0. Curves where that gives a non-physical answer (usually
+    data far from saturation) fall back to Km = max(x) and the least squares
+    Vmax for that Km.
+
+    Args:
+        x (numpy.ndarray): x values, shape (n, m)
+        y (numpy.ndarray): y values, shape (n, m)
+        weights (numpy.ndarray): point weights, zero for missing points
+
+    Returns:
+        numpy.ndarray: initial (Vmax, Km) per curve, shape (n, 2)
+    """
+    usable = (x > 0) & (weights > 0)
+    w = numpy.where(usable, weights, 0.0)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        u = numpy.where(usable, y / numpy.where(usable, x, 1.0), 0.0)
+        y0 = numpy.where(usable, y, 0.0)
+
+        # Weighted linear regression of y on u, one curve per row
+        sw = w.sum(axis=1)
+        mean_u = (w * u).sum(axis=1) / sw
+        mean_y = (w * y0).sum(axis=1) / sw
+        du = u - mean_u[:, None]
+        slope = (w * du * (y0 - mean_y[:, None])).sum(axis=1) / (w * du**2).sum(axis=1)
+        vmax = mean_y - slope * mean_u
+        km = -slope
+
+        # Fallback for curves far from saturation: Km at the top of the x range,
+        # with the Vmax that best fits the data for that Km
+        fallback_km = numpy.where(usable, x, 0.0).max(axis=1)
+        shape = numpy.where(usable, x / (fallback_km[:, None] + x), 0.0)
+        fallback_vmax = (w * shape * y0).sum(axis=1) / (w * shape**2).sum(axis=1)
+
+    bad = ~(numpy.isfinite(vmax) & numpy.isfinite(km) & (vmax > 0) & (km > 0))
+    guesses = numpy.stack(
+        [numpy.where(bad, fallback_vmax, vmax), numpy.where(bad, fallback_km, km)],
+        axis=1,
+    )
+    finite: "NDArray" = numpy.nan_to_num(guesses, nan=1.0, posinf=1.0, neginf=1.0)
+    return finite
+
+
+# The model as the shared fitting code in fit_core takes it
+MODEL = CurveModel(equation, jacobian, initial_guess)
+
+
+def _weighted_sse(
+    x: "NDArray", y: "NDArray", weights: "NDArray", variables: "NDArray"
+) -> Tuple["NDArray", "NDArray"]:
+    """Return residuals and weighted sum of squared residuals per curve."""
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        residuals = y - equation(x, variables[:, :1], variables[:, 1:])
+        sse = numpy.where(weights > 0, weights * residuals**2, 0.0).sum(axis=1)
+    return residuals, numpy.where(numpy.isfinite(sse), sse, numpy.inf)
+
+
+def _normal_equations(
+    x: "NDArray", weights: "NDArray", variables: "NDArray", residuals: "NDArray"
+) -> Tuple["NDArray", "NDArray", "NDArray", "NDArray", "NDArray"]:
+    """Return J'WJ entries (a11, a12, a22) and J'Wr entries (g1, g2) per curve.
+
+    Uses the analytic Jacobian d/dVmax = x / (Km + x) and
+    d/dKm = -Vmax x / (Km + x)**2.
+    """
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        derivatives = jacobian(x, variables[:, :1], variables[:, 1:])
+        d_vmax, d_km = derivatives[..., 0], derivatives[..., 1]
+        w = weights
+        r = numpy.where(weights > 0, residuals, 0.0)
+        d_vmax = numpy.where(weights > 0, d_vmax, 0.0)
+        d_km = numpy.where(weights > 0, d_km, 0.0)
+        return (
+            (w * d_vmax**2).sum(axis=1),
+            (w * d_vmax * d_km).sum(axis=1),
+            (w * d_km**2).sum(axis=1),
+            (w * d_vmax * r).sum(axis=1),
+            (w * d_km * r).sum(axis=1),
+        )
+
+
+def fit_batch(
+    x: "ArrayLike",
+    y: "ArrayLike",
+    sigma: Optional["ArrayLike"] = None,
+    weighting: str = WEIGHTING,
+    max_iterations: int = MAX_ITERATIONS,
+) -> BatchFit:
+    """Fit the Michaelis-Menten equation to many curves at once.
+
+    Runs Levenberg-Marquardt on every curve together, with each step a closed
+    form 2x2 solve, starting from an Eadie-Hofstee estimate. Results agree
+    with scipy.optimize.curve_fit (and so with fit_data) to within its
+    tolerances: errors are sqrt(diag(cov)) with the covariance scaled by the
+    reduced chi squared, as curve_fit does when absolute_sigma is False.
+
+    Args:
+        x (ArrayLike): x values, shape (m,) shared by all curves or (n, m)
+        y (ArrayLike): y values, shape (n, m); NaN marks a missing point
+        sigma (ArrayLike, optional): y std dev values, broadcastable to y;
+            None fits unweighted
+        weighting (str): policy for points without spread, see weight_sigma
+        max_iterations (int): iteration limit for every curve
+
+    Returns:
+        BatchFit: variables, errors, r squared and convergence per curve;
+        curves with fewer points than variables are not fit, and come back
+        with NaN variables, errors and statistics and converged False
+    """
+    y_values: "NDArray" = numpy.atleast_2d(numpy.asarray(y, dtype=numpy.float64))
+    x_values: "NDArray" = numpy.broadcast_to(
+        numpy.asarray(x, dtype=numpy.float64), y_values.shape
+    )
+    if sigma is not None:
+        sigma = weight_sigma(numpy.broadcast_to(sigma, y_values.shape), weighting)
+    weights = point_weights(x_values, y_values, sigma)
+    y_values = numpy.where(weights > 0, y_values, 0.0)
+    x_values = numpy.where(weights > 0, x_values, 0.0)
+    n_points = (weights > 0).sum(axis=1)
+    fittable = n_points >= 2
+
+    variables = initial_guesses(x_values, y_values, weights)
+    residuals, sse = _weighted_sse(x_values, y_values, weights, variables)
+    damping = numpy.full(len(y_values), 1e-3)
+    active = fittable & numpy.isfinite(sse)
+    converged = numpy.zeros(len(y_values), dtype=bool)
+
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        a11, a12, a22, g1, g2 = _normal_equations(
+            x_values, weights, variables, residuals
+        )
+
+        # Marquardt-scaled damped 2x2 solve for every curve
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            d11 = a11 * (1 + damping)
+            d22 = a22 * (1 + damping)
+            det = d11 * d22 - a12**2
+            step = numpy.stack(
+                [(d22 * g1 - a12 * g2) / det, (d11 * g2 - a12 * g1) / det], axis=1
+            )
+        step[~active | ~numpy.isfinite(step).all(axis=1)] = 0.0
+
+        trial = variables + step
+        trial_residuals, trial_sse = _weighted_sse(x_values, y_values, weights, trial)
+        accept = active & (trial_sse <= sse)
+
+        # Converged when an accepted step barely changes the fit or the values
+        small_f = (sse - trial_sse) <= FTOL * trial_sse
+        small_x = (numpy.abs(step) <= XTOL * (numpy.abs(trial) + XTOL)).all(axis=1)
+        done = accept & (small_f | small_x) | active & (sse == 0)
+
+        variables[accept] = trial[accept]
+        residuals[accept] = trial_residuals[accept]
+        sse[accept] = trial_sse[accept]
+        damping = numpy.where(accept, damping / 10, damping * 10)
+
+        # A curve whose damping has run away cannot improve any further
+        stuck = active & ~accept & (damping > 1e16)
+        converged |= done
+        active &= ~(done | stuck)
+
+    # Covariance: inverse of J'WJ at the solution, scaled by reduced chi squared
+    a11, a12, a22, _, _ = _normal_equations(x_values, weights, variables, residuals)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        det = a11 * a22 - a12**2
+        scale = sse / (n_points - 2)
+        var_errors = numpy.sqrt(
+            numpy.stack([a22 / det, a11 / det], axis=1) * scale[:, None]
+        )
+    var_errors[(n_points <= 2) | ~numpy.isfinite(var_errors).all(axis=1)] = numpy.inf
+
+    # Statistics of the unweighted residuals, as find_r_squared reports them
+    statistics = fit_statistics(y_values, residuals, 2, weights > 0)
+
+    # Curves too short to fit keep no guessed values
+    variables[~fittable] = numpy.nan
+    var_errors[~fittable] = numpy.nan
+    return BatchFit(
+        variables,
+        var_errors,
+        numpy.where(fittable, statistics.r_squared, numpy.nan),
+        converged,
+        numpy.where(fittable[:, None], statistics.residuals, numpy.nan),
+        numpy.where(fittable, statistics.sse, numpy.nan),
+        numpy.where(fittable, statistics.adjusted_r_squared, numpy.nan),
+        numpy.where(fittable, statistics.rmse, numpy.nan),
+        numpy.where(fittable, statistics.aic, numpy.nan),
+        numpy.where(fittable, statistics.bic, numpy.nan),
+    )
+
+
+def fit_data(
+    x: "NDArray", y: "NDArray", y_std: List[float], weighting: str = WEIGHTING
+) -> Tuple["NDArray", "NDArray", FitStatistics]:
+    """Perform curve fitting against the average data, see fit_core.fit_data.
+
+    Starts from an Eadie-Hofstee estimate and gives the optimizer the analytic
+    Jacobian of the Michaelis-Menten equation.
+
+    Args:
+        x (List[float]): x values
+        y (numpy.ndarray): average y values
+        y_std (List[float]): y std dev values
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray, FitStatistics]: fitting variables,
+        associated errors and fit statistics, taken from the optimizer's final
+        residuals
+    """
+    return fit_core.fit_data(MODEL, x, y, y_std, weighting)
+
+
+def find_r_squared(x: "NDArray", y: "NDArray", variables: "NDArray") -> float:
+    """Find r squared value of fit, see fit_core.find_r_squared.
+
+    Args:
+        x (numpy.ndarray): x values
+        y (numpy.ndarray): average y values
+        variables (numpy.ndarray): fitting variables
+
+    Returns:
+        float: r squared value
+    """
+    return fit_core.find_r_squared(MODEL, x, y, variables)
+
+
+def fit_replicates(
+    x: "NDArray",
+    ys: "pandas.DataFrame",
+    cache: Optional[FitCache] = None,
+    weighting: str = WEIGHTING,
+) -> FitResult:
+    """Clean up and fit the app's table data, see fit_core.fit_replicates.
+
+    Args:
+        x (numpy.ndarray): x values
+        ys (pandas.DataFrame): user-entered y-value columns
+        cache (FitCache, optional): cache of earlier fits
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        FitResult: average y, std dev of y, fitting variables, errors and
+        statistics
+    """
+    return fit_core.fit_replicates(MODEL, x, ys, cache, weighting)
+
+
+def fit_table(
+    table: "pandas.DataFrame",
+    x_column: str = "X",
+    group: Optional[str] = None,
+    weighting: str = WEIGHTING,
+) -> "pandas.DataFrame":
+    """Fit every curve in a data table and return one row of results per curve.
+
+    Args:
+        table (pandas.DataFrame): data table, laid out as for table_curves
+        x_column (str): name of the x column
+        group (str, optional): name of the column naming each curve
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        pandas.DataFrame: curve name followed by RESULT_COLUMNS
+    """
+    import pandas
+
+    names, x, y = table_curves(table, x_column, group)
+    mean, std = summarize_replicates(y)
+    fits = fit_batch(x, mean, std, weighting)
+    return pandas.DataFrame(
+        {
+            "curve": names,
+            "vmax": fits.variables[:, 0],
+            "vmax_err": fits.var_errors[:, 0],
+            "km": fits.variables[:, 1],
+            "km_err": fits.var_errors[:, 1],
+            "r_squared": fits.r_squared,
+            "adjusted_r_squared": fits.adjusted_r_squared,
+            "rmse": fits.rmse,
+            "aic": fits.aic,
+            "bic": fits.bic,
+            "converged": fits.converged,
+        }
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Fit Michaelis-Menten curves in data tables and write a results table."""
+    fit_tables_main(
+        fit_table,
+        "michaelis-fit",
+        "Fit Michaelis-Menten kinetics to CSV / Parquet data tables.",
+        argv,
+    )
+
+
+if __name__ == "__main__":
+    main()
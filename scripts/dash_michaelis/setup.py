@@ -0,0 +1,40 @@
+"""Setup module for michaelis-fit, the headless fitting core of dash_michaelis."""
+
+# Always prefer setuptools over distutils
+from pathlib import Path
+
+from setuptools import setup
+
+here = Path(__file__).parent.resolve()
+
+# Get the long description from the README file
+long_description = (here / "README.md").read_text(encoding="utf-8")
+
+# Setup via pip; the Dash app itself is not installed
+setup(
+    name="michaelis-fit",
+    version="1.2.0",
+    author="Andrew J. Bonham",
+    author_email="abonham@msudenver.edu",
+    description="Headless Michaelis-Menten kinetics fitting for tables of curves",
+    license="GPLv3",
+    long_description=long_description,
+    long_description_content_type="text/markdown",
+    url="https://github.com/Paradoxdruid/pychemistry/tree/master/scripts/dash_michaelis",
+    py_modules=["michaelis_fit"],
+    classifiers=[
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3 :: Only",
+        "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
+        "Operating System :: OS Independent",
+    ],
+    keywords="chemistry, biochemistry, curve fitting",
+    python_requires=">=3.8",
+    install_requires=["numpy", "scipy", "pandas", "fit_core>=1.0.0"],
+    extras_require={"parquet": ["fit_core[parquet]>=1.0.0"]},
+    entry_points={
+        "console_scripts": ["michaelis-fit = michaelis_fit:main"],
+    },
+)
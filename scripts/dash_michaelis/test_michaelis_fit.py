@@ -0,0 +1,34 @@
+"""Tests for michaelis_fit."""
+
+import numpy
+from michaelis_fit import equation, fit_batch
+
+
+def test_fit_batch_recovers_parameters() -> None:
+    x = numpy.array([0.5, 1.0, 2.0, 4.0, 8.0, 16.0])
+    y = numpy.stack([equation(x, 10.0, 2.0), equation(x, 5.0, 0.5)])
+
+    fits = fit_batch(x, y)
+
+    assert fits.converged.all()
+    numpy.testing.assert_allclose(fits.variables, [[10.0, 2.0], [5.0, 0.5]])
+
+
+def test_fit_batch_skips_curves_without_enough_points() -> None:
+    x = numpy.array([1.0, 2.0, 4.0, 8.0])
+    nan = numpy.nan
+    y = numpy.array(
+        [
+            [2.0, 3.0, 4.0, 4.5],
+            [nan, nan, nan, nan],  # empty well
+            [nan, nan, 3.0, nan],  # one point, two parameters
+        ]
+    )
+
+    fits = fit_batch(x, y, sigma=numpy.ones_like(y))
+
+    assert list(fits.converged) == [True, False, False]
+    assert numpy.isfinite(fits.variables[0]).all()
+    assert numpy.isnan(fits.variables[1:]).all()
+    assert numpy.isnan(fits.var_errors[1:]).all()
+    assert numpy.isnan(fits.r_squared[1:]).all()
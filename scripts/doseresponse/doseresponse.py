@@ -4,7 +4,10 @@
 Dash web app for fitting dose-response data to Langmuir isotherm.
 """
 
-from typing import Any, Dict, List, Tuple, Union
+import os
+import tempfile
+import warnings
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import dash
 import dash_bootstrap_components as dbc
@@ -13,7 +16,18 @@ import pandas
 import plotly.graph_objs as go
 from dash import dash_table, dcc, html
 from dash.dependencies import Input, Output, State
-from scipy.optimize import curve_fit
+from dash.exceptions import PreventUpdate
+from doseresponse_fit import equation, fit_replicates
+
+from fit_core import (
+    PAGE_SIZE,
+    ROW_ID,
+    DatasetStore,
+    FitCache,
+    format_statistic,
+    read_upload,
+    stored_values,
+)
 
 NDArray = numpy.ndarray[Any, numpy.dtype[numpy.float64]]
 
@@ -37,6 +51,30 @@ app: dash.Dash = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
 
 server: Any = app.server  # server initialization for passenger wsgi
 
+# Fits of recently seen data; set FIT_CACHE_DIR to share them between workers
+fit_cache: FitCache = FitCache(directory=os.environ.get("FIT_CACHE_DIR"))
+
+# Session tables by content hash, kept as files that every worker can read
+DATASET_DIR: str = os.environ.get("DATASET_DIR", "")
+if not DATASET_DIR:
+    DATASET_DIR = os.path.join(tempfile.gettempdir(), "pychemistry-datasets")
+    warnings.warn(
+        f"DATASET_DIR is not set; session tables are kept in {DATASET_DIR}, "
+        "which only workers on this machine share"
+    )
+datasets: DatasetStore = DatasetStore(DATASET_DIR)
+
+# New sessions start from the example data, which load_table serves from
+# memory; it is only stored once edited
+INITIAL_TABLE: pandas.DataFrame = pandas.DataFrame(INITIAL_DATA)
+INITIAL_DATASET: str = DatasetStore.key(INITIAL_TABLE)
+
+# Shown instead of the table once a session's table has expired
+EXPIRED: str = (
+    "This table is no longer on the server; upload it again, "
+    "or open the app in a new tab to start from the example data"
+)
+
 # Layout Widgets
 xaxis_label: html.Div = html.Div(
     [
@@ -54,6 +92,21 @@ yaxis_label: html.Div = html.Div(
 
 input_form: dbc.Col = dbc.Col([dbc.Form(children=(xaxis_label, yaxis_label))])
 
+upload_input: dbc.Col = dbc.Col(
+    [
+        dcc.Upload(
+            dbc.Button("Upload CSV / Excel", className="mb-1"),
+            id="upload-data",
+            accept=".csv,.txt,.xlsx,.xls",
+            multiple=False,
+            className="d-inline-block",
+        ),
+        html.Small(id="upload-status", className="ml-2 text-muted"),
+        # key of the session's table, kept for the life of the browser tab
+        dcc.Store(id="dataset-id", storage_type="session", data=INITIAL_DATASET),
+    ]
+)
+
 row_button: dbc.Col = dbc.Col(
     [
         dbc.Button(
@@ -68,9 +121,12 @@ row_button: dbc.Col = dbc.Col(
 entry_table: dash_table.DataTable = dash_table.DataTable(
     id="adding-rows-table",
     columns=INITIAL_COLUMNS,
-    data=INITIAL_DATA,
+    data=[],  # filled with a page of the session's table on load
     editable=True,
     row_deletable=True,
+    page_action="custom",  # tables are paged from the server
+    page_current=0,
+    page_size=PAGE_SIZE,
     style_table={
         "padding-top": "5px",
         "padding-bottom": "5px",
@@ -109,7 +165,10 @@ card_header: dbc.CardHeader = dbc.CardHeader(
 graph_output: dbc.Col = dbc.Col(
     [
         dbc.Card(
-            [dcc.Graph(id="adding-rows-graph", config={"displayModeBar": True})],
+            [
+                dcc.Graph(id="adding-rows-graph", config={"displayModeBar": True}),
+                dcc.Store(id="fit-store"),  # latest fit, read by update_graph
+            ],
             className="mt-3 border-primary p-1",
         ),
     ]
@@ -127,7 +186,7 @@ app.layout = dbc.Container(
                                 dbc.CardBody(
                                     [
                                         dbc.Row([input_form]),
-                                        dbc.Row([row_button]),
+                                        dbc.Row([upload_input, row_button]),
                                         dbc.Row([table_input]),
                                         dbc.Row([graph_output]),
                                     ],
@@ -152,92 +211,6 @@ app.layout = dbc.Container(
 
 
 # Functions
-def clean_up_y_data(ys: pandas.DataFrame) -> Tuple[pandas.Series, List[float]]:
-    """Take user entered Y values and return average and std dev for plotting.
-
-    Args:
-        ys (pandas.DataFrame): user-entered y-value columns
-
-    Returns:
-        Tuple[numpy.ndarray, List[float]]: average Y and std dev of Y values
-    """
-    ys = ys.replace("", 0)
-    ys = ys.fillna(0)
-    ys = ys.astype(float).values
-    y = ys.mean(axis=1)
-    y_std = ys.std(axis=1)
-    # y_std = [value if value > 0 else 0.00000001 for value in y_std]
-    y_std = [value or 0.00000001 for value in y_std]
-    # fitting fails with zero std values; this is a kludge
-
-    return (y, y_std)
-
-
-def equation(
-    x: NDArray,
-    bottom: float,
-    top: float,
-    kd: float,
-) -> NDArray:
-    """Dose-response equation for testing and plotting.
-
-    Args:
-        x (numpy.ndarray): x values
-        bottom (float): guess or value for Bottom
-        top (float): guess or value for Top
-        kd (float): guess or value for Kd
-
-    Returns:
-        numpy.ndarray: return predicted y values
-    """
-    return bottom + x * (top - bottom) / (kd + x)
-
-
-def fit_data(
-    x: NDArray,
-    y: NDArray,
-    y_std: List[float],
-) -> Tuple[NDArray, NDArray]:
-    """Perform curve fitting against the average data.
-
-    Args:
-        x (numpy.ndarray): x values
-        y (numpy.ndarray): average y values
-        y_std (List[float]): y std dev values
-
-    Returns:
-        Tuple[numpy.ndarray, numpy.ndarray]: fitting variables and associated errors
-    """
-    variable_guesses = [numpy.min(y), numpy.max(y), numpy.mean(x)]
-    variables, cov = curve_fit(equation, x, y, p0=variable_guesses, sigma=y_std)
-    var_errors: NDArray = numpy.sqrt(numpy.diag(cov))
-
-    return (variables, var_errors)
-
-
-def find_r_squared(
-    x: NDArray,
-    y: NDArray,
-    variables: NDArray,
-) -> float:
-    """Find r squared value of fit
-
-    Args:
-        x (numpy.ndarray): x values
-        y (numpy.ndarray): average y values
-        variables (numpy.ndarray): fitting variables
-
-    Returns:
-        float: r squared value
-    """
-    residuals: NDArray = y - equation(x, *variables)
-    ss_res: float = numpy.sum(residuals**2)
-    ss_tot: float = numpy.sum((y - numpy.mean(y)) ** 2)
-    r_squared: float = 1 - (ss_res / ss_tot)
-
-    return r_squared
-
-
 def generate_plot1(x: NDArray, y: NDArray, y_std: List[float]) -> go.Scatter:
     """Generate plot of actual average data.
 
@@ -275,7 +248,7 @@ def generate_plot2(x_range: NDArray, variables: NDArray) -> go.Scatter:
 
 
 def generate_graph_layout(
-    r_squared: float,
+    r_squared: Optional[float],
     variables: NDArray,
     var_errors: NDArray,
     x_title: str,
@@ -284,7 +257,7 @@ def generate_graph_layout(
     """Return formatted layout and annotations for final display.
 
     Args:
-        r_squared (float): r squared value
+        r_squared (float, optional): r squared value, None if undefined
         variables (numpy.ndarray): fitting variables
         var_errors (numpy.ndarray): fitting variable errors
         x_title (str): x axis title
@@ -303,7 +276,7 @@ def generate_graph_layout(
                 y=0.5,
                 xref="paper",
                 yref="paper",
-                text=f"R squared = {r_squared:0.3g}",
+                text=f"R squared = {format_statistic(r_squared, '0.3g')}",
                 showarrow=False,
             ),
             dict(
@@ -311,7 +284,10 @@ def generate_graph_layout(
                 y=0.44,
                 xref="paper",
                 yref="paper",
-                text=f"Kd = {variables[2]:0.3g} \u00B1 {var_errors[2]:0.3g}",
+                text="Kd = {0} \u00B1 {1}".format(
+                    format_statistic(variables[2], "0.3g"),
+                    format_statistic(var_errors[2], "0.3g"),
+                ),
                 showarrow=False,
             ),
         ],
@@ -335,100 +311,281 @@ def generate_graph_layout(
     )
 
 
+def load_table(dataset_id: Optional[str]) -> Optional[pandas.DataFrame]:
+    """Look up a session's table in the dataset store.
+
+    Args:
+        dataset_id (str, optional): key of the session's table
+
+    Returns:
+        pandas.DataFrame, optional: the table, or None if it has expired
+    """
+    if dataset_id is None or dataset_id == INITIAL_DATASET:
+        return INITIAL_TABLE  # never expires, whatever happens to its file
+    return datasets.get(dataset_id)
+
+
+def table_columns(table: pandas.DataFrame) -> List[Dict[str, Union[str, bool]]]:
+    """Return DataTable columns for a table; X and the first Y are kept.
+
+    Args:
+        table (pandas.DataFrame): session table
+
+    Returns:
+        List[Dict[str, Union[str, bool]]]: DataTable column definitions
+    """
+    columns: List[Dict[str, Union[str, bool]]] = []
+    for index, column in enumerate(table.columns):
+        columns.append({"id": str(column), "name": str(column)})
+        if index > 1:
+            columns[-1]["deletable"] = True
+    return columns
+
+
+def table_page(table: pandas.DataFrame, page: int) -> List[Dict[str, Any]]:
+    """Return one page of a table as DataTable rows.
+
+    Each row carries its position in the table under ROW_ID, so edits and
+    deletions made on the page can be applied back to the stored table.
+
+    Args:
+        table (pandas.DataFrame): session table
+        page (int): page number, from zero
+
+    Returns:
+        List[Dict[str, Any]]: rows of the page
+    """
+    rows = table.iloc[page * PAGE_SIZE : (page + 1) * PAGE_SIZE]
+    records = rows.assign(**{ROW_ID: rows.index}).to_dict("records")
+    # keyed like the column ids of table_columns
+    return [{str(key): value for key, value in row.items()} for row in records]
+
+
+def edit_table(
+    table: pandas.DataFrame,
+    rows: List[Dict[str, Any]],
+    previous: List[Dict[str, Any]],
+) -> pandas.DataFrame:
+    """Apply the cell edits and row deletions made on one page to a table.
+
+    Only the page before and after the change is compared, so the cost does
+    not depend on the size of the table. Values that are not numbers are
+    stored as NaN, which is fit as zero like an empty cell.
+
+    Args:
+        table (pandas.DataFrame): session table
+        rows (List[Dict[str, Any]]): page rows after the change
+        previous (List[Dict[str, Any]]): page rows before the change
+
+    Returns:
+        pandas.DataFrame: edited copy of the table
+    """
+    table = table.copy()
+    before = {row[ROW_ID]: row for row in previous}
+    for row in rows:
+        old = before.pop(row[ROW_ID], {})
+        for column in table.columns:
+            if column in row and row[column] != old.get(column):
+                value = pandas.to_numeric(
+                    pandas.Series([row[column]], dtype=object), errors="coerce"
+                )
+                table.loc[row[ROW_ID], column] = float(value.iloc[0])
+    deleted = list(before)  # rows on the previous page but not this one
+    return table.drop(index=deleted).reset_index(drop=True)
+
+
 @app.callback(
-    Output("adding-rows-table", "data"),
-    [Input("editing-rows-button", "n_clicks")],
-    [State("adding-rows-table", "data"), State("adding-rows-table", "columns")],
+    [
+        Output("adding-rows-table", "data"),
+        Output("adding-rows-table", "columns"),
+        Output("adding-rows-table", "page_count"),
+        Output("adding-rows-table", "page_current"),
+        Output("dataset-id", "data"),
+        Output("upload-status", "children"),
+    ],
+    [
+        Input("editing-rows-button", "n_clicks"),
+        Input("adding-rows-button", "n_clicks"),
+        Input("upload-data", "contents"),
+        Input("adding-rows-table", "page_current"),
+        Input("adding-rows-table", "data_timestamp"),
+        Input("adding-rows-table", "columns"),
+    ],
+    [
+        State("upload-data", "filename"),
+        State("adding-rows-table", "data"),
+        State("adding-rows-table", "data_previous"),
+        State("dataset-id", "data"),
+    ],
 )  # type: ignore[misc]
-def add_row(
-    n_clicks: int,
-    rows: List[Dict[str, float]],
-    columns: List[Dict[str, str]],
-) -> List[Dict[str, float]]:
-    """Add additional data entry row.
+def update_table(
+    row_clicks: int,
+    column_clicks: int,
+    contents: Optional[str],
+    page_current: Optional[int],
+    data_timestamp: Optional[int],
+    columns: List[Dict[str, Union[str, bool]]],
+    filename: Optional[str],
+    rows: List[Dict[str, Any]],
+    previous: Optional[List[Dict[str, Any]]],
+    dataset_id: Optional[str],
+) -> Tuple[Any, ...]:
+    """Apply a change to the session's table and send back the page on display.
+
+    The table itself stays in the dataset store and the browser keeps only
+    its key, so the browser sends just the page it shows (for edits) and
+    receives just the page it shows. A table that has expired from the store
+    is reported rather than replaced by the example data; uploading a file
+    starts a new one.
 
     Args:
-        n_clicks (int): number of times function has been clicked
-        rows (List[Dict[str, float]]): existing rows
-        columns (List[Dict[str, str]]): existing columns
+        row_clicks (int): number of times Add Row has been clicked
+        column_clicks (int): number of times Add Column has been clicked
+        contents (str, optional): uploaded file as a base64 data URL
+        page_current (int, optional): page on display
+        data_timestamp (int, optional): time of the last edit in the browser
+        columns (List[Dict[str, Union[str, bool]]]): columns on display
+        filename (str, optional): name of the uploaded file
+        rows (List[Dict[str, Any]]): page rows after the last edit
+        previous (List[Dict[str, Any]], optional): page rows before it
+        dataset_id (str, optional): key of the session's table
 
     Returns:
-        List[Dict[str, float]]: rows with an additional row
+        Tuple: page rows, columns, page count, page number, table key (new
+        only when the table changed) and upload status
     """
-    if n_clicks > 0:
-        rows.append({c["id"]: 0.0 for c in columns})
-    return rows
+    triggered = {t["prop_id"] for t in dash.callback_context.triggered}
+    table = load_table(dataset_id)
+    status: Any = dash.no_update
+    page = page_current or 0
+    changed = False  # page changes only read the stored table
+
+    if "upload-data.contents" in triggered and contents is not None:
+        try:
+            table = read_upload(contents, filename or "")
+            if "X" not in table.columns or len(table.columns) < 2:
+                raise ValueError("needs an X column and at least one Y column")
+        except Exception as error:  # report anything pandas cannot parse
+            return (*(dash.no_update,) * 5, f"Could not read {filename}: {error}")
+        page = 0
+        status = f"{filename}: {len(table)} rows"
+        changed = True
+    if table is None:
+        return (*(dash.no_update,) * 5, EXPIRED)
+    if "adding-rows-table.columns" in triggered:
+        # a column deleted in the browser
+        kept = [str(c["id"]) for c in columns]
+        table = table[[c for c in table.columns if str(c) in kept]]
+        changed = True
+    if "adding-rows-table.data_timestamp" in triggered and previous is not None:
+        table = edit_table(table, rows, previous)
+        changed = True
+    if "editing-rows-button.n_clicks" in triggered and row_clicks > 0:
+        table = pandas.concat(
+            [table, pandas.DataFrame(0.0, index=[0], columns=table.columns)],
+            ignore_index=True,
+        )
+        page = len(table) // PAGE_SIZE  # show the new row
+        changed = True
+    if "adding-rows-button.n_clicks" in triggered and column_clicks > 0:
+        number = len(table.columns)
+        while f"Y{number}" in table.columns:
+            number += 1
+        table = table.assign(**{f"Y{number}": 0.0})
+        changed = True
+
+    new_dataset_id: Any = dash.no_update
+    if changed:
+        try:
+            new_dataset_id = datasets.add(table)
+        except OSError as error:
+            return (*(dash.no_update,) * 5, f"Could not save the table: {error}")
+
+    page_count = max(-(-len(table) // PAGE_SIZE), 1)
+    page = min(page, page_count - 1)
+    return (
+        table_page(table, page),
+        table_columns(table),
+        page_count,
+        page,
+        new_dataset_id,
+        status,
+    )
 
 
 @app.callback(
-    Output("adding-rows-table", "columns"),
-    [Input("adding-rows-button", "n_clicks")],
-    [State("adding-rows-table", "columns")],
+    Output("fit-store", "data"),
+    [Input("dataset-id", "data")],
 )  # type: ignore[misc]
-def update_columns(
-    n_clicks: int, existing_columns: List[Dict[str, Union[str, bool]]]
-) -> List[Dict[str, Union[str, bool]]]:
-    """Add additional data entry column.
+def update_fit(dataset_id: Optional[str]) -> Dict[str, Any]:
+    """Take user data and perform nonlinear regression to Dose-response model.
+
+    Only changes to the table run the fit; the stored results are drawn by
+    update_graph.
 
     Args:
-        n_clicks (int): number of times function has been clicked
-        existing_columns (List[Dict[str, Union[str, bool]]]): existing columns
+        dataset_id (str, optional): key of the session's table
 
     Returns:
-        List[Dict[str, Union[str, bool]]]: existing columns with new column appended
+        Dict(str, Any): data and fit results to store for plotting
     """
-    if n_clicks > 0:
-        count: int = 2 + n_clicks
-        counter: str = f"Y{count}"
-        existing_columns.append(
-            {"id": counter, "name": counter, "editable": True, "deletable": True}
-        )
-    return existing_columns
+
+    df = load_table(dataset_id)
+    if df is None:
+        raise PreventUpdate  # update_table reports the expired table
+
+    x: NDArray = df["X"].astype(float).values
+
+    ys: pandas.DataFrame = df.iloc[:, 1:]  # all but X column
+    fit = fit_replicates(x, ys, fit_cache)
+
+    return {
+        "x": x.tolist(),
+        "y": fit.y.tolist(),
+        "y_std": fit.y_std.tolist(),
+        "variables": stored_values(fit.variables),
+        "var_errors": stored_values(fit.var_errors),
+        "r_squared": stored_values(fit.statistics.r_squared)[0],
+    }
 
 
 @app.callback(
     Output("adding-rows-graph", "figure"),
     [
-        Input("adding-rows-table", "data"),
-        Input("adding-rows-table", "columns"),
+        Input("fit-store", "data"),
         Input("x-axis", "value"),
         Input("y-axis", "value"),
     ],
 )  # type: ignore[misc]
 def update_graph(
-    rows: List[Dict[str, float]],
-    columns: List[Dict[str, Union[str, bool]]],
+    fit: Optional[Dict[str, Any]],
     x_title: str,
     y_title: str,
 ) -> Dict[str, Any]:
-    """Take user data and perform nonlinear regression to Dose-response model.
+    """Draw the stored fit, without refitting when only axis labels change.
 
     Args:
-        rows (List[Dict[str, float]]): data entry rows
-        columns (List[Dict[str, Union[str, bool]]]): data entry columns
+        fit (Dict[str, Any], optional): fit results stored by update_fit
         x_title (str): x axis title
         y_title (str): y axis title
 
     Returns:
         Dict(str, Any): plot data and layout to update displayed graph
     """
+    if fit is None:
+        raise PreventUpdate
 
-    df = pandas.DataFrame(rows, columns=[c["name"] for c in columns])
-
-    x: NDArray = df["X"].astype(float).values
-
-    ys: pandas.DataFrame = df.iloc[:, 1:]  # all but X column
-    y, y_std = clean_up_y_data(ys)
-
-    variables, var_errors = fit_data(x, y, y_std)
-
-    r_squared: float = find_r_squared(x, y, variables)
+    # JSON has no inf or NaN; they are stored as null and read back as NaN
+    x: NDArray = numpy.asarray(fit["x"], dtype=float)
+    y: NDArray = numpy.asarray(fit["y"], dtype=float)
+    y_std: List[float] = fit["y_std"]
+    variables: NDArray = numpy.asarray(fit["variables"], dtype=float)
+    var_errors: NDArray = numpy.asarray(fit["var_errors"], dtype=float)
+    r_squared: Optional[float] = fit["r_squared"]
 
     # Calculate useful range for plotting
     DEFAULT_INCREMENTS: int = 100
-    x_range: NDArray = numpy.arange(
-        numpy.min(x), numpy.max(x), abs(numpy.max(x) / DEFAULT_INCREMENTS)
-    )
+    x_range: NDArray = numpy.linspace(numpy.min(x), numpy.max(x), DEFAULT_INCREMENTS)
 
     # Return plots and a graph data layout
     plot1: go.Scatter = generate_plot1(x, y, y_std)
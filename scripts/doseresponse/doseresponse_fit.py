@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+
+"""
+Headless dose-response (Langmuir isotherm) fitting, shared by the doseresponse
+app.
+
+Only numpy is imported up front, so whole plate-reader exports can be fit
+across a process pool without loading Dash or Plotly; scipy and pandas are
+imported when the single-curve fit or the table reader first need them.
+
+Usage:
+    python doseresponse_fit.py <data.csv | data.parquet> ... [-o results.csv]
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
+
+import numpy
+
+import fit_core
+from fit_core import (
+    FTOL,
+    MAX_ITERATIONS,
+    WEIGHTING,
+    XTOL,
+    BatchFit,
+    CurveModel,
+    FitCache,
+    FitResult,
+    FitStatistics,
+    fit_statistics,
+    fit_tables_main,
+    point_weights,
+    summarize_replicates,
+    table_curves,
+    weight_sigma,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+    from numpy.typing import ArrayLike
+
+    # Subscripting ndarray at runtime needs numpy 1.22 and Python 3.9
+    NDArray = numpy.ndarray[Any, numpy.dtype[numpy.float64]]
+
+# Curves fit per process pool task
+CHUNK_SIZE = 256
+
+# Plates with fewer curves are fit in-process by default: a 384-well plate fits
+# in about 30 ms, less than it takes to start a pool of worker processes
+PARALLEL_CURVES = 8192
+
+# Columns of the table written by fit_table, after the curve name
+RESULT_COLUMNS = [
+    "bottom",
+    "bottom_err",
+    "top",
+    "top_err",
+    "kd",
+    "kd_err",
+    "r_squared",
+    "adjusted_r_squared",
+    "rmse",
+    "aic",
+    "bic",
+    "converged",
+]
+
+
+# fit_plate results keep the name they had before BatchFit moved to fit_core
+PlateFit = BatchFit
+
+
+def equation(
+    x: "NDArray",
+    bottom: Any,
+    top: Any,
+    kd: Any,
+) -> "NDArray":
+    """Dose-response equation for testing and plotting.
+
+    Args:
+        x (numpy.ndarray): x values
+        bottom (float): guess or value for Bottom, or an array broadcasting with x
+        top (float): guess or value for Top, or an array broadcasting with x
+        kd (float): guess or value for Kd, or an array broadcasting with x
+
+    Returns:
+        numpy.ndarray: return predicted y values
+    """
+    y: "NDArray" = bottom + x * (top - bottom) / (kd + x)
+    return y
+
+
+def jacobian(x: "NDArray", bottom: Any, top: Any, kd: Any) -> "NDArray":
+    """Analytic derivatives of the dose-response equation.
+
+    Args:
+        x (numpy.ndarray): x values
+        bottom (float): value for Bottom, or an array broadcasting with x
+        top (float): value for Top, or an array broadcasting with x
+        kd (float): value for Kd, or an array broadcasting with x
+
+    Returns:
+        numpy.ndarray: d/dBottom, d/dTop and d/dKd at each x, stacked on the
+        last axis
+    """
+    bound = x / (kd + x)
+    d_kd = -(top - bottom) * bound / (kd + x)
+    derivatives: "NDArray" = numpy.stack(
+        numpy.broadcast_arrays(1 - bound, bound, d_kd), axis=-1
+    )
+    return derivatives
+
+
+def initial_guess(
+    x: "ArrayLike", y: "ArrayLike", y_std: Optional["ArrayLike"] = None
+) -> "NDArray":
+    """Estimate (bottom, top, Kd) for one curve: min(y), max(y) and the mean x.
+
+    Args:
+        x (ArrayLike): x values
+        y (ArrayLike): average y values
+        y_std (ArrayLike, optional): y std dev values, unused
+
+    Returns:
+        numpy.ndarray: initial (bottom, top, Kd)
+    """
+    x_values = numpy.asarray(x, dtype=numpy.float64)
+    y_values = numpy.asarray(y, dtype=numpy.float64)
+    guess: "NDArray" = numpy.array(
+        [numpy.min(y_values), numpy.max(y_values), numpy.mean(x_values)]
+    )
+    return guess
+
+
+def _linear_bottom_top(
+    x: "NDArray", y: "NDArray", weights: "NDArray", kd: "NDArray"
+) -> Tuple["NDArray", "NDArray"]:
+    """Return the weighted least squares bottom and top for a fixed Kd.
+
+    With Kd fixed the model is linear: y = bottom * (1 - b) + top * b, where
+    b = x / (Kd + x).
+    """
+    bound = numpy.where(weights > 0, x / (kd[:, None] + x), 0.0)
+    free = numpy.where(weights > 0, 1 - bound, 0.0)
+    a11 = (weights * free**2).sum(axis=1)
+    a12 = (weights * free * bound).sum(axis=1)
+    a22 = (weights * bound**2).sum(axis=1)
+    g1 = (weights * free * y).sum(axis=1)
+    g2 = (weights * bound * y).sum(axis=1)
+    det = a11 * a22 - a12**2
+    return (a22 * g1 - a12 * g2) / det, (a11 * g2 - a12 * g1) / det
+
+
+def initial_guesses(x: "NDArray", y: "NDArray", weights: "NDArray") -> "NDArray":
+    """Estimate (bottom, top, Kd) for each curve.
+
+    Kd starts at the positive x whose y is nearest halfway between the y values
+    at the lowest and highest x; bottom and top are then the exact weighted
+    least squares values for that Kd. Curves where that fails fall back to
+    min(y), max(y) and the mean x, as initial_guess does for the app's fit.
+
+    Args:
+        x (numpy.ndarray): x values, shape (n, m)
+        y (numpy.ndarray): y values, shape (n, m)
+        weights (numpy.ndarray): point weights, zero for missing points
+
+    Returns:
+        numpy.ndarray: initial (bottom, top, Kd) per curve, shape (n, 3)
+    """
+    valid = weights > 0
+    rows = numpy.arange(len(y))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        low = numpy.where(valid, x, numpy.inf).argmin(axis=1)
+        high = numpy.where(valid, x, -numpy.inf).argmax(axis=1)
+        half = (y[rows, low] + y[rows, high]) / 2
+        distance = numpy.where(valid & (x > 0), numpy.abs(y - half[:, None]), numpy.inf)
+        kd = x[rows, distance.argmin(axis=1)]
+        bottom, top = _linear_bottom_top(x, y, weights, kd)
+
+        fallback = numpy.stack(
+            [
+                numpy.where(valid, y, numpy.inf).min(axis=1),
+                numpy.where(valid, y, -numpy.inf).max(axis=1),
+                numpy.where(valid, x, 0.0).sum(axis=1) / valid.sum(axis=1),
+            ],
+            axis=1,
+        )
+    guesses = numpy.stack([bottom, top, kd], axis=1)
+    bad = ~(numpy.isfinite(guesses).all(axis=1) & (kd > 0))
+    guesses[bad] = fallback[bad]
+    finite: "NDArray" = numpy.nan_to_num(guesses, nan=1.0, posinf=1.0, neginf=1.0)
+    return finite
+
+
+# The model as the shared fitting code in fit_core takes it
+MODEL = CurveModel(equation, jacobian, initial_guess)
+
+
+def _weighted_sse(
+    x: "NDArray", y: "NDArray", weights: "NDArray", variables: "NDArray"
+) -> Tuple["NDArray", "NDArray"]:
+    """Return residuals and weighted sum of squared residuals per curve."""
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        residuals = y - equation(
+            x, variables[:, :1], variables[:, 1:2], variables[:, 2:]
+        )
+        sse = numpy.where(weights > 0, weights * residuals**2, 0.0).sum(axis=1)
+    return residuals, numpy.where(numpy.isfinite(sse), sse, numpy.inf)
+
+
+def _normal_equations(
+    x: "NDArray", weights: "NDArray", variables: "NDArray", residuals: "NDArray"
+) -> Tuple["NDArray", "NDArray"]:
+    """Return J'WJ, shape (n, 3, 3), and J'Wr, shape (n, 3), per curve."""
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        derivatives = jacobian(x, variables[:, :1], variables[:, 1:2], variables[:, 2:])
+        valid = (weights > 0)[..., None]
+        derivatives = numpy.where(valid, derivatives, 0.0)
+        weighted = derivatives * weights[..., None]
+        r = numpy.where(weights > 0, residuals, 0.0)
+        return (
+            numpy.einsum("nmi,nmj->nij", weighted, derivatives),
+            numpy.einsum("nmi,nm->ni", weighted, r),
+        )
+
+
+def _inverse3(matrices: "NDArray") -> "NDArray":
+    """Invert a stack of 3x3 matrices by cofactors; singular ones give inf/NaN.
+
+    Unlike numpy.linalg.inv this never raises, so one degenerate curve cannot
+    stop the rest of the plate.
+    """
+    c0, c1, c2 = matrices[..., 0], matrices[..., 1], matrices[..., 2]
+    with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        cofactors = numpy.stack(
+            [numpy.cross(c1, c2), numpy.cross(c2, c0), numpy.cross(c0, c1)], axis=-2
+        )
+        det = (c0 * cofactors[..., 0, :]).sum(axis=-1)
+        inverse: "NDArray" = cofactors / det[..., None, None]
+    return inverse
+
+
+def fit_batch(
+    x: "ArrayLike",
+    y: "ArrayLike",
+    sigma: Optional["ArrayLike"] = None,
+    weighting: str = WEIGHTING,
+    max_iterations: int = MAX_ITERATIONS,
+) -> PlateFit:
+    """Fit the dose-response equation to a stack of averaged curves at once.
+
+    Runs Levenberg-Marquardt on every curve together, using the analytic
+    Jacobian. Errors are sqrt(diag(cov)) with the covariance scaled by the
+    reduced chi squared, as scipy.optimize.curve_fit (and so fit_data) reports
+    them.
+
+    Args:
+        x (ArrayLike): x values, shape (m,) shared by all curves or (n, m)
+        y (ArrayLike): y values, shape (n, m); NaN marks a missing point
+        sigma (ArrayLike, optional): y std dev values, broadcastable to y;
+            None fits unweighted
+        weighting (str): policy for points without spread, see weight_sigma
+        max_iterations (int): iteration limit for every curve
+
+    Returns:
+        PlateFit: variables, errors, r squared and convergence per curve;
+        curves with fewer points than variables (e.g. empty wells) are not
+        fit, and come back with NaN variables, errors and statistics and
+        converged False
+    """
+    y_values: "NDArray" = numpy.atleast_2d(numpy.asarray(y, dtype=numpy.float64))
+    x_values: "NDArray" = numpy.broadcast_to(
+        numpy.asarray(x, dtype=numpy.float64), y_values.shape
+    )
+    if sigma is not None:
+        sigma = weight_sigma(numpy.broadcast_to(sigma, y_values.shape), weighting)
+    weights = point_weights(x_values, y_values, sigma)
+    y_values = numpy.where(weights > 0, y_values, 0.0)
+    x_values = numpy.where(weights > 0, x_values, 0.0)
+    n_points = (weights > 0).sum(axis=1)
+    fittable = n_points >= 3
+
+    variables = initial_guesses(x_values, y_values, weights)
+    residuals, sse = _weighted_sse(x_values, y_values, weights, variables)
+    damping = numpy.full(len(y_values), 1e-3)
+    active = fittable & numpy.isfinite(sse)
+    converged = numpy.zeros(len(y_values), dtype=bool)
+    identity = numpy.eye(3, dtype=bool)
+
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        normal, gradient = _normal_equations(x_values, weights, variables, residuals)
+
+        # Marquardt-scaled damped 3x3 solve for every curve
+        normal[:, identity] *= 1 + damping[:, None]
+        step = numpy.einsum("nij,nj->ni", _inverse3(normal), gradient)
+        step[~active | ~numpy.isfinite(step).all(axis=1)] = 0.0
+
+        trial = variables + step
+        trial_residuals, trial_sse = _weighted_sse(x_values, y_values, weights, trial)
+        accept = active & (trial_sse <= sse)
+
+        # Converged when an accepted step barely changes the fit or the values
+        small_f = (sse - trial_sse) <= FTOL * trial_sse
+        small_x = (numpy.abs(step) <= XTOL * (numpy.abs(trial) + XTOL)).all(axis=1)
+        done = accept & (small_f | small_x) | active & (sse == 0)
+
+        variables[accept] = trial[accept]
+        residuals[accept] = trial_residuals[accept]
+        sse[accept] = trial_sse[accept]
+        damping = numpy.where(accept, damping / 10, damping * 10)
+
+        # A curve whose damping has run away cannot improve any further
+        stuck = active & ~accept & (damping > 1e16)
+        converged |= done
+        active &= ~(done | stuck)
+
+    # Covariance: inverse of J'WJ at the solution, scaled by reduced chi squared
+    normal, _ = _normal_equations(x_values, weights, variables, residuals)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        scale = sse / (n_points - 3)
+        variance = numpy.diagonal(_inverse3(normal), axis1=1, axis2=2) * scale[:, None]
+        var_errors = numpy.sqrt(variance)
+    var_errors[(n_points <= 3) | ~numpy.isfinite(var_errors).all(axis=1)] = numpy.inf
+
+    # Statistics of the unweighted residuals, as find_r_squared reports them
+    statistics = fit_statistics(y_values, residuals, 3, weights > 0)
+
+    # Curves too short to fit keep no guessed values
+    variables[~fittable] = numpy.nan
+    var_errors[~fittable] = numpy.nan
+    return PlateFit(
+        variables,
+        var_errors,
+        numpy.where(fittable, statistics.r_squared, numpy.nan),
+        converged,
+        numpy.where(fittable[:, None], statistics.residuals, numpy.nan),
+        numpy.where(fittable, statistics.sse, numpy.nan),
+        numpy.where(fittable, statistics.adjusted_r_squared, numpy.nan),
+        numpy.where(fittable, statistics.rmse, numpy.nan),
+        numpy.where(fittable, statistics.aic, numpy.nan),
+        numpy.where(fittable, statistics.bic, numpy.nan),
+    )
+
+
+def _fit_chunk(
+    x: "NDArray", y: "NDArray", sigma: "NDArray", weighting: str
+) -> PlateFit:
+    """Fit one chunk of curves; a module-level function so workers can run it."""
+    return fit_batch(x, y, sigma, weighting)
+
+
+def fit_plate(
+    x: "ArrayLike",
+    y: "ArrayLike",
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    weighting: str = WEIGHTING,
+) -> PlateFit:
+    """Fit every curve of a plate, spreading chunks of curves across processes.
+
+    Replicates are averaged and their std devs used as fit uncertainties, as
+    in the app. Each chunk is fit with the vectorized fit_batch.
+
+    Args:
+        x (ArrayLike): concentrations, shape (n_points,) or (n_curves, n_points)
+        y (ArrayLike): responses, shape (n_curves, n_points, n_replicates);
+            NaN marks a missing replicate
+        workers (int, optional): worker processes; 1 fits in this process, and
+            None does so for plates under PARALLEL_CURVES curves and uses every
+            core for larger ones
+        chunk_size (int): curves per worker task
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        PlateFit: variables, errors, r squared and convergence per curve
+    """
+    mean, std = summarize_replicates(y)
+    x_values = numpy.broadcast_to(numpy.asarray(x, dtype=numpy.float64), mean.shape)
+
+    starts = range(0, len(mean), chunk_size)
+    chunks = [
+        (
+            x_values[i : i + chunk_size],
+            mean[i : i + chunk_size],
+            std[i : i + chunk_size],
+            weighting,
+        )
+        for i in starts
+    ]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(mean) >= PARALLEL_CURVES else 1
+    if workers == 1 or len(chunks) <= 1:
+        results = [_fit_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            results = list(executor.map(_fit_chunk, *zip(*chunks)))
+
+    if not results:
+        return fit_batch(x_values, mean, std, weighting)
+    return PlateFit(*(numpy.concatenate(field) for field in zip(*results)))
+
+
+def fit_data(
+    x: "NDArray",
+    y: "NDArray",
+    y_std: List[float],
+    weighting: str = WEIGHTING,
+) -> Tuple["NDArray", "NDArray", FitStatistics]:
+    """Perform curve fitting against the average data, see fit_core.fit_data.
+
+    Starts from initial_guess and gives the optimizer the analytic Jacobian of
+    the dose-response equation.
+
+    Args:
+        x (numpy.ndarray): x values
+        y (numpy.ndarray): average y values
+        y_std (List[float]): y std dev values
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray, FitStatistics]: fitting variables,
+        associated errors and fit statistics, taken from the optimizer's final
+        residuals
+    """
+    return fit_core.fit_data(MODEL, x, y, y_std, weighting)
+
+
+def find_r_squared(
+    x: "NDArray",
+    y: "NDArray",
+    variables: "NDArray",
+) -> float:
+    """Find r squared value of fit, see fit_core.find_r_squared.
+
+    Args:
+        x (numpy.ndarray): x values
+        y (numpy.ndarray): average y values
+        variables (numpy.ndarray): fitting variables
+
+    Returns:
+        float: r squared value
+    """
+    return fit_core.find_r_squared(MODEL, x, y, variables)
+
+
+def fit_replicates(
+    x: "NDArray",
+    ys: "pandas.DataFrame",
+    cache: Optional[FitCache] = None,
+    weighting: str = WEIGHTING,
+) -> FitResult:
+    """Clean up and fit the app's table data, see fit_core.fit_replicates.
+
+    Args:
+        x (numpy.ndarray): x values
+        ys (pandas.DataFrame): user-entered y-value columns
+        cache (FitCache, optional): cache of earlier fits
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        FitResult: average y, std dev of y, fitting variables, errors and
+        statistics
+    """
+    return fit_core.fit_replicates(MODEL, x, ys, cache, weighting)
+
+
+def fit_table(
+    table: "pandas.DataFrame",
+    x_column: str = "X",
+    group: Optional[str] = None,
+    workers: Optional[int] = 1,
+    weighting: str = WEIGHTING,
+) -> "pandas.DataFrame":
+    """Fit every curve in a data table and return one row of results per curve.
+
+    Args:
+        table (pandas.DataFrame): data table, laid out as for table_curves
+        x_column (str): name of the x column
+        group (str, optional): name of the column naming each curve
+        workers (int, optional): worker processes, as for fit_plate
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        pandas.DataFrame: curve name followed by RESULT_COLUMNS
+    """
+    import pandas
+
+    names, x, y = table_curves(table, x_column, group)
+    fits = fit_plate(x, y, workers=workers, weighting=weighting)
+    return pandas.DataFrame(
+        {
+            "curve": names,
+            "bottom": fits.variables[:, 0],
+            "bottom_err": fits.var_errors[:, 0],
+            "top": fits.variables[:, 1],
+            "top_err": fits.var_errors[:, 1],
+            "kd": fits.variables[:, 2],
+            "kd_err": fits.var_errors[:, 2],
+            "r_squared": fits.r_squared,
+            "adjusted_r_squared": fits.adjusted_r_squared,
+            "rmse": fits.rmse,
+            "aic": fits.aic,
+            "bic": fits.bic,
+            "converged": fits.converged,
+        }
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Fit dose-response curves in data tables and write a results table."""
+    fit_tables_main(
+        fit_table,
+        "doseresponse-fit",
+        "Fit dose-response curves to CSV / Parquet data tables.",
+        argv,
+        parallel_curves=PARALLEL_CURVES,
+    )
+
+
+if __name__ == "__main__":
+    main()
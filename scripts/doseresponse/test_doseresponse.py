@@ -0,0 +1,30 @@
+"""Tests for doseresponse."""
+
+import pandas
+from doseresponse import (
+    INITIAL_DATASET,
+    INITIAL_TABLE,
+    edit_table,
+    load_table,
+    table_page,
+)
+
+from fit_core import ROW_ID
+
+
+def test_example_table_is_served_without_storing() -> None:
+    assert load_table(INITIAL_DATASET) is INITIAL_TABLE
+
+
+def test_pages_keep_a_data_column_named_id() -> None:
+    table = pandas.DataFrame({"X": [1.0, 2.0, 3.0], "id": [7.0, 8.0, 9.0]})
+    rows = table_page(table, 0)
+    assert [row["id"] for row in rows] == [7.0, 8.0, 9.0]
+
+    edited = [dict(row) for row in rows if row[ROW_ID] != 1]
+    edited[0]["id"] = 70.0
+
+    pandas.testing.assert_frame_equal(
+        edit_table(table, edited, rows),
+        pandas.DataFrame({"X": [1.0, 3.0], "id": [70.0, 9.0]}),
+    )
@@ -0,0 +1,64 @@
+"""Tests for doseresponse_fit."""
+
+import os
+from typing import Any
+
+import doseresponse_fit
+import numpy
+import pandas
+import pytest
+from doseresponse_fit import equation, fit_plate, fit_table
+
+X = numpy.logspace(-3, 2, 12)
+
+
+def plate(n_curves: int) -> numpy.ndarray[Any, numpy.dtype[numpy.float64]]:
+    rng = numpy.random.default_rng(0)
+    kd = rng.uniform(0.01, 10.0, n_curves)
+    y: numpy.ndarray[Any, numpy.dtype[numpy.float64]] = equation(
+        X[None, :, None], 0.1, 1.0, kd[:, None, None]
+    ) + rng.normal(0.0, 0.03, (n_curves, len(X), 3))
+    return y
+
+
+def test_fit_plate_skips_empty_wells() -> None:
+    y = plate(4)
+    y[1] = numpy.nan  # empty well
+    y[2, 2:] = numpy.nan  # two points, three parameters
+
+    fits = fit_plate(X, y)
+
+    assert list(fits.converged) == [True, False, False, True]
+    assert numpy.isfinite(fits.variables[[0, 3]]).all()
+    assert numpy.isnan(fits.variables[1:3]).all()
+    assert numpy.isnan(fits.var_errors[1:3]).all()
+    assert numpy.isnan(fits.r_squared[1:3]).all()
+
+
+def test_fit_table_reports_empty_wells_unconverged() -> None:
+    table = pandas.DataFrame(
+        {
+            "X": numpy.tile(X, 2),
+            "well": ["A1"] * len(X) + ["A2"] * len(X),
+            "Y1": numpy.concatenate([plate(1)[0, :, 0], numpy.full(len(X), numpy.nan)]),
+        }
+    )
+
+    results = fit_table(table, group="well", workers=None)
+
+    assert list(results["converged"]) == [True, False]
+    assert results.loc[1, ["bottom", "top", "kd"]].isna().all()
+
+
+def test_fit_plate_small_plates_fit_in_process(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def no_pool(*args: object, **kwargs: object) -> None:
+        raise AssertionError("a 384-well plate should not start worker processes")
+
+    monkeypatch.setattr(doseresponse_fit, "ProcessPoolExecutor", no_pool)
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+
+    fits = fit_plate(X, plate(384), chunk_size=64)
+
+    assert fits.converged.all()
@@ -0,0 +1,884 @@
+#!/usr/bin/env python3
+
+"""
+Curve fitting support shared by the michaelis_fit and doseresponse_fit cores.
+
+Holds everything the fitting cores do the same way whatever the model:
+replicate clean-up, point weighting, goodness of fit statistics, the
+single-curve fit and batch result types, the fit and data table caches the
+Dash apps share between workers, the readers and writers for uploaded and
+command-line tables, and the command line itself. A core supplies its model
+as a CurveModel. Only numpy is imported up front; scipy and pandas are
+imported when a curve is first fit or a table first read.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import numpy
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas
+    from numpy.typing import ArrayLike
+
+    # Subscripting ndarray at runtime needs numpy 1.22 and Python 3.9
+    NDArray = numpy.ndarray[Any, numpy.dtype[numpy.float64]]
+
+# Convergence tolerances; tighter than the curve_fit defaults, which are
+# cheap to meet when every curve is refined together
+FTOL = 1e-12
+XTOL = 1e-10
+MAX_ITERATIONS = 200
+
+# Policies for points without replicate spread; see weight_sigma
+WEIGHTING_MODES = ("pooled", "floor", "none")
+WEIGHTING = "pooled"
+
+# Smallest variance allowed under "floor" weighting, as a fraction of the
+# curve's pooled variance
+VARIANCE_FLOOR = 0.1
+
+# Fits kept by a FitCache; bump CACHE_VERSION when cached entries change
+CACHE_ENTRIES = 256
+CACHE_VERSION = 1
+
+# Data tables a DatasetStore keeps in memory, and how long its files are kept
+# after their last use; sessions reading a table keep it from expiring
+DATASET_ENTRIES = 64
+DATASET_MAX_AGE = 24 * 60 * 60
+
+# Table rows sent to the browser at once, and the key each sent row keeps its
+# position in the table under; read_upload renames data columns of that name
+PAGE_SIZE = 100
+ROW_ID = "__row_id__"
+
+# Curve name given by table_curves to rows with a blank group cell
+BLANK_GROUP = "(blank)"
+
+Entry = TypeVar("Entry")
+
+
+class FitStatistics(NamedTuple):
+    """Goodness of fit of one curve, or of each curve in a stack.
+
+    Attributes:
+        residuals (numpy.ndarray): y minus the fitted y, NaN at missing points
+        sse (numpy.ndarray): sum of squared residuals
+        r_squared (numpy.ndarray): r squared value
+        adjusted_r_squared (numpy.ndarray): r squared adjusted for the number of
+            fitted variables, NaN with no degrees of freedom left
+        rmse (numpy.ndarray): root mean squared residual
+        aic (numpy.ndarray): Akaike information criterion, for least squares
+        bic (numpy.ndarray): Bayesian information criterion, for least squares
+    """
+
+    residuals: "NDArray"
+    sse: "NDArray"
+    r_squared: "NDArray"
+    adjusted_r_squared: "NDArray"
+    rmse: "NDArray"
+    aic: "NDArray"
+    bic: "NDArray"
+
+
+class FitResult(NamedTuple):
+    """Cleaned data and fit of one table, as the app plots it.
+
+    Attributes:
+        y (numpy.ndarray): average y values
+        y_std (numpy.ndarray): y std dev values
+        variables (numpy.ndarray): fitting variables
+        var_errors (numpy.ndarray): fitting variable errors
+        statistics (FitStatistics): fit statistics
+    """
+
+    y: "NDArray"
+    y_std: "NDArray"
+    variables: "NDArray"
+    var_errors: "NDArray"
+    statistics: FitStatistics
+
+
+class CurveModel(NamedTuple):
+    """The model a fitting core supplies to the shared fitting code.
+
+    Attributes:
+        equation (Callable[..., numpy.ndarray]): predicted y, as
+            equation(x, *variables)
+        jacobian (Callable[..., numpy.ndarray]): derivatives of the equation
+            by each variable, stacked on the last axis, as
+            jacobian(x, *variables)
+        initial_guess (Callable[..., numpy.ndarray]): starting variables for
+            one curve, as initial_guess(x, y, sigma)
+    """
+
+    equation: Callable[..., "NDArray"]
+    jacobian: Callable[..., "NDArray"]
+    initial_guess: Callable[..., "NDArray"]
+
+
+class BatchFit(NamedTuple):
+    """Fits of a stack of curves, as a fitting core's fit_batch returns them.
+
+    Attributes:
+        variables (numpy.ndarray): fitted variables per curve, shape (n, k)
+        var_errors (numpy.ndarray): standard errors of the variables, shape (n, k)
+        r_squared (numpy.ndarray): r squared value per curve, shape (n,)
+        converged (numpy.ndarray): whether each fit met the tolerances, shape (n,)
+        residuals (numpy.ndarray): y minus the fitted y, NaN at missing points,
+            shape (n, m)
+        sse (numpy.ndarray): sum of squared residuals per curve, shape (n,)
+        adjusted_r_squared (numpy.ndarray): adjusted r squared per curve, shape (n,)
+        rmse (numpy.ndarray): root mean squared residual per curve, shape (n,)
+        aic (numpy.ndarray): Akaike information criterion per curve, shape (n,)
+        bic (numpy.ndarray): Bayesian information criterion per curve, shape (n,)
+    """
+
+    variables: "NDArray"
+    var_errors: "NDArray"
+    r_squared: "NDArray"
+    converged: "NDArray"
+    residuals: "NDArray"
+    sse: "NDArray"
+    adjusted_r_squared: "NDArray"
+    rmse: "NDArray"
+    aic: "NDArray"
+    bic: "NDArray"
+
+
+def weight_sigma(y_std: "ArrayLike", weighting: str = WEIGHTING) -> "NDArray":
+    """Turn replicate std devs into fit uncertainties under a weighting policy.
+
+    Points with a single replicate, or whose replicates agree exactly, have a
+    std dev of zero, which would give them unbounded weight. Each curve's
+    pooled variance (the mean variance of its points that have one) stands in
+    for the missing spread:
+
+    * "pooled": zero or missing variances are replaced by the pooled variance.
+    * "floor": every variance is at least VARIANCE_FLOOR times the pooled
+      variance, which also caps the weight of unusually tight points.
+    * "none": every point is weighted equally.
+
+    Curves where no point has any spread are fit unweighted under every policy.
+
+    Args:
+        y_std (ArrayLike): y std dev values, shape (m,) or (n, m)
+        weighting (str): one of WEIGHTING_MODES
+
+    Returns:
+        numpy.ndarray: y uncertainties, the same shape as y_std
+    """
+    if weighting not in WEIGHTING_MODES:
+        raise ValueError(
+            f"unknown weighting {weighting!r}, expected one of {WEIGHTING_MODES}"
+        )
+    variance = numpy.asarray(y_std, dtype=numpy.float64) ** 2
+    spread = numpy.isfinite(variance) & (variance > 0)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        pooled = numpy.where(spread, variance, 0.0).sum(
+            axis=-1, keepdims=True
+        ) / spread.sum(axis=-1, keepdims=True)
+    if weighting == "pooled":
+        variance = numpy.where(spread, variance, pooled)
+    else:
+        variance = numpy.fmax(variance, VARIANCE_FLOOR * pooled)
+    unweighted = (weighting == "none") | ~spread.any(axis=-1, keepdims=True)
+    sigma: "NDArray" = numpy.where(unweighted, 1.0, numpy.sqrt(variance))
+    return sigma
+
+
+def point_weights(
+    x: "NDArray", y: "NDArray", sigma: Optional["ArrayLike"]
+) -> "NDArray":
+    """Return 1 / sigma**2 point weights, zero for missing or unusable points."""
+    if sigma is None:
+        weights = numpy.ones_like(y)
+    else:
+        with numpy.errstate(divide="ignore"):
+            weights = (
+                1.0
+                / numpy.broadcast_to(numpy.asarray(sigma, dtype=numpy.float64), y.shape)
+                ** 2
+            )
+    usable = numpy.isfinite(y) & numpy.isfinite(x) & numpy.isfinite(weights)
+    return numpy.where(usable, weights, 0.0)
+
+
+def fit_statistics(
+    y: "ArrayLike",
+    residuals: "ArrayLike",
+    n_variables: int,
+    valid: Optional["ArrayLike"] = None,
+) -> FitStatistics:
+    """Compute goodness of fit from a fit's final residuals.
+
+    Works on the residuals the optimizer finished with, so the model is not
+    evaluated again, and on one curve (shape (m,)) or a stack (shape (n, m))
+    in a single pass. Flat data, where r squared is undefined, reports 1 for
+    an exact fit and 0 otherwise instead of NaN or inf.
+
+    Args:
+        y (ArrayLike): y values
+        residuals (ArrayLike): y minus the fitted y
+        n_variables (int): number of fitted variables
+        valid (ArrayLike, optional): points to include; by default every point
+            where y and the residual are finite
+
+    Returns:
+        FitStatistics: residuals, SSE, r squared, adjusted r squared, RMSE,
+        AIC and BIC, one value per curve
+    """
+    y_values = numpy.asarray(y, dtype=numpy.float64)
+    residual_values = numpy.asarray(residuals, dtype=numpy.float64)
+    if valid is None:
+        included = numpy.isfinite(y_values) & numpy.isfinite(residual_values)
+    else:
+        included = numpy.asarray(valid, dtype=bool)
+    n_points = included.sum(axis=-1)
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        residual_values = numpy.where(included, residual_values, 0.0)
+        centered = numpy.where(included, y_values, 0.0)
+        centered -= centered.sum(axis=-1, keepdims=True) / n_points[..., None]
+        centered[~included] = 0.0
+        sse = numpy.einsum("...i,...i->...", residual_values, residual_values)
+        ss_tot = numpy.einsum("...i,...i->...", centered, centered)
+
+        # Anything within rounding of the y values counts as zero
+        scale = numpy.where(included, numpy.abs(y_values), 0.0).max(axis=-1)
+        tolerance = n_points * (numpy.finfo(numpy.float64).eps * scale) ** 2
+        flat = ss_tot <= tolerance
+        r_squared = numpy.where(
+            flat,
+            (sse <= tolerance).astype(numpy.float64),
+            1 - sse / numpy.where(flat, 1.0, ss_tot),
+        )
+
+        dof = n_points - n_variables
+        adjusted_r_squared = numpy.where(
+            dof > 0, 1 - (1 - r_squared) * (n_points - 1) / dof, numpy.nan
+        )
+        rmse = numpy.sqrt(sse / n_points)
+        log_likelihood = n_points * numpy.log(
+            numpy.maximum(sse / n_points, numpy.finfo(numpy.float64).tiny)
+        )
+        aic = log_likelihood + 2 * n_variables
+        bic = log_likelihood + n_variables * numpy.log(n_points)
+
+    empty = n_points == 0
+    return FitStatistics(
+        numpy.where(included, residual_values, numpy.nan),
+        numpy.where(empty, numpy.nan, sse),
+        numpy.where(empty, numpy.nan, r_squared),
+        adjusted_r_squared,
+        rmse,
+        numpy.where(empty, numpy.nan, aic),
+        numpy.where(empty, numpy.nan, bic),
+    )
+
+
+def stored_values(values: "ArrayLike") -> List[Optional[float]]:
+    """Convert fit results for a JSON store, with None for NaN and inf.
+
+    JSON has no NaN or inf, so a degenerate fit's statistics are stored as
+    null either way; converting them here keeps that explicit.
+
+    Args:
+        values (ArrayLike): values to store
+
+    Returns:
+        List[Optional[float]]: the values, flattened, with None where not finite
+    """
+    flat = numpy.asarray(values, dtype=numpy.float64).ravel()
+    return [float(value) if numpy.isfinite(value) else None for value in flat]
+
+
+def format_statistic(value: Optional[float], spec: str) -> str:
+    """Format a stored fit result for display, or "n/a" if it is missing.
+
+    Args:
+        value (float, optional): value read back from a JSON store
+        spec (str): format specification for finite values
+
+    Returns:
+        str: the formatted value, or "n/a" for None, NaN and inf
+    """
+    if value is None or not numpy.isfinite(value):
+        return "n/a"
+    return format(value, spec)
+
+
+def clean_up_y_data(ys: "pandas.DataFrame") -> Tuple["NDArray", List[float]]:
+    """Take user entered Y values and return average and std dev for plotting.
+
+    Args:
+        ys (pandas.DataFrame): user-entered y-value columns
+
+    Returns:
+        Tuple[numpy.ndarray, List[float]]: average Y and std dev of Y values
+    """
+    values: "NDArray" = ys.replace("", 0).fillna(0).astype(float).to_numpy()
+    y: "NDArray" = values.mean(axis=1)
+    y_std: List[float] = values.std(axis=1).tolist()
+
+    return (y, y_std)
+
+
+def summarize_replicates(y: "ArrayLike") -> Tuple["NDArray", "NDArray"]:
+    """Average replicate measurements for fitting.
+
+    Args:
+        y (ArrayLike): y values, shape (n_curves, n_points, n_replicates);
+            NaN marks a missing replicate
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray]: mean y and std dev of y, shape
+        (n_curves, n_points); NaN where a point has no replicates
+    """
+    replicates = numpy.asarray(y, dtype=numpy.float64)
+    with numpy.errstate(invalid="ignore"):
+        counts = numpy.isfinite(replicates).sum(axis=2)
+        total = numpy.where(numpy.isfinite(replicates), replicates, 0.0).sum(axis=2)
+        mean: "NDArray" = total / counts
+        deviation = numpy.where(
+            numpy.isfinite(replicates), replicates - mean[..., None], 0.0
+        )
+        std = numpy.sqrt((deviation**2).sum(axis=2) / counts)
+    return mean, std
+
+
+def data_key(x: "ArrayLike", ys: "ArrayLike", weighting: str = WEIGHTING) -> str:
+    """Hash the numeric data of a fit, independent of how it was entered.
+
+    Args:
+        x (ArrayLike): x values
+        ys (ArrayLike): replicate y values, one column per replicate
+        weighting (str): weighting policy of the fit
+
+    Returns:
+        str: hex digest naming the fit
+    """
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{weighting}:".encode())
+    for values in (x, ys):
+        # Adding 0.0 turns -0.0 into 0.0, so equal numbers hash equally
+        array = numpy.ascontiguousarray(values, dtype=numpy.float64) + 0.0
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class _SharedLRU(ABC, Generic[Entry]):
+    """Bounded least recently used store, optionally shared through a directory.
+
+    Entries are kept in memory and, given a directory, also as .npz files
+    there, so every process serving an app (e.g. gunicorn workers) can find
+    an entry any of them has stored. A directory on a tmpfs such as /dev/shm
+    shares entries through memory.
+
+    Args:
+        max_entries (int): entries kept in memory, and files kept on disk
+            unless max_age is given
+        directory (str, optional): directory shared between processes
+        max_age (float, optional): seconds a file is kept after its last use;
+            given this, files are evicted by age rather than by number
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        directory: Optional[str] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        """Return the entry for key, or None on a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        if self.directory is None:
+            return value
+
+        entry = os.path.join(self.directory, f"{key}.npz")
+        if value is None:
+            try:
+                with numpy.load(entry, allow_pickle=False) as data:
+                    value = self._read(data)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                return None
+            self._remember(key, value)
+        try:
+            os.utime(entry)  # mark as recently used for eviction
+        except OSError:
+            pass  # a read-only cache still serves what it holds
+        return value
+
+    def put(self, key: str, value: Entry) -> None:
+        """Store the entry for key, evicting the least recently used."""
+        self._remember(key, value)
+        if self.directory is None:
+            return
+
+        try:
+            self._write(key, value)
+        except OSError:
+            return  # a read-only or full cache is not an error
+
+    @abstractmethod
+    def _read(self, data: Any) -> Entry:
+        """Rebuild an entry from the arrays of its .npz file."""
+
+    @abstractmethod
+    def _arrays(self, value: Entry) -> Dict[str, Any]:
+        """Return the arrays to save for an entry."""
+
+    def _remember(self, key: str, value: Entry) -> None:
+        """Add an entry to the in-memory entries."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _write(self, key: str, value: Entry) -> None:
+        """Save an entry to the directory, raising OSError if it cannot."""
+        assert self.directory is not None
+        os.makedirs(self.directory, exist_ok=True)
+        handle, partial = tempfile.mkstemp(suffix=".part", dir=self.directory)
+        try:
+            with os.fdopen(handle, "wb") as f:
+                numpy.savez(f, **self._arrays(value))
+            os.replace(partial, os.path.join(self.directory, f"{key}.npz"))
+        except OSError:
+            _remove_quietly(partial)
+            raise
+        self._evict_files()
+
+    def _evict_files(self) -> None:
+        """Delete files unused for max_age, or least recently used past max_entries."""
+        assert self.directory is not None
+        entries = []
+        for path in Path(self.directory).glob("*.npz"):
+            try:
+                entries.append((path.stat().st_mtime, str(path)))
+            except OSError:
+                continue  # evicted by another process
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            stale = [entry for used, entry in entries if used < cutoff]
+        else:
+            entries.sort()
+            excess = max(len(entries) - self.max_entries, 0)
+            stale = [entry for _, entry in entries[:excess]]
+        for entry in stale:
+            _remove_quietly(entry)
+
+
+class FitCache(_SharedLRU[FitResult]):
+    """Bounded least recently used memo of FitResults, keyed by data_key.
+
+    Args:
+        max_entries (int): results kept in memory, and files kept on disk
+        directory (str, optional): directory shared between processes
+    """
+
+    def __init__(
+        self, max_entries: int = CACHE_ENTRIES, directory: Optional[str] = None
+    ) -> None:
+        super().__init__(max_entries, directory)
+
+    def _read(self, data: Any) -> FitResult:
+        return FitResult(
+            data["y"],
+            data["y_std"],
+            data["variables"],
+            data["var_errors"],
+            FitStatistics(*(data[field] for field in FitStatistics._fields)),
+        )
+
+    def _arrays(self, value: FitResult) -> Dict[str, Any]:
+        return {
+            "y": value.y,
+            "y_std": value.y_std,
+            "variables": value.variables,
+            "var_errors": value.var_errors,
+            **value.statistics._asdict(),
+        }
+
+
+class DatasetStore(_SharedLRU["pandas.DataFrame"]):
+    """Store of data tables kept on the server, as files in a shared directory.
+
+    The directory is where tables live, so a table is never lost to a busy
+    store or to a request served by another process; only its files unused
+    for max_age are deleted. The most recently used tables are also kept in
+    memory. Tables are numeric and keyed by a hash of their contents, so
+    storing the same table twice gives the same key.
+
+    Args:
+        directory (str): directory shared between processes
+        max_entries (int): tables kept in memory
+        max_age (float): seconds a table is kept after its last use
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_entries: int = DATASET_ENTRIES,
+        max_age: float = DATASET_MAX_AGE,
+    ) -> None:
+        super().__init__(max_entries, directory, max_age)
+
+    @staticmethod
+    def key(table: "pandas.DataFrame") -> str:
+        """Return the key a table is stored under, without storing it."""
+        values = table.to_numpy(dtype=numpy.float64)
+        digest = hashlib.sha256(f"{CACHE_VERSION}:".encode())
+        digest.update(json.dumps([str(c) for c in table.columns]).encode())
+        digest.update(data_key(values[:, :1], values[:, 1:]).encode())
+        return digest.hexdigest()
+
+    def add(self, table: "pandas.DataFrame") -> str:
+        """Store a table and return the key to fetch it by.
+
+        Raises:
+            OSError: if the table cannot be saved to the directory
+        """
+        key = self.key(table)
+        self._write(key, table)
+        self._remember(key, table)
+        return key
+
+    def _read(self, data: Any) -> "pandas.DataFrame":
+        import pandas
+
+        return pandas.DataFrame(data["values"], columns=data["columns"].tolist())
+
+    def _arrays(self, value: "pandas.DataFrame") -> Dict[str, Any]:
+        return {
+            "columns": numpy.array([str(c) for c in value.columns]),
+            "values": value.to_numpy(dtype=numpy.float64),
+        }
+
+
+def read_upload(contents: str, filename: str) -> "pandas.DataFrame":
+    """Parse a table uploaded through dcc.Upload, as CSV or Excel by extension.
+
+    CSV is read by pandas' multithreaded pyarrow engine when pyarrow is
+    installed, and by its C engine otherwise; Excel needs openpyxl. The first
+    column becomes X and the rest are replicates, as in the app's data table,
+    with an underscore added to any replicate named X or ROW_ID; values that
+    are not numbers are read as NaN and empty rows are dropped.
+
+    Args:
+        contents (str): base64 data URL given by dcc.Upload
+        filename (str): name of the uploaded file
+
+    Returns:
+        pandas.DataFrame: numeric table with an X column first
+    """
+    import pandas
+
+    raw = io.BytesIO(base64.b64decode(contents.partition(",")[2]))
+    table: "pandas.DataFrame"
+    if Path(filename).suffix.lower() in (".xlsx", ".xlsm", ".xls"):
+        table = pandas.read_excel(raw)
+    else:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            table = pandas.read_csv(raw)
+        else:
+            table = pandas.read_csv(raw, engine="pyarrow")
+
+    table = table.apply(pandas.to_numeric, errors="coerce").astype(float)
+    table = table.dropna(how="all").reset_index(drop=True)
+    names = [str(c) for c in table.columns[1:]]
+    reserved = ("X", ROW_ID)
+    table.columns = ["X", *(f"{name}_" if name in reserved else name for name in names)]
+    return table
+
+
+def _remove_quietly(path: str) -> bool:
+    """Remove a file if it still exists and can be, returning whether it was."""
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    return True
+
+
+def read_table(path: str) -> "pandas.DataFrame":
+    """Read a CSV or Parquet data table, chosen by file extension.
+
+    Args:
+        path (str): .csv, .parquet or .pq file; "-" reads CSV from stdin
+
+    Returns:
+        pandas.DataFrame: the table
+    """
+    import pandas
+
+    if Path(path).suffix.lower() in (".parquet", ".pq"):
+        return pandas.read_parquet(path)
+    return pandas.read_csv(sys.stdin if path == "-" else path)
+
+
+def write_table(table: "pandas.DataFrame", path: str) -> None:
+    """Write a result table as CSV or Parquet, chosen by file extension.
+
+    Args:
+        table (pandas.DataFrame): results
+        path (str): .csv, .parquet or .pq file; "-" writes CSV to stdout
+    """
+    if Path(path).suffix.lower() in (".parquet", ".pq"):
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(sys.stdout if path == "-" else path, index=False)
+
+
+def table_curves(
+    table: "pandas.DataFrame", x_column: str = "X", group: Optional[str] = None
+) -> Tuple[List[str], "NDArray", "NDArray"]:
+    """Arrange a data table as stacked curves with replicates.
+
+    Every column other than the x and group columns is a replicate, as in the
+    app's data table. Without a group column the whole table is one curve;
+    with one, each distinct group value is a curve, rows with a blank group
+    cell are the curve BLANK_GROUP, and shorter curves are padded with NaN.
+
+    Args:
+        table (pandas.DataFrame): data table
+        x_column (str): name of the x column
+        group (str, optional): name of the column naming each curve
+
+    Returns:
+        Tuple[List[str], numpy.ndarray, numpy.ndarray]: curve names, x values
+        shape (n_curves, n_points) and y values shape (n_curves, n_points,
+        n_replicates)
+    """
+    import pandas
+
+    y_columns = [c for c in table.columns if c not in (x_column, group)]
+    x_values = pandas.to_numeric(table[x_column], errors="coerce").to_numpy(float)
+    y_values = (
+        table[y_columns].apply(pandas.to_numeric, errors="coerce").to_numpy(float)
+    )
+    if group is None:
+        return [""], x_values[None, :], y_values[None, :, :]
+
+    # Rows with a blank group cell, e.g. an unlabelled well, form one curve
+    labels = table[group].astype(object)
+    blank = labels.isna() | (labels.astype(str).str.strip() == "")
+    labels = labels.where(~blank, BLANK_GROUP)
+
+    # Scatter rows into place by (curve, position within curve)
+    grouped = table.groupby(labels, sort=False)
+    curve = grouped.ngroup().to_numpy()
+    position = grouped.cumcount().to_numpy()
+    n_curves = int(curve.max()) + 1 if len(curve) else 0
+    n_points = int(position.max()) + 1 if len(position) else 0
+    x = numpy.full((n_curves, n_points), numpy.nan)
+    y = numpy.full((n_curves, n_points, len(y_columns)), numpy.nan)
+    x[curve, position] = x_values
+    y[curve, position] = y_values
+    names = [str(name) for name in grouped.groups]
+    return names, x, y
+
+
+def fit_data(
+    model: CurveModel,
+    x: "NDArray",
+    y: "NDArray",
+    y_std: List[float],
+    weighting: str = WEIGHTING,
+) -> Tuple["NDArray", "NDArray", FitStatistics]:
+    """Perform curve fitting against the average data.
+
+    Starts from the model's initial guess and gives the optimizer the model's
+    analytic Jacobian.
+
+    Args:
+        model (CurveModel): model to fit
+        x (numpy.ndarray): x values
+        y (numpy.ndarray): average y values
+        y_std (List[float]): y std dev values
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray, FitStatistics]: fitting variables,
+        associated errors and fit statistics, taken from the optimizer's final
+        residuals
+    """
+    from scipy.optimize import curve_fit
+
+    sigma = weight_sigma(y_std, weighting)
+    variables, cov, info, _, _ = curve_fit(
+        model.equation,
+        x,
+        y,
+        p0=model.initial_guess(x, y, sigma),
+        sigma=sigma,
+        jac=model.jacobian,
+        full_output=True,
+    )
+    var_errors: "NDArray" = numpy.sqrt(numpy.diag(cov))
+    # fvec holds the final (model - y) / sigma
+    statistics = fit_statistics(y, -info["fvec"] * sigma, len(variables))
+
+    return (variables, var_errors, statistics)
+
+
+def find_r_squared(
+    model: CurveModel, x: "NDArray", y: "NDArray", variables: "NDArray"
+) -> float:
+    """Find r squared value of fit
+
+    Evaluates the model again; fit_data already returns r squared with the
+    rest of its fit statistics.
+
+    Args:
+        model (CurveModel): fitted model
+        x (numpy.ndarray): x values
+        y (numpy.ndarray): average y values
+        variables (numpy.ndarray): fitting variables
+
+    Returns:
+        float: r squared value
+    """
+    residuals: "NDArray" = y - model.equation(x, *variables)
+    r_squared = float(fit_statistics(y, residuals, len(variables)).r_squared)
+
+    return r_squared
+
+
+def fit_replicates(
+    model: CurveModel,
+    x: "NDArray",
+    ys: "pandas.DataFrame",
+    cache: Optional[FitCache] = None,
+    weighting: str = WEIGHTING,
+) -> FitResult:
+    """Clean up and fit the app's table data, reusing a cached fit if possible.
+
+    Args:
+        model (CurveModel): model to fit
+        x (numpy.ndarray): x values
+        ys (pandas.DataFrame): user-entered y-value columns
+        cache (FitCache, optional): cache of earlier fits, of this model only
+        weighting (str): policy for points without spread, see weight_sigma
+
+    Returns:
+        FitResult: average y, std dev of y, fitting variables, errors and
+        statistics
+    """
+    key = data_key(x, ys.replace("", 0).fillna(0).astype(float), weighting)
+    result = cache.get(key) if cache is not None else None
+    if result is None:
+        y, y_std = clean_up_y_data(ys)
+        fit = fit_data(model, x, y, y_std, weighting)
+        result = FitResult(y, numpy.asarray(y_std), *fit)
+        if cache is not None:
+            cache.put(key, result)
+    return result
+
+
+def fit_tables_main(
+    fit_table: Callable[..., "pandas.DataFrame"],
+    prog: str,
+    description: str,
+    argv: Optional[Sequence[str]] = None,
+    parallel_curves: Optional[int] = None,
+) -> None:
+    """Fit the curves in data tables and write a results table.
+
+    The command line of every fitting core: each input table is fit with
+    fit_table(table, x_column, group, weighting=...) and the results are
+    written as one table, with the input file first.
+
+    Args:
+        fit_table (Callable[..., pandas.DataFrame]): the core's fit_table
+        prog (str): program name for the help text
+        description (str): program description for the help text
+        argv (Sequence[str], optional): arguments; None reads sys.argv
+        parallel_curves (int, optional): if given, fit_table takes workers=
+            and -j is offered, fitting tables of this many curves or more on
+            every core by default
+    """
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    parser.add_argument(
+        "inputs", nargs="+", help="CSV or Parquet data tables ('-' for stdin)"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="results table, CSV or Parquet by extension (default: stdout)",
+    )
+    parser.add_argument(
+        "-x", "--x-column", default="X", help="x column name (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-g",
+        "--group",
+        help="column naming the curve of each row, for tables holding many curves",
+    )
+    if parallel_curves is not None:
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=None,
+            help="worker processes (default: all cores for tables of "
+            f"{parallel_curves} curves or more, otherwise one)",
+        )
+    parser.add_argument(
+        "-w",
+        "--weighting",
+        choices=WEIGHTING_MODES,
+        default=WEIGHTING,
+        help="weighting of points without replicate spread (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    options = {"weighting": args.weighting}
+    if parallel_curves is not None:
+        options["workers"] = args.jobs
+
+    import pandas
+
+    results = []
+    for path in args.inputs:
+        table = fit_table(read_table(path), args.x_column, args.group, **options)
+        table.insert(0, "file", path)
+        results.append(table)
+    write_table(pandas.concat(results, ignore_index=True), args.output)
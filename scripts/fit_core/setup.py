@@ -0,0 +1,37 @@
+"""Setup module for fit_core, the shared support of the curve fitting cores."""
+
+# Always prefer setuptools over distutils
+from pathlib import Path
+
+from setuptools import setup
+
+here = Path(__file__).parent.resolve()
+
+# Get the long description from the README file
+long_description = (here / "README.md").read_text(encoding="utf-8")
+
+# Setup via pip
+setup(
+    name="fit_core",
+    version="1.0.0",
+    author="Andrew J. Bonham",
+    author_email="abonham@msudenver.edu",
+    description="Shared fitting, statistics, caches and table readers for curve fits.",
+    license="GPLv3",
+    long_description=long_description,
+    long_description_content_type="text/markdown",
+    url="https://github.com/Paradoxdruid/pychemistry/tree/master/scripts/fit_core",
+    py_modules=["fit_core"],
+    classifiers=[
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3 :: Only",
+        "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
+        "Operating System :: OS Independent",
+    ],
+    keywords="chemistry, biochemistry, curve fitting",
+    python_requires=">=3.8",
+    install_requires=["numpy", "scipy", "pandas"],
+    extras_require={"parquet": ["pyarrow"], "excel": ["openpyxl", "xlrd"]},
+)
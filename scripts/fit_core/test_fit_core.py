@@ -0,0 +1,214 @@
+"""Tests for fit_core."""
+
+import base64
+import io
+import os
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy
+import pandas
+import pytest
+
+from fit_core import (
+    BLANK_GROUP,
+    ROW_ID,
+    CurveModel,
+    DatasetStore,
+    FitCache,
+    FitResult,
+    _SharedLRU,
+    fit_replicates,
+    fit_statistics,
+    format_statistic,
+    point_weights,
+    read_upload,
+    stored_values,
+    table_curves,
+    weight_sigma,
+)
+
+
+def _line(x: Any, slope: Any, intercept: Any) -> Any:
+    return slope * x + intercept
+
+
+def _line_jacobian(x: Any, slope: Any, intercept: Any) -> Any:
+    return numpy.stack(numpy.broadcast_arrays(x, numpy.ones_like(x)), axis=-1)
+
+
+LINE = CurveModel(_line, _line_jacobian, lambda x, y, sigma: numpy.ones(2))
+
+
+def test_fit_replicates_fits_the_model_and_caches_it(tmp_path: Path) -> None:
+    x = numpy.array([0.0, 1.0, 2.0, 3.0])
+    ys = pandas.DataFrame({"Y1": _line(x, 2.0, 1.0) + 0.1, "Y2": _line(x, 2.0, 1.0)})
+    cache = FitCache(directory=str(tmp_path))
+
+    result = fit_replicates(LINE, x, ys, cache)
+
+    numpy.testing.assert_allclose(result.variables, [2.0, 1.05])
+    numpy.testing.assert_allclose(result.y, _line(x, 2.0, 1.05))
+    assert float(result.statistics.r_squared) == pytest.approx(1.0)
+
+    def unreachable(*args: object) -> Any:
+        raise AssertionError("a cached fit should not be refit")
+
+    refit = CurveModel(_line, _line_jacobian, unreachable)
+    cached = fit_replicates(refit, x, ys, FitCache(directory=str(tmp_path)))
+    numpy.testing.assert_array_equal(cached.variables, result.variables)
+
+
+def test_non_finite_results_stored_as_none() -> None:
+    stored = stored_values(numpy.array([0.5, numpy.nan, numpy.inf]))
+
+    assert stored == [0.5, None, None]
+    assert [format_statistic(value, "0.3g") for value in stored] == [
+        "0.5",
+        "n/a",
+        "n/a",
+    ]
+    assert format_statistic(float("nan"), "0.3e") == "n/a"
+
+
+# Replicate std devs with no spread at the first point; the others pool to a
+# variance of (0.25 + 1 + 12.25) / 3 = 4.5, so the floor is 0.45
+Y_STD = [0.0, 0.5, 1.0, 3.5]
+
+
+@pytest.mark.parametrize(
+    "weighting, expected",
+    [
+        ("pooled", [4.5**0.5, 0.5, 1.0, 3.5]),
+        ("floor", [0.45**0.5, 0.45**0.5, 1.0, 3.5]),
+        ("none", [1.0, 1.0, 1.0, 1.0]),
+    ],
+)
+def test_weight_sigma_policies(weighting: str, expected: List[float]) -> None:
+    # The second curve has no spread at any point, so is fit unweighted
+    sigma = weight_sigma([Y_STD, [0.0] * 4], weighting)
+
+    numpy.testing.assert_allclose(sigma, [expected, [1.0] * 4])
+
+
+def test_weight_sigma_rejects_unknown_policy() -> None:
+    with pytest.raises(ValueError, match="unknown weighting"):
+        weight_sigma(Y_STD, "max")
+
+
+@pytest.mark.parametrize(
+    "weighting, expected",
+    [
+        ("pooled", [1 / 4.5, 4.0, 0.0, 1 / 12.25]),
+        ("floor", [1 / 0.45, 1 / 0.45, 0.0, 1 / 12.25]),
+        ("none", [1.0, 1.0, 0.0, 1.0]),
+        # Unadjusted, the zero-variance replicate would get infinite weight
+        # and is dropped instead
+        (None, [0.0, 4.0, 0.0, 1 / 12.25]),
+    ],
+)
+def test_point_weights(weighting: Optional[str], expected: List[float]) -> None:
+    x = numpy.array([1.0, 2.0, 3.0, 4.0])
+    y = numpy.array([1.0, 2.0, numpy.nan, 4.0])  # a missing point has no weight
+    sigma = Y_STD if weighting is None else weight_sigma(Y_STD, weighting)
+
+    numpy.testing.assert_allclose(point_weights(x, y, sigma), expected)
+    numpy.testing.assert_array_equal(point_weights(x, y, None), [1.0, 1.0, 0.0, 1.0])
+
+
+def test_shared_lru_is_abstract() -> None:
+    with pytest.raises(TypeError, match="abstract"):
+        _SharedLRU(4)  # type: ignore[abstract]
+
+
+def test_fit_cache_shared_through_directory(tmp_path: Path) -> None:
+    y = numpy.array([1.0, 2.0, 3.0])
+    result = FitResult(
+        y,
+        numpy.zeros(3),
+        numpy.array([1.0, 2.0]),
+        numpy.array([0.1, 0.2]),
+        fit_statistics(y, numpy.array([0.0, 0.1, -0.1]), 2),
+    )
+    FitCache(directory=str(tmp_path)).put("key", result)
+
+    cached = FitCache(directory=str(tmp_path)).get("key")
+
+    assert cached is not None
+    numpy.testing.assert_array_equal(cached.variables, result.variables)
+    numpy.testing.assert_array_equal(cached.statistics.sse, result.statistics.sse)
+
+
+def test_dataset_store_keeps_tables_until_unused(tmp_path: Path) -> None:
+    store = DatasetStore(str(tmp_path), max_entries=1, max_age=60.0)
+    tables = [pandas.DataFrame({"X": [float(i)], "Y1": [1.0]}) for i in range(3)]
+    keys = [store.add(table) for table in tables]
+
+    # Only one table fits in memory, but every table is still on disk
+    for key, table in zip(keys, tables):
+        stored = DatasetStore(str(tmp_path)).get(key)
+        assert stored is not None
+        pandas.testing.assert_frame_equal(stored, table)
+
+    stale = tmp_path / f"{keys[0]}.npz"
+    os.utime(stale, (0.0, 0.0))
+    store.add(pandas.DataFrame({"X": [3.0], "Y1": [1.0]}))
+    assert not stale.exists()
+    assert DatasetStore(str(tmp_path)).get(keys[0]) is None
+    assert len(list(tmp_path.glob("*.npz"))) == 3
+
+
+def test_dataset_store_reports_unsaved_tables(tmp_path: Path) -> None:
+    blocked = tmp_path / "file"
+    blocked.write_text("not a directory")
+    store = DatasetStore(str(blocked / "tables"))
+
+    with pytest.raises(OSError):
+        store.add(pandas.DataFrame({"X": [1.0], "Y1": [1.0]}))
+
+
+def test_table_curves_labels_blank_groups() -> None:
+    table = pandas.DataFrame(
+        {
+            "X": [1.0, 2.0, 1.0, 2.0, 1.0],
+            "Y1": [2.0, 3.0, 4.0, 5.0, 6.0],
+            "well": ["A1", "A1", None, "", "B1"],
+        }
+    )
+
+    names, x, y = table_curves(table, group="well")
+
+    assert names == ["A1", BLANK_GROUP, "B1"]
+    numpy.testing.assert_array_equal(x, [[1.0, 2.0], [1.0, 2.0], [1.0, numpy.nan]])
+    numpy.testing.assert_array_equal(
+        y[:, :, 0], [[2.0, 3.0], [4.0, 5.0], [6.0, numpy.nan]]
+    )
+
+
+def _data_url(data: bytes) -> str:
+    return "data:application/octet-stream;base64," + base64.b64encode(data).decode()
+
+
+def test_read_upload_csv() -> None:
+    csv = f"conc,X,{ROW_ID},Y\n1,2,3,oops\n,,,\n2,4,6,8\n".encode()
+
+    table = read_upload(_data_url(csv), "plate.CSV")
+
+    assert list(table.columns) == ["X", "X_", f"{ROW_ID}_", "Y"]
+    numpy.testing.assert_array_equal(
+        table.to_numpy(), [[1.0, 2.0, 3.0, numpy.nan], [2.0, 4.0, 6.0, 8.0]]
+    )
+
+
+def test_read_upload_xlsx() -> None:
+    pytest.importorskip("openpyxl")
+    sheet = io.BytesIO()
+    pandas.DataFrame({"conc": [1.0, 2.0], "Y1": [3.0, 4.0]}).to_excel(
+        sheet, index=False
+    )
+
+    table = read_upload(_data_url(sheet.getvalue()), "plate.xlsx")
+
+    pandas.testing.assert_frame_equal(
+        table, pandas.DataFrame({"X": [1.0, 2.0], "Y1": [3.0, 4.0]})
+    )
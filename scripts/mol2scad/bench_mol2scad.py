@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks for mol2scad parsing and emission on synthetic molfiles.
+
+Usage:
+    python bench_mol2scad.py [max atoms, default 1000000]
+"""
+
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import mol2scad
+import numpy
+
+
+def write_chain_molfile(path: Path, n_atoms: int) -> None:
+    """Write a zig-zag carbon chain of n_atoms atoms as a molfile.
+
+    Chains of up to 999 atoms use the fixed V2000 columns throughout; longer
+    ones have counts and bonds too wide for them, so those are written
+    whitespace-separated, which mol2scad reads in its relaxed mode.
+    """
+    with open(path, "w") as f:
+        f.write(f"chain{n_atoms}\n  mol2scad-bench\n\n")
+        if n_atoms <= 999:
+            f.write(f"{n_atoms:3d}{n_atoms - 1:3d}  0  0  0  0  0  0  0  0999 V2000\n")
+        else:
+            f.write(f"{n_atoms} {n_atoms - 1}  0  0  0  0  0  0  0  0999 V2000\n")
+        for i in range(n_atoms):
+            x = (i % 10000) * 1.25
+            y = (i // 10000) * 2.5 + 0.8 * (i % 2)
+            f.write(
+                f"{x:10.4f}{y:10.4f}{0.0:10.4f} C   0  0  0  0  0  0  0  0  0  0  0  0\n"
+            )
+        for i in range(1, n_atoms):
+            if n_atoms <= 999:
+                f.write(f"{i:>3}{i + 1:>3}  1  0  0  0  0\n")
+            else:
+                f.write(f"{i} {i + 1} 1 0 0 0 0\n")
+        f.write("M  END\n")
+
+
+def best_of(repeats: int, function: Callable[[], object]) -> float:
+    """Return the best wall-clock time of several runs."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_parse(sizes: List[int], workdir: Path) -> None:
+    """Time the line-based and memory-mapped V2000 parsers per atom."""
+    print(f"{'atoms':>10} {'lines (s)':>12} {'mmap (s)':>10} {'us / atom':>10}")
+    for n_atoms in sizes:
+        path = workdir / f"chain_{n_atoms}.mol"
+        write_chain_molfile(path, n_atoms)
+
+        def parse_lines() -> None:
+            for lines in mol2scad.iter_records(str(path)):
+                mol2scad.parse_molfile(lines)
+
+        def parse_mmap() -> None:
+            for _ in mol2scad.read_molfile(str(path)):
+                pass
+
+        repeats = 3 if n_atoms < 10**6 else 1
+        lines_time = best_of(repeats, parse_lines)
+        mmap_time = best_of(repeats, parse_mmap)
+        print(
+            f"{n_atoms:>10} {lines_time:>12.4f} {mmap_time:>10.4f} "
+            f"{1e6 * mmap_time / n_atoms:>10.3f}"
+        )
+
+
+def legacy_format_body(molecule: mol2scad.Molecule) -> str:
+    """Per-row str.format emitter that write_body replaced, for comparison."""
+    radii = numpy.where(molecule.elements == mol2scad.ELEMENT_CODES["H"], ".4", ".6")
+    output_one = "".join(
+        [
+            "atom({0}, {1}, {2}, {3}); // {4} \n".format(atomsize, x, y, z, i)
+            for i, (atomsize, (x, y, z)) in enumerate(
+                zip(radii.tolist(), molecule.coords.tolist()), start=1
+            )
+        ]
+    )
+    output_two = "".join(
+        [
+            "bond( {0}, {1}, {2}, {3}, {4}, {5}); // {6} - {7} \n".format(
+                *part_one, *part_two, first, second
+            )
+            for (part_one, part_two), (first, second) in zip(
+                molecule.bond_endpoints().tolist(), (molecule.bonds + 1).tolist()
+            )
+        ]
+    )
+    return output_one + output_two
+
+
+def bench_emit(sizes: List[int], workdir: Path) -> None:
+    """Compare the per-row emitter against the bulk write_body emitter."""
+    print(f"{'atoms':>10} {'per-row (s)':>12} {'bulk (s)':>10} {'speedup':>8}")
+    for n_atoms in sizes:
+        path = workdir / f"chain_{n_atoms}.mol"
+        if not path.exists():
+            write_chain_molfile(path, n_atoms)
+        with open(path) as f:
+            molecule = mol2scad.parse_molfile(f)
+        repeats = 3 if n_atoms < 10**6 else 1
+
+        def legacy() -> None:
+            io.StringIO().write(legacy_format_body(molecule))
+
+        def bulk() -> None:
+            mol2scad.write_body(io.StringIO(), molecule)
+
+        legacy_time = best_of(repeats, legacy)
+        bulk_time = best_of(repeats, bulk)
+        print(
+            f"{n_atoms:>10} {legacy_time:>12.4f} {bulk_time:>10.4f} "
+            f"{legacy_time / bulk_time:>7.1f}x"
+        )
+
+
+def bench_bonds(sizes: List[int]) -> None:
+    """Time cell-list bond perception on random atoms at liquid density."""
+    rng = numpy.random.default_rng(0)
+    print(f"{'atoms':>10} {'bonds':>10} {'perceive (s)':>12} {'us / atom':>10}")
+    for n_atoms in sizes:
+        box = (n_atoms * 12.0) ** (1 / 3)
+        coords = rng.random((n_atoms, 3)) * box
+        elements = rng.choice(
+            numpy.array([1, 6, 7, 8], dtype=numpy.uint8), size=n_atoms
+        )
+        bonds = mol2scad.perceive_bonds(coords, elements)
+
+        elapsed = best_of(
+            3 if n_atoms < 10**6 else 1,
+            lambda: mol2scad.perceive_bonds(coords, elements),
+        )
+        print(
+            f"{n_atoms:>10} {len(bonds):>10} {elapsed:>12.4f} "
+            f"{1e6 * elapsed / n_atoms:>10.3f}"
+        )
+
+
+def main() -> None:
+    max_atoms = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    sizes = [n for n in (10**3, 10**4, 10**5, 10**6) if n <= max_atoms]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_parse(sizes, Path(tmp))
+        print()
+        bench_emit(sizes, Path(tmp))
+    print()
+    bench_bonds(sizes)
+
+
+if __name__ == "__main__":
+    main()
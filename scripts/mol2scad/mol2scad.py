@@ -6,7 +6,7 @@ Takes molfile / sdf coordinates as input, outputs a scad file for OpenSCAD
 """
 
 __author__ = "Andrew J. Bonham"
-__version__ = "1.0.0"
+__version__ = "1.1.0"
 __status__ = "Production"
 
 # Based on on makebucky.scad at http://www.thingiverse.com/thing:12675
@@ -16,12 +16,51 @@ __status__ = "Production"
 
 # Import Dependencies
 
-import getopt
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import mmap
+import os
+import re
 import sys
-from typing import List, Tuple
+import tempfile
+import time
+import warnings
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    overload,
+)
 
-# Common string header
-COMMON_START = """/*
+import numpy
+
+if TYPE_CHECKING:  # pragma: no cover
+    # Subscripting ndarray at runtime needs numpy 1.22 and Python 3.9
+    NDArray = numpy.ndarray[Any, numpy.dtype[Any]]
+
+# Common module definitions
+COMMON_MODULES = """/*
 
 Creates a model of a molcule from a set
 of orthogonal coordinates
@@ -31,7 +70,7 @@ of orthogonal coordinates
 module atom(rx,x0,y0,z0)
 {
 translate(v=[x0,y0,z0])
-sphere(r=rx,$fn=10);
+sphere(r=rx);
 }
 
 /* spheres of radius rx are placed at the atomic
@@ -53,132 +92,1963 @@ az = z2 - z1;
 translate(v=[tx,ty,tz])
 // rotate command by d moews -
 rotate(a = [-acos(az/sqrt(ax*ax+ay*ay+az*az)), 0, -atan2(ax, ay)])
-cylinder(r=.2,h=sqrt(ax*ax+ay*ay+az*az),center=true,$fn=10);
+cylinder(r=.2,h=sqrt(ax*ax+ay*ay+az*az),center=true);
 }
 
 
 
+/* sphere and cylinder resolution comes from the
+file-wide $fn set below
+*/
+
+
+
+"""
+
+# Geometry fixed by the atom() and bond() modules, mirrored by the STL mesher
+SEGMENTS = 10
+BOND_RADIUS = 0.2
+
+# Common string header
+COMMON_START = COMMON_MODULES + f"""$fn = {SEGMENTS};
+
 union()
+{{
+"""
+
+# Extra module for loop mode, which stores each molecule as data arrays
+LOOP_MODULES = """/* atoms are [rx, x0, y0, z0] rows; bonds are
+zero-based [atom, atom] index pairs into atoms
+*/
+
+module molecule(atoms, bonds)
 {
+for (a = atoms) atom(a[0], a[1], a[2], a[3]);
+for (b = bonds) bond(atoms[b[0]][1], atoms[b[0]][2], atoms[b[0]][3],
+atoms[b[1]][1], atoms[b[1]][2], atoms[b[1]][3]);
+}
+
+
+
 """
 
+# Output modes: one module call per atom / bond, data arrays and a loop, or
+# a binary STL mesh tessellated without OpenSCAD
+EMIT_MODES = ("modules", "loop", "stl")
+
+# Level of detail: automatic $fn by atom count, as (max atoms, $fn) steps,
+# and the $fn range searched to fit a triangle budget
+AUTO_SEGMENTS = ((100, 24), (1000, 16), (10000, 10), (100000, 8))
+MIN_SEGMENTS = 6
+MAX_SEGMENTS = 32
+
+# Binary STL triangle record: facet normal, three vertices, attribute bytes
+STL_DTYPE = numpy.dtype(
+    [("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attribute", "<u2")]
+)
+STL_HEADER = b"mol2scad binary STL".ljust(80, b" ")
+
+# Spheres or cylinders meshed per vectorized STL chunk
+STL_CHUNK = 4096
+
+# Rows formatted per bulk write by write_body
+EMIT_CHUNK = 65536
+
+# Atom or bond lines decoded per vectorized step of the memory-mapped parser
+PARSE_CHUNK = 65536
+
+# Records shorter than this many bytes are decoded as text and parsed by line
+SMALL_RECORD = 1 << 16
+
+# Bytes scanned per step when locating the lines of an atom or bond block
+SCAN_CHUNK = 1 << 22
+
+# Bond perception: atoms i and j are bonded when their distance lies between
+# MIN_BOND_LENGTH and covalent radius i + covalent radius j + BOND_TOLERANCE
+BOND_TOLERANCE = 0.45
+MIN_BOND_LENGTH = 0.4
+
+# Where bonds come from: the file, perceived from coordinates, or perceived
+# only when the file lists none
+BOND_MODES = ("auto", "file", "perceive")
+
+# Values in a CIF loop line: quoted strings (closed by a quote followed by
+# whitespace) or bare words
+CIF_TOKEN = re.compile(r"""'.*?'(?=\s|$)|".*?"(?=\s|$)|\S+""")
+
+# Atoms whose neighbor cells are searched per vectorized perception chunk
+PERCEIVE_CHUNK = 65536
+
+# On-disk cache of parsed molecules: entries are .npz files named by a hash of
+# the input contents, evicted least recently used first past CACHE_SIZE bytes.
+# Bump CACHE_VERSION whenever parsing results change.
+CACHE_VERSION = 1
+CACHE_SIZE = 1 << 30
+
+# Files whose parsed molecules would exceed this many bytes are not cached, so
+# streaming large libraries does not hold them in memory
+CACHE_ENTRY_LIMIT = 1 << 28
+
+# Bytes read per step when hashing an input file
+HASH_CHUNK = 1 << 20
+
+# Extensions read as V2000 molfile / sdf text; files with an extension that no
+# reader is registered for are read as molfiles too
+MOLFILE_EXTENSIONS = (".mol", ".mdl", ".sdf", ".sd")
+
+# Element symbols indexed by atomic number; code 0 holds unknown / query atoms
+ELEMENTS: Tuple[str, ...] = (
+    "X",
+    *"H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca".split(),
+    *"Sc Ti V Cr Mn Fe Co Ni Cu Zn Ga Ge As Se Br Kr Rb Sr Y Zr".split(),
+    *"Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce Pr Nd".split(),
+    *"Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg".split(),
+    *"Tl Pb Bi Po At Rn Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm".split(),
+    *"Md No Lr Rf Db Sg Bh Hs Mt Ds Rg Cn Nh Fl Mc Lv Ts Og".split(),
+)
+ELEMENT_CODES: Dict[str, int] = {symbol: i for i, symbol in enumerate(ELEMENTS)}
+
+# Covalent radii in angstroms indexed by atomic number (Cordero et al., Dalton
+# Trans. 2008, 2832); elements past Cm and unknown atoms use 1.5
+COVALENT_RADII = numpy.full(len(ELEMENTS), 1.5)
+COVALENT_RADII[1:97] = [
+    *(0.31, 0.28, 1.28, 0.96, 0.84, 0.76, 0.71, 0.66, 0.57, 0.58),
+    *(1.66, 1.41, 1.21, 1.11, 1.07, 1.05, 1.02, 1.06, 2.03, 1.76),
+    *(1.70, 1.60, 1.53, 1.39, 1.39, 1.32, 1.26, 1.24, 1.32, 1.22),
+    *(1.22, 1.20, 1.19, 1.20, 1.20, 1.16, 2.20, 1.95, 1.90, 1.75),
+    *(1.64, 1.54, 1.47, 1.46, 1.42, 1.39, 1.45, 1.44, 1.42, 1.39),
+    *(1.39, 1.38, 1.39, 1.40, 2.44, 2.15, 2.07, 2.04, 2.03, 2.01),
+    *(1.99, 1.98, 1.98, 1.96, 1.94, 1.92, 1.92, 1.89, 1.90, 1.87),
+    *(1.87, 1.75, 1.70, 1.62, 1.51, 1.44, 1.41, 1.36, 1.36, 1.32),
+    *(1.45, 1.46, 1.48, 1.40, 1.50, 1.50, 2.60, 2.21, 2.15, 2.06),
+    *(2.00, 1.96, 1.90, 1.87, 1.80, 1.69),
+]
+
+# Atom radius tables: the original .4 for hydrogen and .6 for everything else,
+# or per-element covalent radii
+RADII_TABLES: Dict[str, "NDArray"] = {
+    "classic": numpy.where(numpy.arange(len(ELEMENTS)) == 1, 0.4, 0.6),
+    "covalent": COVALENT_RADII,
+}
+
+
+@dataclass
+class Molecule:
+    """Compact array-backed molecule shared by parsers and emitters.
+
+    Attributes:
+        coords (numpy.ndarray): float64 atom coordinates, shape (N, 3)
+        elements (numpy.ndarray): uint8 element codes (atomic numbers), shape (N,)
+        bonds (numpy.ndarray): int32 zero-based atom index pairs, shape (M, 2)
+        title (str): molecule name from the record header
+    """
+
+    coords: "NDArray"
+    elements: "NDArray"
+    bonds: "NDArray"
+    title: str = ""
+
+    def __post_init__(self) -> None:
+        self.coords = numpy.ascontiguousarray(self.coords, dtype=numpy.float64).reshape(
+            -1, 3
+        )
+        self.elements = numpy.ascontiguousarray(self.elements, dtype=numpy.uint8)
+        self.bonds = numpy.ascontiguousarray(self.bonds, dtype=numpy.int32).reshape(
+            -1, 2
+        )
+
+    @property
+    def n_atoms(self) -> int:
+        return len(self.coords)
+
+    @property
+    def n_bonds(self) -> int:
+        return len(self.bonds)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the coordinate, element and bond arrays."""
+        return self.coords.nbytes + self.elements.nbytes + self.bonds.nbytes
+
+    def symbols(self) -> List[str]:
+        """Return the element symbol of every atom."""
+        return [ELEMENTS[code] for code in self.elements.tolist()]
+
+    def bond_endpoints(self) -> "NDArray":
+        """Return the coordinates of both ends of every bond, shape (M, 2, 3)."""
+        return self.coords[self.bonds]
+
+    def with_perceived_bonds(self, tolerance: float = BOND_TOLERANCE) -> "Molecule":
+        """Return a copy with bonds perceived from interatomic distances."""
+        return Molecule(
+            self.coords,
+            self.elements,
+            perceive_bonds(self.coords, self.elements, tolerance),
+            self.title,
+        )
+
+    def without_hydrogens(self) -> "Molecule":
+        """Return a copy with hydrogen atoms and their bonds removed."""
+        keep = self.elements != ELEMENT_CODES["H"]
+        new_index = numpy.cumsum(keep, dtype=numpy.int32) - 1
+        bonds = self.bonds[keep[self.bonds].all(axis=1)]
+        return Molecule(
+            self.coords[keep], self.elements[keep], new_index[bonds], self.title
+        )
+
+
+# A reader yields every molecule in a file; READERS maps lower-case file
+# extensions to readers and is filled in by register_reader
+Reader = Callable[[str], Iterator[Molecule]]
+READERS: Dict[str, Reader] = {}
+
+
+@dataclass
+class EmitOptions:
+    """Settings controlling how molecules are written out.
+
+    Attributes:
+        precision (int): decimal places written for coordinates
+        mode (str): "modules" for one atom() / bond() call per entity,
+            "loop" for vector literals iterated by a for loop, or "stl" for a
+            binary STL mesh
+        segments (int, optional): sphere and cylinder $fn; None picks it from
+            the atom count
+        triangle_budget (int, optional): pick the largest $fn whose mesh stays
+            within this many triangles, overriding segments
+        hydrogens (bool): keep hydrogen atoms
+        radii (str): atom radius table, a key of RADII_TABLES
+        bonds (str): "file" to use only listed bonds, "perceive" to perceive
+            them from coordinates, or "auto" to perceive when none are listed
+        cache_dir (str, optional): directory caching parsed molecules; None
+            disables the cache
+        cache_size (int): bytes the cache may hold before evicting entries
+    """
+
+    precision: int = 4
+    mode: str = "modules"
+    segments: Optional[int] = SEGMENTS
+    triangle_budget: Optional[int] = None
+    hydrogens: bool = True
+    radii: str = "classic"
+    bonds: str = "auto"
+    cache_dir: Optional[str] = None
+    cache_size: int = CACHE_SIZE
+
+    def resolve_segments(self, molecule: Molecule) -> int:
+        """Return the $fn to use for a molecule under these settings."""
+        if self.triangle_budget is not None:
+            fitting = [
+                segments
+                for segments in range(MIN_SEGMENTS, MAX_SEGMENTS + 1)
+                if molecule.n_atoms * sphere_triangles(segments)
+                + molecule.n_bonds * cylinder_triangles(segments)
+                <= self.triangle_budget
+            ]
+            return max(fitting, default=MIN_SEGMENTS)
+        if self.segments is None:
+            for max_atoms, segments in AUTO_SEGMENTS:
+                if molecule.n_atoms <= max_atoms:
+                    return segments
+            return MIN_SEGMENTS
+        return self.segments
+
+    def atom_radii(self, molecule: Molecule) -> "NDArray":
+        """Return the radius of every atom from the selected table."""
+        radii: "NDArray" = RADII_TABLES[self.radii][molecule.elements]
+        return radii
+
+
 # Main Function
 
 
 def main() -> None:
     """Main function that processes args and calls helpers."""
 
-    argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        prog="mol2scad",
+        description="Turn molecular coordinates (molfile / sdf, xyz, pdb, mmcif) "
+        "into SCAD files.",
+    )
+    parser.add_argument(
+        "-i",
+        "--ifile",
+        nargs="+",
+        action="append",
+        help="input coordinate files, directories or glob patterns",
+    )
+    parser.add_argument(
+        "-o",
+        "--ofile",
+        help="output scad file, or output directory for several inputs",
+    )
+    parser.add_argument(
+        "-s", "--split", action="store_true", help="write one scad file per molecule"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: all cores)",
+    )
+    parser.add_argument(
+        "-p",
+        "--precision",
+        type=int,
+        default=EmitOptions.precision,
+        help="decimal places for coordinates (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        choices=EMIT_MODES,
+        default=EmitOptions.mode,
+        help="output: scad with one call per atom / bond, scad data arrays "
+        "iterated by a for loop for smaller files, or a binary STL mesh that "
+        "needs no OpenSCAD render (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--fn",
+        type=parse_segments,
+        default=EmitOptions.segments,
+        help="sphere and cylinder resolution ($fn), or 'auto' to pick it from "
+        "the atom count (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--triangle-budget",
+        type=int,
+        help="pick the finest $fn whose mesh fits in this many triangles",
+    )
+    parser.add_argument(
+        "--no-hydrogens",
+        dest="hydrogens",
+        action="store_false",
+        help="leave out hydrogen atoms and their bonds",
+    )
+    parser.add_argument(
+        "--radii",
+        choices=sorted(RADII_TABLES),
+        default=EmitOptions.radii,
+        help="atom radii: .4 for H and .6 otherwise, or per-element covalent "
+        "radii (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--bonds",
+        choices=BOND_MODES,
+        default=EmitOptions.bonds,
+        help="use the bonds listed in the file, perceive them from distances "
+        "and covalent radii, or perceive them only when the file lists none "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        nargs="?",
+        const=default_cache_dir(),
+        default=os.environ.get("MOL2SCAD_CACHE"),
+        help="cache parsed molecules in this directory (%(const)s if none is "
+        "given); off unless given or $MOL2SCAD_CACHE is set",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_SIZE >> 20,
+        help="megabytes the cache may hold before evicting the least recently "
+        "used entries (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="parse every input afresh, ignoring --cache-dir and $MOL2SCAD_CACHE",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="delete every cached molecule first; -i and -o become optional",
+    )
+    parser.add_argument(
+        "--report",
+        help="csv report of per-file results "
+        "(default: mol2scad_report.csv in the output directory for batches)",
+    )
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        cache_dir = args.cache_dir or default_cache_dir()
+        removed = clear_cache(cache_dir)
+        print(f"Removed {removed} cached files from {cache_dir}", file=sys.stderr)
+        if not args.ifile and not args.ofile:
+            return
+    if not args.ifile or not args.ofile:
+        parser.error("the following arguments are required: -i/--ifile, -o/--ofile")
+
+    inputs = expand_inputs([pattern for group in args.ifile for pattern in group])
+    if not inputs:
+        parser.error("no input files found")
+
+    # A single input file keeps the original -i <molfile> -o <scadfile> behavior
+    if (
+        len(inputs) == 1
+        and not Path(args.ofile).is_dir()
+        and not args.ofile.endswith(os.sep)
+    ):
+        jobs = [(inputs[0], args.ofile)]
+        report = args.report
+    else:
+        output_dir = Path(args.ofile)
+        suffix = ".stl" if args.mode == "stl" else ".scad"
+        try:
+            outputs = batch_outputs(inputs, output_dir, suffix)
+        except ValueError as err:
+            parser.error(str(err))
+        output_dir.mkdir(parents=True, exist_ok=True)
+        jobs = list(zip(inputs, outputs))
+        report = args.report or str(output_dir / "mol2scad_report.csv")
+
+    options = EmitOptions(
+        precision=args.precision,
+        mode=args.mode,
+        segments=args.fn,
+        triangle_budget=args.triangle_budget,
+        hydrogens=args.hydrogens,
+        radii=args.radii,
+        bonds=args.bonds,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_size=args.cache_size << 20,
+    )
+    results = convert_batch(jobs, args.split, args.jobs, options)
+    if report:
+        write_report(results, report)
+    if not all(result.ok for result in results):
+        sys.exit(1)
+
+
+def parse_segments(value: str) -> Optional[int]:
+    # argparse type for --fn: a positive integer or "auto"
+    if value == "auto":
+        return None
+    segments = int(value)
+    if segments < 3:
+        raise argparse.ArgumentTypeError("$fn must be at least 3")
+    return segments
+
+
+def convert_file(
+    inputfile: str,
+    outputfile: str,
+    split: bool = False,
+    options: Optional[EmitOptions] = None,
+) -> int:
+    """Stream every molecule in a molfile / sdf file into SCAD or STL output.
+
+    Records are read and written one at a time, so memory use does not grow
+    with the size of the input.
+
+    Args:
+        inputfile (str): molfile or multi-record sdf file
+        outputfile (str): scad or stl file to write
+        split (bool): write one file per molecule, named
+            <outputfile stem>_<n>.scad (or .stl), instead of a single combined file
+        options (EmitOptions, optional): output settings
+
+    Returns:
+        int: number of molecules written
+    """
+    options = options or EmitOptions()
+    if options.mode == "stl":
+        return convert_file_stl(inputfile, outputfile, split, options)
+
+    count = 0
+    molecules = iter_molecules(inputfile, options)
+    if split:
+        output_path = Path(outputfile)
+        for count, molecule in enumerate(molecules, start=1):
+            split_path = output_path.with_name(f"{output_path.stem}_{count}.scad")
+            with open(split_path, "w") as f:
+                write_header(f, options, options.resolve_segments(molecule))
+                write_body(f, molecule, options)
+                write_footer(f, options)
+        return count
+
+    # $fn is file-wide, so the first molecule sets it for a combined file
+    first = next(molecules, None)
+    with open(outputfile, "w") as f:
+        if first is None:
+            write_header(f, options)
+        else:
+            write_header(f, options, options.resolve_segments(first))
+            molecules = chain([first], molecules)
+        for count, molecule in enumerate(molecules, start=1):
+            write_body(f, molecule, options, count)
+        write_footer(f, options, count)
+    return count
+
+
+def convert_file_stl(
+    inputfile: str,
+    outputfile: str,
+    split: bool = False,
+    options: Optional[EmitOptions] = None,
+) -> int:
+    """Stream every molecule in a molfile / sdf file into binary STL meshes.
+
+    Args:
+        inputfile (str): molfile or multi-record sdf file
+        outputfile (str): stl file to write
+        split (bool): write one stl file per molecule, named
+            <outputfile stem>_<n>.stl, instead of a single combined file
+        options (EmitOptions, optional): output settings
+
+    Returns:
+        int: number of molecules written
+    """
+    options = options or EmitOptions()
+    count = 0
+    molecules = iter_molecules(inputfile, options)
+    if split:
+        output_path = Path(outputfile)
+        for count, molecule in enumerate(molecules, start=1):
+            split_path = output_path.with_name(f"{output_path.stem}_{count}.stl")
+            with open(split_path, "wb") as f:
+                f.write(STL_HEADER + numpy.uint32(0).tobytes())
+                triangles = write_stl_body(f, molecule, options)
+                f.seek(len(STL_HEADER))
+                f.write(numpy.uint32(triangles).tobytes())
+        return count
+
+    with open(outputfile, "wb") as f:
+        # The triangle count is patched in once every molecule is written
+        f.write(STL_HEADER + numpy.uint32(0).tobytes())
+        triangles = 0
+        for count, molecule in enumerate(molecules, start=1):
+            triangles += write_stl_body(f, molecule, options)
+        f.seek(len(STL_HEADER))
+        f.write(numpy.uint32(triangles).tobytes())
+    return count
+
+
+class ConversionResult(NamedTuple):
+    """Outcome of converting one input file."""
+
+    inputfile: str
+    outputfile: str
+    ok: bool
+    molecules: int
+    seconds: float
+    error: str = ""
 
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """Expand input files, directories and glob patterns into input paths.
+
+    Directories contribute every file with an extension in READERS.
+
+    Args:
+        patterns (Iterable[str]): paths, directories or glob patterns
+
+    Returns:
+        List[str]: sorted, de-duplicated input files
+    """
+    inputs: Set[str] = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            inputs.update(
+                str(child)
+                for child in path.iterdir()
+                if child.suffix.lower() in READERS and child.is_file()
+            )
+        elif glob.has_magic(pattern):
+            inputs.update(
+                match for match in glob.glob(pattern) if Path(match).is_file()
+            )
+        else:
+            inputs.add(pattern)
+    return sorted(inputs)
+
+
+def batch_outputs(inputs: List[str], output_dir: Path, suffix: str) -> List[str]:
+    """Name one output file in output_dir for each input file.
+
+    An input name.mol becomes name.scad (or .stl). Inputs that share a stem
+    are named after their path below the directory they have in common
+    instead, with the extension kept, so that a/x.mol, b/x.mol and b/x.xyz
+    become a_x.mol.scad, b_x.mol.scad and b_x.xyz.scad rather than all
+    writing x.scad.
+
+    Args:
+        inputs (List[str]): input files
+        output_dir (Path): output directory
+        suffix (str): output file extension
+
+    Returns:
+        List[str]: output files, in input order
+
+    Raises:
+        ValueError: if two inputs would still write the same file (e.g. one
+            file given under two different paths)
+    """
+    by_stem: Dict[str, List[str]] = {}
+    for path in inputs:
+        by_stem.setdefault(Path(path).stem, []).append(path)
+
+    names: Dict[str, str] = {}
+    for stem, paths in by_stem.items():
+        if len(paths) == 1:
+            names[paths[0]] = stem + suffix
+            continue
+        resolved = [os.path.abspath(path) for path in paths]
+        common = os.path.commonpath([os.path.dirname(path) for path in resolved])
+        for path, full in zip(paths, resolved):
+            relative = os.path.relpath(full, common)
+            names[path] = relative.replace(os.sep, "_") + suffix
+
+    outputs = [str(output_dir / names[path]) for path in inputs]
+    targets: Dict[str, List[str]] = {}
+    for path, output in zip(inputs, outputs):
+        targets.setdefault(output, []).append(path)
+    clashes = [
+        f"{', '.join(paths)} -> {output}"
+        for output, paths in targets.items()
+        if len(paths) > 1
+    ]
+    if clashes:
+        raise ValueError("inputs would write the same output: " + "; ".join(clashes))
+    return outputs
+
+
+def _convert_job(
+    inputfile: str, outputfile: str, split: bool, options: EmitOptions
+) -> ConversionResult:
+    # Worker entry point; never raises, so one bad file cannot stop a batch
+    start = time.perf_counter()
+    try:
+        molecules = convert_file(inputfile, outputfile, split, options)
+    except Exception as err:
+        if not split and Path(outputfile).exists():
+            Path(outputfile).unlink()  # don't leave a truncated scad behind
+        return ConversionResult(
+            inputfile,
+            outputfile,
+            False,
+            0,
+            time.perf_counter() - start,
+            f"{type(err).__name__}: {err}",
+        )
+    return ConversionResult(
+        inputfile, outputfile, True, molecules, time.perf_counter() - start
+    )
+
+
+def convert_batch(
+    jobs: List[Tuple[str, str]],
+    split: bool = False,
+    workers: int = 1,
+    options: Optional[EmitOptions] = None,
+) -> List[ConversionResult]:
+    """Convert many files, spread across a pool of worker processes.
+
+    Progress is printed to stderr as each file finishes. Failures are recorded
+    in the results rather than raised.
+
+    Args:
+        jobs (List[Tuple[str, str]]): (input file, output file) pairs
+        split (bool): write one scad file per molecule
+        workers (int): number of worker processes; 1 converts in-process
+        options (EmitOptions, optional): output settings
+
+    Returns:
+        List[ConversionResult]: one result per job, in job order
+    """
+    options = options or EmitOptions()
+    results: List[ConversionResult] = []
+
+    def progress(result: ConversionResult) -> None:
+        results.append(result)
+        status = "ok" if result.ok else "FAILED"
+        detail = f"{result.molecules} molecules" if result.ok else result.error
+        print(
+            f"[{len(results)}/{len(jobs)}] {status} {result.inputfile}: {detail}",
+            file=sys.stderr,
+        )
+
+    if workers <= 1 or len(jobs) <= 1:
+        for inputfile, outputfile in jobs:
+            progress(_convert_job(inputfile, outputfile, split, options))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_convert_job, inputfile, outputfile, split, options)
+                for inputfile, outputfile in jobs
+            ]
+            for future in as_completed(futures):
+                progress(future.result())
+
+    order = {inputfile: i for i, (inputfile, _) in enumerate(jobs)}
+    return sorted(results, key=lambda result: order[result.inputfile])
+
+
+def write_report(results: Iterable[ConversionResult], reportfile: str) -> None:
+    # Write per-file results as csv
+    with open(reportfile, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(ConversionResult._fields)
+        for result in results:
+            writer.writerow([*result[:4], f"{result.seconds:.3f}", result.error])
+
+
+def iter_records(inputfile: str) -> Iterator[List[str]]:
+    """Yield the lines of each $$$$-delimited record of a molfile / sdf file.
+
+    Args:
+        inputfile (str): molfile or sdf file
+
+    Yields:
+        List[str]: raw lines of one molecule record
+    """
+    record: List[str] = []
+
+    with open(inputfile) as file_object:
+        for line in file_object:
+            if line.startswith("$$$$"):
+                yield record
+                record = []
+            else:
+                record.append(line)
+
+    # A plain molfile has no terminating $$$$
+    if any(line.strip() for line in record):
+        yield record
+
+
+def register_reader(*extensions: str) -> Callable[[Reader], Reader]:
+    """Register a reader function for one or more file extensions.
+
+    Args:
+        *extensions (str): file extensions including the dot, e.g. ".xyz"
+
+    Returns:
+        Callable: decorator that registers and returns the reader
+    """
+
+    def decorator(reader: Reader) -> Reader:
+        for extension in extensions:
+            READERS[extension.lower()] = reader
+        return reader
+
+    return decorator
+
+
+def get_reader(inputfile: str) -> Reader:
+    """Return the reader registered for a file's extension.
+
+    Args:
+        inputfile (str): input file path
+
+    Returns:
+        Reader: registered reader, or the molfile reader for unknown extensions
+    """
+    return READERS.get(Path(inputfile).suffix.lower(), read_molfile)
+
+
+def iter_molecules(inputfile: str, options: EmitOptions) -> Iterator[Molecule]:
+    """Yield each molecule of an input file, prepared for output.
+
+    Args:
+        inputfile (str): molfile / sdf, xyz, pdb or mmcif file
+        options (EmitOptions): output settings
+
+    Yields:
+        Molecule: parsed molecule, with bonds perceived and hydrogens removed
+        if options ask for it
+    """
+    if options.cache_dir is None:
+        molecules = read_molecules(inputfile, options)
+    else:
+        molecules = iter_cached_molecules(inputfile, options, options.cache_dir)
+    for molecule in molecules:
+        yield molecule if options.hydrogens else molecule.without_hydrogens()
+
+
+def read_molecules(inputfile: str, options: EmitOptions) -> Iterator[Molecule]:
+    """Yield each molecule of an input file with its bonds as options ask.
+
+    Args:
+        inputfile (str): molfile / sdf, xyz, pdb or mmcif file
+        options (EmitOptions): output settings; only bonds is used
+
+    Yields:
+        Molecule: parsed molecule, with bonds perceived if options ask for it
+    """
+    for molecule in get_reader(inputfile)(inputfile):
+        if options.bonds == "perceive" or (
+            options.bonds == "auto" and molecule.n_bonds == 0
+        ):
+            molecule = molecule.with_perceived_bonds()
+        yield molecule
+
+
+def default_cache_dir() -> str:
+    """Return the cache directory: $MOL2SCAD_CACHE, else under $XDG_CACHE_HOME."""
+    if "MOL2SCAD_CACHE" in os.environ:
+        return os.environ["MOL2SCAD_CACHE"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "mol2scad")
+
+
+def cache_key(inputfile: str, options: EmitOptions) -> str:
+    """Hash an input file's contents together with the settings parsing uses.
+
+    Args:
+        inputfile (str): input file
+        options (EmitOptions): output settings; only bonds affects the key
+
+    Returns:
+        str: hex digest naming the cache entry
+    """
+    reader = get_reader(inputfile)
+    digest = hashlib.sha256(
+        f"{CACHE_VERSION}:{reader.__name__}:{options.bonds}:".encode()
+    )
+    with open(inputfile, "rb") as file_object:
+        for block in iter(lambda: file_object.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_cached_molecules(
+    inputfile: str, options: EmitOptions, cache_dir: str
+) -> Iterator[Molecule]:
+    """Yield molecules from the on-disk cache, parsing and storing on a miss.
+
+    Args:
+        inputfile (str): input file
+        options (EmitOptions): output settings
+        cache_dir (str): cache directory
+
+    Yields:
+        Molecule: parsed molecule, with bonds perceived if options ask for it
+    """
+    entry = os.path.join(cache_dir, cache_key(inputfile, options) + ".npz")
+
+    try:
+        molecules = load_cache_entry(entry)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        _remove_quietly(entry)  # unreadable entry: drop it and parse again
+    else:
+        try:
+            os.utime(entry)  # mark as recently used
+        except OSError:
+            pass  # a read-only cache, or the entry was just evicted
+        yield from molecules
+        return
+
+    # Stream the molecules through, keeping them only while they fit an entry
+    kept: Optional[List[Molecule]] = []
+    nbytes = 0
+    for molecule in read_molecules(inputfile, options):
+        if kept is not None:
+            nbytes += molecule.nbytes
+            if nbytes <= CACHE_ENTRY_LIMIT:
+                kept.append(molecule)
+            else:
+                kept = None
+        yield molecule
+    if kept is not None:
+        save_cache_entry(entry, kept)
+        evict_cache(cache_dir, options.cache_size)
+
+
+def load_cache_entry(entry: str) -> List[Molecule]:
+    """Read the molecules stored in a cache entry.
+
+    Args:
+        entry (str): .npz cache file
+
+    Returns:
+        List[Molecule]: molecules in file order
+    """
+    with numpy.load(entry, allow_pickle=False) as data:
+        atom_ends = numpy.cumsum(data["atom_counts"])
+        bond_ends = numpy.cumsum(data["bond_counts"])
+        return [
+            Molecule(coords, elements, bonds, str(title))
+            for coords, elements, bonds, title in zip(
+                numpy.split(data["coords"], atom_ends[:-1]),
+                numpy.split(data["elements"], atom_ends[:-1]),
+                numpy.split(data["bonds"], bond_ends[:-1]),
+                data["titles"],
+            )
+        ]
+
+
+def save_cache_entry(entry: str, molecules: List[Molecule]) -> None:
+    """Write molecules to a cache entry, replacing it atomically.
+
+    Args:
+        entry (str): .npz cache file
+        molecules (List[Molecule]): molecules in file order
+    """
+    directory = os.path.dirname(entry)
+    os.makedirs(directory, exist_ok=True)
+    handle, partial = tempfile.mkstemp(suffix=".part", dir=directory)
     try:
-        opts, args = getopt.getopt(argv, "hi:o:", ["ifile=", "ofile="])
-
-    except getopt.GetoptError:
-        print("mol2scad.py -i <input molfile> -o <output scadfile>")
-        sys.exit(2)
-
-    if len(opts) == 0:
-        print("mol2scad.py -i <input molfile> -o <output scadfile>")
-        sys.exit(2)
-
-    for opt, arg in opts:
-        if opt == "-h":
-            print("mol2scad.py -i <input molfile> -o <output scadfile>")
-            sys.exit()
-        elif opt in ("-i", "--ifile"):
-            inputfile = arg
-        elif opt in ("-o", "--ofile"):
-            outputfile = arg
+        with os.fdopen(handle, "wb") as f:
+            numpy.savez(
+                f,
+                coords=numpy.concatenate(
+                    [m.coords for m in molecules] or [numpy.empty((0, 3))]
+                ),
+                elements=numpy.concatenate(
+                    [m.elements for m in molecules] or [numpy.empty(0, numpy.uint8)]
+                ),
+                bonds=numpy.concatenate(
+                    [m.bonds for m in molecules] or [numpy.empty((0, 2), numpy.int32)]
+                ),
+                atom_counts=numpy.array([m.n_atoms for m in molecules], numpy.int64),
+                bond_counts=numpy.array([m.n_bonds for m in molecules], numpy.int64),
+                titles=numpy.array([m.title for m in molecules], dtype=str),
+            )
+        os.replace(partial, entry)
+    except OSError:
+        _remove_quietly(partial)  # a read-only or full cache is not an error
+
+
+def evict_cache(cache_dir: str, max_bytes: int) -> None:
+    """Delete least recently used cache entries until the cache fits max_bytes.
+
+    Args:
+        cache_dir (str): cache directory
+        max_bytes (int): size the cache may keep
+    """
+    entries = []
+    for entry in Path(cache_dir).glob("*.npz"):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue  # evicted by another worker
+        entries.append((stat.st_mtime, stat.st_size, entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove_quietly(str(entry))
+        total -= size
+
+
+def clear_cache(cache_dir: str) -> int:
+    """Delete every entry in a cache directory.
+
+    Args:
+        cache_dir (str): cache directory
+
+    Returns:
+        int: number of files removed
+    """
+    removed = 0
+    for entry in chain(Path(cache_dir).glob("*.npz"), Path(cache_dir).glob("*.part")):
+        removed += _remove_quietly(str(entry))
+    return removed
+
+
+def _remove_quietly(path: str) -> bool:
+    """Remove a file if it still exists, returning whether it was removed."""
+    try:
+        os.remove(path)
+    except OSError:
+        return False  # already gone, or a read-only cache
+    return True
+
+
+def parse_counts_line(line: str) -> Tuple[int, int, bool]:
+    """Read atom and bond counts from a V2000 counts line.
+
+    Lines carrying the V2000 stamp in its fixed column are read by column, as
+    the spec requires (3-digit fields may run together, e.g. "120118").
+    Anything else is read as whitespace-separated fields, which also covers
+    files written with counts too wide for the fixed columns.
+
+    Args:
+        line (str): fourth line of a molfile record
+
+    Returns:
+        Tuple[int, int, bool]: atom count, bond count and whether the atom and
+        bond blocks use fixed V2000 columns
+    """
+    try:
+        if line[34:39] == "V2000":
+            return int(line[0:3]), int(line[3:6]), True
+        fields = line.split()
+        if "V3000" in fields:
+            raise ValueError("V3000 molfiles are not supported")
+        return int(fields[0]), int(fields[1]), False
+    except (IndexError, ValueError) as err:
+        raise ValueError(f"Invalid molfile counts line: {line!r}") from err
+
+
+def parse_molfile(lines: Iterable[str]) -> Molecule:
+    """Parse the atom and bond blocks of one V2000 molfile record in one pass.
+
+    Reads the three header lines and the counts line, then exactly the declared
+    number of atom and bond lines; anything after the bond block (properties,
+    sdf data items) is left unread.
+
+    Args:
+        lines (Iterable[str]): raw lines of a molfile record
+
+    Returns:
+        Molecule: parsed coordinates, element codes and bonds
+    """
+    line_iter = iter(lines)
+
+    # Read the header block: name, program / timestamp, comment
+    title = next(line_iter, "").strip()
+    for _ in range(2):
+        next(line_iter, "")
+    n_atoms, n_bonds, fixed = parse_counts_line(next(line_iter, ""))
+
+    # Accumulate into typed buffers rather than per-atom Python objects
+    coords = array("d")
+    elements = bytearray()
+    for line in islice(line_iter, n_atoms):
+        if fixed:
+            x, y, z, symbol = line[0:10], line[10:20], line[20:30], line[31:34]
         else:
-            sys.exit(2)
-    # Call helpers
-    lines = process_lines(inputfile)
-    atoms_list, bonds_list = make_atoms_and_bonds_lists(lines)
-    output = format_output(atoms_list, bonds_list)
-    write_file(output, outputfile)
+            x, y, z, symbol = line.split()[:4]
+        coords.extend((float(x), float(y), float(z)))
+        elements.append(ELEMENT_CODES.get(symbol.strip(), 0))
+
+    bonds = array("i")
+    for line in islice(line_iter, n_bonds):
+        if fixed:
+            first, second = line[0:3], line[3:6]
+        else:
+            first, second = line.split()[:2]
+        bonds.extend((int(first) - 1, int(second) - 1))
+
+    if len(elements) != n_atoms or len(bonds) != 2 * n_bonds:
+        raise ValueError(
+            f"Molfile record ended early: expected {n_atoms} atoms and "
+            f"{n_bonds} bonds, found {len(elements)} and {len(bonds) // 2}"
+        )
+
+    molecule = Molecule(
+        numpy.frombuffer(coords, dtype=numpy.float64),
+        numpy.frombuffer(elements, dtype=numpy.uint8),
+        numpy.frombuffer(bonds, dtype=numpy.intc),
+        title,
+    )
+    if n_bonds and not (0 <= molecule.bonds.min() and molecule.bonds.max() < n_atoms):
+        raise ValueError("Molfile bond refers to an atom that does not exist")
+
+    return molecule
 
 
 def process_lines(inputfile: str) -> List[List[str]]:
-    # Import file
-    lines_tabbed = []
+    """Split a molfile into whitespace-separated fields (deprecated).
 
-    with open(inputfile) as file_object:
-        lines_list = file_object.readlines()
-        for line in lines_list:
-            column = line.split()
-            lines_tabbed.append(column)
+    Kept for callers of the mol2scad 1.0 API; use read_molfile instead. As in
+    1.0, lines with fewer than four fields are dropped.
 
-    # Remove unneeded lines
-    index_removal_one = [i for i, v in enumerate(lines_tabbed) if len(v) < 4]
+    Args:
+        inputfile (str): molfile to read
 
-    lines_tabbed = [
-        v for i, v in enumerate(lines_tabbed) if i not in (tuple(index_removal_one))
-    ]
-    return lines_tabbed
+    Returns:
+        List[List[str]]: fields of every line with at least four of them
+    """
+    warnings.warn(
+        "process_lines is deprecated; use read_molfile", DeprecationWarning, 2
+    )
+    with open(inputfile) as file_object:
+        return [fields for fields in map(str.split, file_object) if len(fields) >= 4]
 
 
 def make_atoms_and_bonds_lists(
     lines_tabbed: List[List[str]],
 ) -> Tuple[List[List[str]], List[List[str]]]:
-    # Split off atoms and bonds lines
+    """Pick the atom and bond rows out of process_lines output (deprecated).
+
+    Kept for callers of the mol2scad 1.0 API; use parse_molfile instead. The
+    rows are read by parse_molfile from the first counts line, so exactly the
+    declared atom and bond lines are returned.
+
+    Args:
+        lines_tabbed (List[List[str]]): fields of each line, from process_lines
+
+    Returns:
+        Tuple[List[List[str]], List[List[str]]]: atom rows (x, y, z, symbol,
+        ...) and bond rows (first atom, second atom, ...) as in the file
+    """
+    warnings.warn(
+        "make_atoms_and_bonds_lists is deprecated; use parse_molfile",
+        DeprecationWarning,
+        2,
+    )
+    start = next(
+        (
+            index
+            for index, fields in enumerate(lines_tabbed)
+            if fields[0].isdigit() and fields[1].isdigit()
+        ),
+        len(lines_tabbed),
+    )
+    counts = lines_tabbed[start:][:1] or [["0", "0"]]
+    rows = lines_tabbed[start + 1 :]
+    molecule = parse_molfile(
+        ["", "", "", " ".join(counts[0][:2])] + [" ".join(row) for row in rows]
+    )
+    return rows[: molecule.n_atoms], rows[molecule.n_atoms :][: molecule.n_bonds]
+
+
+def _molecule_from_rows(
+    atoms_list: List[List[str]], bonds_list: List[List[str]]
+) -> Molecule:
+    """Build a Molecule from the atom and bond rows of the 1.0 API."""
+    return Molecule(
+        numpy.array([row[:3] for row in atoms_list], dtype=numpy.float64),
+        numpy.array([element_code(row[3]) for row in atoms_list], dtype=numpy.uint8),
+        numpy.array([row[:2] for row in bonds_list], dtype=numpy.int32) - 1,
+    )
+
+
+def _unbonded_molecule(
+    coords: "array[float]", elements: bytearray, title: str
+) -> Molecule:
+    """Wrap typed coordinate and element buffers in a Molecule without bonds."""
+    return Molecule(
+        numpy.frombuffer(coords, dtype=numpy.float64),
+        numpy.frombuffer(elements, dtype=numpy.uint8),
+        numpy.empty((0, 2), dtype=numpy.int32),
+        title,
+    )
+
+
+@lru_cache(maxsize=None)
+def element_code(symbol: str) -> int:
+    """Return the element code for a symbol in any case, e.g. "FE" or "fe".
+
+    Args:
+        symbol (str): element symbol, possibly padded or followed by digits
+
+    Returns:
+        int: atomic number, or 0 for unknown symbols
+    """
+    symbol = symbol.strip().rstrip("0123456789").capitalize()
+    return ELEMENT_CODES.get(symbol, 0)
+
+
+@register_reader(*MOLFILE_EXTENSIONS)
+def read_molfile(inputfile: str) -> Iterator[Molecule]:
+    """Yield each record of a V2000 molfile / sdf file, parsed from a memory map.
+
+    The file is never decoded as a whole: the atom and bond blocks of each
+    large record are located by byte offset and only their coordinate, element
+    and bond fields are decoded, so memory use is set by the parsed arrays
+    rather than the file size. Records under SMALL_RECORD bytes are decoded and
+    parsed by line. Results match iter_records + parse_molfile.
+
+    Args:
+        inputfile (str): molfile or sdf file
+
+    Yields:
+        Molecule: parsed coordinates, element codes and bonds
+    """
+    with open(inputfile, "rb") as file_object:
+        if os.fstat(file_object.fileno()).st_size == 0:
+            return
+        # Not closed explicitly: the map is released with the last numpy view
+        # of it, which may outlive this generator in an exception traceback
+        mapped = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = numpy.frombuffer(mapped, dtype=numpy.uint8)
+
+    pos = 0
+    while pos < len(buf):
+        # A record runs up to the next line starting with $$$$
+        if mapped[pos : pos + 4] == b"$$$$":
+            end = pos
+        else:
+            end = mapped.find(b"\n$$$$", pos) + 1 or len(buf)
+        next_pos = mapped.find(b"\n", end) + 1 or len(buf)
+
+        # A plain molfile has no terminating $$$$; small records are cheaper
+        # to decode whole than to scan with numpy
+        if end - pos < SMALL_RECORD:
+            record = mapped[pos:end].decode(errors="replace")
+            if end < len(buf) or record.strip():
+                yield parse_molfile(record.splitlines(keepends=True))
+        elif end < len(buf) or (buf[pos:end] > 32).any():
+            yield parse_molfile_buffer(buf, pos, end)
+        pos = next_pos if end < len(buf) else len(buf)
+
+
+def _block_lines(
+    buf: "NDArray", start: int, stop: int, n_lines: int
+) -> Tuple["NDArray", "NDArray", int]:
+    """Locate n_lines consecutive lines of buf[start:stop] by byte offset.
 
-    atoms_list = [v for i, v in enumerate(lines_tabbed) if v[3].isalpha() is True]
+    Args:
+        buf (numpy.ndarray): uint8 view of the file
+        start (int): offset of the first line
+        stop (int): end of the record
+        n_lines (int): number of lines wanted
 
-    bonds_list = [
-        v
-        for i, v in enumerate(lines_tabbed)
-        if v[0].isdigit() is True
-        and v[1].isdigit() is True
-        and v[2].isdigit() is True
-        and i != 0
+    Returns:
+        Tuple[numpy.ndarray, numpy.ndarray, int]: line start offsets, line end
+        offsets (excluding line terminators), and the offset after the last line
+    """
+    if n_lines == 0:
+        return numpy.empty(0, numpy.int64), numpy.empty(0, numpy.int64), start
+
+    newlines = []
+    found = 0
+    scan = start
+    while found < n_lines and scan < stop:
+        # Size the window for the lines still wanted, assuming short lines
+        window = min(scan + min(SCAN_CHUNK, 128 * (n_lines - found)), stop)
+        hits = numpy.flatnonzero(buf[scan:window] == 10) + scan
+        newlines.append(hits[: n_lines - found])
+        found += len(newlines[-1])
+        scan = window
+    ends = numpy.concatenate(newlines) if newlines else numpy.empty(0, numpy.int64)
+
+    # The last line of a file may have no newline
+    if len(ends) < n_lines and (ends[-1] + 1 if len(ends) else start) < stop:
+        ends = numpy.append(ends, stop)
+    if len(ends) < n_lines:
+        raise EOFError
+    starts = numpy.concatenate(([start], ends[:-1] + 1))
+    after = min(int(ends[-1]) + 1, stop) if n_lines else start
+
+    # Drop the carriage return of CRLF line endings
+    ends = ends - ((ends > starts) & (buf[numpy.maximum(ends - 1, 0)] == 13))
+    return starts, ends, after
+
+
+def _gather_fields(
+    buf: "NDArray", starts: "NDArray", lengths: "NDArray", width: int
+) -> "NDArray":
+    """Copy fields at byte offsets into a fixed-width bytes array.
+
+    Bytes past each field's length are replaced with spaces, so short lines
+    never pick up text from the following line.
+
+    Args:
+        buf (numpy.ndarray): uint8 view of the file
+        starts (numpy.ndarray): field start offsets
+        lengths (numpy.ndarray): field lengths, at most width
+        width (int): width of the returned fields
+
+    Returns:
+        numpy.ndarray: bytes array of dtype S<width>, one field per offset
+    """
+    width = max(width, 1)
+    columns = numpy.arange(width)
+    inside = columns < lengths[:, None]
+    fields = buf[numpy.where(inside, starts[:, None] + columns, 0)]
+    fields[~inside] = 32
+    return fields.view(f"S{width}").ravel()
+
+
+def _fixed_fields(
+    buf: "NDArray", starts: "NDArray", ends: "NDArray", columns: List[Tuple[int, int]]
+) -> List["NDArray"]:
+    """Slice fixed-column fields out of lines, e.g. (0, 10) for line[0:10]."""
+    return [
+        _gather_fields(
+            buf,
+            starts + first,
+            numpy.clip(ends - starts - first, 0, last - first),
+            last - first,
+        )
+        for first, last in columns
     ]
 
-    return atoms_list, bonds_list
 
+def _split_fields(
+    buf: "NDArray", starts: "NDArray", ends: "NDArray", count: int
+) -> List["NDArray"]:
+    """Return the first count whitespace-separated fields of each line.
 
-def format_output(atoms_list: List[List[str]], bonds_list: List[List[str]]) -> str:
-    #  Atoms output
-    output_atoms = []
+    Raises:
+        ValueError: if a line has fewer than count fields
+    """
+    low = int(starts[0])
+    region = buf[low : int(ends[-1])]
+    blank = region <= 32
+    edge = numpy.concatenate(([True], blank, [True]))
+    token_starts = numpy.flatnonzero(~blank & edge[:-2])
+    token_ends = numpy.flatnonzero(~blank & edge[2:]) + 1
+
+    # Find each line's first token; its first count tokens must end in the line
+    first = numpy.searchsorted(token_starts, starts - low)
+    if (first[-1] + count > len(token_starts)) or (
+        token_starts[first + count - 1] >= ends - low
+    ).any():
+        raise ValueError(f"Molfile line has fewer than {count} fields")
+
+    fields = []
+    for k in range(count):
+        token = first + k
+        lengths = token_ends[token] - token_starts[token]
+        fields.append(
+            _gather_fields(buf, token_starts[token] + low, lengths, int(lengths.max()))
+        )
+    return fields
+
+
+def _element_codes(symbols: "NDArray") -> "NDArray":
+    """Map a bytes array of element symbols to uint8 element codes."""
+    unique, inverse = numpy.unique(symbols, return_inverse=True)
+    codes = [ELEMENT_CODES.get(symbol.decode().strip(), 0) for symbol in unique]
+    return numpy.array(codes, dtype=numpy.uint8)[inverse.ravel()]
+
+
+def parse_molfile_buffer(buf: "NDArray", start: int, stop: int) -> Molecule:
+    """Parse one V2000 molfile record from bytes, without decoding whole lines.
+
+    The bytes equivalent of parse_molfile: the header and counts line are
+    decoded, then the atom and bond blocks are located by byte offset and
+    their fields are converted to numbers in vectorized chunks.
+
+    Args:
+        buf (numpy.ndarray): uint8 view of the file, e.g. of a memory map
+        start (int): offset of the record's first line
+        stop (int): offset just past the record's last line
+
+    Returns:
+        Molecule: parsed coordinates, element codes and bonds
+    """
+    # Read the header block: name, program / timestamp, comment; then counts
+    header = []
+    pos = start
+    for _ in range(4):
+        try:
+            line_stop = _block_lines(buf, pos, stop, 1)[2]
+        except EOFError:
+            line_stop = stop
+        header.append(buf[pos:line_stop].tobytes().decode(errors="replace"))
+        pos = line_stop
+    title = header[0].strip()
+    n_atoms, n_bonds, fixed = parse_counts_line(header[3])
 
-    for i, row in enumerate(atoms_list):
-        if row[3] == "H":
-            atomsize = ".4"
+    coords = numpy.empty((n_atoms, 3), dtype=numpy.float64)
+    elements = numpy.empty(n_atoms, dtype=numpy.uint8)
+    bonds = numpy.empty((n_bonds, 2), dtype=numpy.int32)
+    try:
+        _parse_atom_block(buf, pos, stop, coords, elements, bonds, fixed)
+    except EOFError:
+        raise ValueError(
+            f"Molfile record ended early: expected {n_atoms} atoms and "
+            f"{n_bonds} bonds"
+        ) from None
+
+    if n_bonds and not (0 <= bonds.min() and bonds.max() < n_atoms):
+        raise ValueError("Molfile bond refers to an atom that does not exist")
+
+    return Molecule(coords, elements, bonds, title)
+
+
+def _parse_atom_block(
+    buf: "NDArray",
+    pos: int,
+    stop: int,
+    coords: "NDArray",
+    elements: "NDArray",
+    bonds: "NDArray",
+    fixed: bool,
+) -> None:
+    """Fill coords, elements and bonds from the atom and bond blocks at pos.
+
+    Lines are located and decoded PARSE_CHUNK at a time, so no per-line array
+    for the whole block is ever held.
+
+    Raises:
+        EOFError: if the record ends before the blocks are complete
+    """
+    n_atoms, n_bonds = len(elements), len(bonds)
+    for first in range(0, n_atoms, PARSE_CHUNK):
+        last = min(first + PARSE_CHUNK, n_atoms)
+        starts, ends, pos = _block_lines(buf, pos, stop, last - first)
+        if fixed:
+            x, y, z, symbol = _fixed_fields(
+                buf, starts, ends, [(0, 10), (10, 20), (20, 30), (31, 34)]
+            )
         else:
-            atomsize = ".6"
+            x, y, z, symbol = _split_fields(buf, starts, ends, 4)
+        coords[first:last, 0] = x.astype(numpy.float64)
+        coords[first:last, 1] = y.astype(numpy.float64)
+        coords[first:last, 2] = z.astype(numpy.float64)
+        elements[first:last] = _element_codes(symbol)
+
+    for first in range(0, n_bonds, PARSE_CHUNK):
+        last = min(first + PARSE_CHUNK, n_bonds)
+        starts, ends, pos = _block_lines(buf, pos, stop, last - first)
+        if fixed:
+            atom_one, atom_two = _fixed_fields(buf, starts, ends, [(0, 3), (3, 6)])
+        else:
+            atom_one, atom_two = _split_fields(buf, starts, ends, 2)
+        bonds[first:last, 0] = atom_one.astype(numpy.int64) - 1
+        bonds[first:last, 1] = atom_two.astype(numpy.int64) - 1
+
+
+@register_reader(".xyz")
+def read_xyz(inputfile: str) -> Iterator[Molecule]:
+    """Yield each frame of an XYZ file.
+
+    Every frame is an atom count line, a comment line used as the title, and
+    one "symbol x y z" line per atom. XYZ files carry no bonds.
+
+    Args:
+        inputfile (str): xyz file, one or more frames
+
+    Yields:
+        Molecule: parsed coordinates and element codes
+    """
+    with open(inputfile) as file_object:
+        for count_line in file_object:
+            if not count_line.strip():
+                continue
+            try:
+                n_atoms = int(count_line)
+            except ValueError as err:
+                raise ValueError(f"Invalid xyz atom count: {count_line!r}") from err
+            title = next(file_object, "").strip()
+
+            coords = array("d")
+            elements = bytearray()
+            for line in islice(file_object, n_atoms):
+                symbol, x, y, z = line.split()[:4]
+                coords.extend((float(x), float(y), float(z)))
+                elements.append(
+                    int(symbol) if symbol.isdigit() else element_code(symbol)
+                )
+            if len(elements) != n_atoms:
+                raise ValueError(
+                    f"xyz frame ended early: expected {n_atoms} atoms, "
+                    f"found {len(elements)}"
+                )
+
+            yield _unbonded_molecule(coords, elements, title)
+
+
+@register_reader(".pdb", ".ent")
+def read_pdb(inputfile: str) -> Iterator[Molecule]:
+    """Yield each model of a PDB file, reading ATOM / HETATM records by column.
+
+    Only the first alternate location of each atom is kept. The element comes
+    from columns 77-78, or from the atom name when those are blank. CONECT
+    records usually cover only hetero groups, so bonds are left for perception.
+
+    Args:
+        inputfile (str): pdb file, with or without MODEL records
 
-        output_atoms.append(
-            "atom({0}, {1}, {2}, {3}); // {4} \n".format(
-                atomsize, row[0], row[1], row[2], i + 1
+    Yields:
+        Molecule: parsed coordinates and element codes, one per model
+    """
+    title = ""
+    coords = array("d")
+    elements = bytearray()
+
+    with open(inputfile) as file_object:
+        for line in file_object:
+            record = line[0:6]
+            if record == "ATOM  " or record == "HETATM":
+                if line[16] not in " A1":
+                    continue
+                coords.extend(
+                    (float(line[30:38]), float(line[38:46]), float(line[46:54]))
+                )
+                symbol = line[76:78].strip()
+                elements.append(element_code(symbol or line[12:14]))
+            elif record == "ENDMDL" or record.rstrip() == "END":
+                if elements:
+                    yield _unbonded_molecule(coords, elements, title)
+                coords = array("d")
+                elements = bytearray()
+            elif record == "HEADER":
+                title = line[62:66].strip() or line[10:50].strip()
+
+    if elements:
+        yield _unbonded_molecule(coords, elements, title)
+
+
+def _cif_tokens(line: str) -> List[str]:
+    """Split one line of a CIF loop into values, honoring quoted strings."""
+    if "'" not in line and '"' not in line:
+        return line.split()
+    return [
+        token[1:-1] if token[0] in "'\"" else token for token in CIF_TOKEN.findall(line)
+    ]
+
+
+@register_reader(".cif", ".mmcif")
+def read_mmcif(inputfile: str) -> Iterator[Molecule]:
+    """Yield each model of each data block in an mmCIF file.
+
+    Reads the _atom_site loop; atoms keep only their first alternate location,
+    and the element comes from type_symbol or else from the atom name. Other
+    categories are skipped without being parsed.
+
+    Args:
+        inputfile (str): mmcif file
+
+    Yields:
+        Molecule: parsed coordinates and element codes, one per model
+    """
+    title = ""
+    with open(inputfile) as file_object:
+        line = next(file_object, "")
+        while line:
+            if line.startswith("data_"):
+                title = line[5:].strip()
+            if not line.startswith("loop_"):
+                line = next(file_object, "")
+                continue
+
+            # Read the loop header, stopping at the first value line
+            fields: List[str] = []
+            line = next(file_object, "")
+            while line.startswith("_"):
+                fields.append(line.strip())
+                line = next(file_object, "")
+            if not fields or not fields[0].startswith("_atom_site."):
+                continue
+
+            column = {name[len("_atom_site.") :]: i for i, name in enumerate(fields)}
+            if not {"Cartn_x", "Cartn_y", "Cartn_z"} <= column.keys():
+                raise ValueError("mmCIF _atom_site loop has no coordinates")
+            x_col, y_col, z_col = (
+                column["Cartn_x"],
+                column["Cartn_y"],
+                column["Cartn_z"],
             )
+            symbol_col = column.get("type_symbol", column.get("label_atom_id"))
+            if symbol_col is None:
+                raise ValueError("mmCIF _atom_site loop has no element column")
+            alt_col = column.get("label_alt_id")
+            model_col = column.get("pdbx_PDB_model_num")
+
+            # Read rows up to the next category, loop or data block
+            model = None
+            coords = array("d")
+            elements = bytearray()
+            values: List[str] = []
+            while line and not line.startswith(("_", "loop_", "data_", "#")):
+                values.extend(_cif_tokens(line))
+                line = next(file_object, "")
+                if len(values) < len(fields):
+                    continue  # a row may be wrapped over several lines
+                row, values = values[: len(fields)], values[len(fields) :]
+
+                if alt_col is not None and row[alt_col] not in ".?A1":
+                    continue
+                if model_col is not None and row[model_col] != model:
+                    if elements:
+                        yield _unbonded_molecule(coords, elements, title)
+                        coords = array("d")
+                        elements = bytearray()
+                    model = row[model_col]
+                coords.extend((float(row[x_col]), float(row[y_col]), float(row[z_col])))
+                elements.append(element_code(row[symbol_col]))
+
+            if elements:
+                yield _unbonded_molecule(coords, elements, title)
+
+
+def perceive_bonds(
+    coords: "NDArray", elements: "NDArray", tolerance: float = BOND_TOLERANCE
+) -> "NDArray":
+    """Find bonded atom pairs from coordinates and covalent radii.
+
+    Atoms are binned into a cell list with cells as wide as the longest
+    possible bond, so each atom only needs to be compared with atoms in its own
+    cell and the 13 forward neighbor cells. Work is O(N) and vectorized over
+    chunks of atoms.
+
+    Args:
+        coords (numpy.ndarray): atom coordinates, shape (N, 3)
+        elements (numpy.ndarray): element codes, shape (N,)
+        tolerance (float): slack in angstroms added to summed covalent radii
+
+    Returns:
+        numpy.ndarray: int32 zero-based bonded pairs (i < j), shape (M, 2)
+    """
+    n_atoms = len(coords)
+    if n_atoms < 2:
+        return numpy.empty((0, 2), dtype=numpy.int32)
+
+    radii = COVALENT_RADII[elements]
+    cell_size = 2 * radii.max() + tolerance
+
+    # Bin atoms into cells and sort them so each cell is a contiguous run
+    cells = numpy.floor((coords - coords.min(axis=0)) / cell_size).astype(numpy.int64)
+    shape = tuple(cells.max(axis=0) + 1)
+    keys = numpy.ravel_multi_index(cells.T, shape)
+    order = numpy.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_cells = cells[order]
+    sorted_coords = coords[order]
+    sorted_radii = radii[order]
+
+    # Own cell plus the 13 neighbors that come after it, so each pair of
+    # cells is visited once
+    offsets = [
+        (dx, dy, dz)
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+        if (dx, dy, dz) >= (0, 0, 0)
+    ]
+
+    found = []
+    for start in range(0, n_atoms, PERCEIVE_CHUNK):
+        stop = min(start + PERCEIVE_CHUNK, n_atoms)
+        atom_index = numpy.arange(start, stop)
+        for offset in offsets:
+            neighbor = sorted_cells[start:stop] + offset
+            inside = ((neighbor >= 0) & (neighbor < shape)).all(axis=1)
+            neighbor_keys = numpy.ravel_multi_index(neighbor.T, shape, mode="clip")
+            first = numpy.searchsorted(sorted_keys, neighbor_keys, side="left")
+            last = numpy.searchsorted(sorted_keys, neighbor_keys, side="right")
+            if offset == (0, 0, 0):
+                first = atom_index + 1  # only later atoms in the same cell
+            counts = numpy.where(inside, numpy.maximum(last - first, 0), 0)
+
+            # Expand each atom's candidate range into explicit (i, j) pairs
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            i = numpy.repeat(atom_index, counts)
+            j = numpy.repeat(first - numpy.cumsum(counts) + counts, counts)
+            j += numpy.arange(total)
+
+            distance2 = ((sorted_coords[i] - sorted_coords[j]) ** 2).sum(axis=1)
+            cutoff = sorted_radii[i] + sorted_radii[j] + tolerance
+            bonded = (distance2 <= cutoff**2) & (distance2 >= MIN_BOND_LENGTH**2)
+            found.append(numpy.stack([order[i[bonded]], order[j[bonded]]], axis=1))
+
+    if not found:
+        return numpy.empty((0, 2), dtype=numpy.int32)
+    bonds = numpy.sort(numpy.concatenate(found), axis=1)
+    bonds = bonds[numpy.lexsort((bonds[:, 1], bonds[:, 0]))]
+    return bonds.astype(numpy.int32)
+
+
+@overload
+def format_output(molecule: Molecule, options: Optional[EmitOptions] = None) -> str: ...
+
+
+# Deprecated 1.0 call: format_output(atoms_list, bonds_list)
+@overload
+def format_output(molecule: List[List[str]], options: List[List[str]]) -> str: ...
+
+
+def format_output(
+    molecule: Union[Molecule, List[List[str]]],
+    options: Union[EmitOptions, List[List[str]], None] = None,
+) -> str:
+    # The 1.0 call passed atom and bond rows from make_atoms_and_bonds_lists
+    if not isinstance(molecule, Molecule):
+        warnings.warn(
+            "format_output(atoms_list, bonds_list) is deprecated; "
+            "pass a Molecule from parse_molfile",
+            DeprecationWarning,
+            2,
         )
+        bonds_list = options if isinstance(options, list) else []
+        return format_output(_molecule_from_rows(molecule, bonds_list))
+    if isinstance(options, list):
+        raise TypeError("format_output options must be EmitOptions")
+
+    # Collect a complete scad file for one molecule as a string
+    buffer = io.StringIO()
+    write_header(buffer, options)
+    write_body(buffer, molecule, options)
+    write_footer(buffer, options)
+
+    return buffer.getvalue()
+
+
+def format_body(molecule: Molecule, options: Optional[EmitOptions] = None) -> str:
+    # Collect one molecule's atoms and bonds as a string
+    buffer = io.StringIO()
+    write_body(buffer, molecule, options)
+
+    return buffer.getvalue()
+
+
+def write_header(
+    f: IO[str], options: Optional[EmitOptions] = None, segments: int = SEGMENTS
+) -> None:
+    # Write module definitions and $fn, opening the union in modules mode
+    options = options or EmitOptions()
+    if options.mode == "loop":
+        f.write(COMMON_MODULES + LOOP_MODULES + f"$fn = {segments};\n\n")
+    else:
+        f.write(COMMON_MODULES + f"$fn = {segments};\n\nunion()\n{{\n")
+
 
-    output_one = "".join(output_atoms)
+def write_footer(
+    f: IO[str], options: Optional[EmitOptions] = None, count: int = 1
+) -> None:
+    # Close the union; in loop mode, it instantiates every stored molecule
+    options = options or EmitOptions()
+    if options.mode == "loop":
+        f.write("union()\n{\n")
+        for index in range(1, count + 1):
+            f.write(f"molecule(atoms_{index}, bonds_{index});\n")
+    f.write("""}""")
+
+
+def write_body(
+    f: IO[str],
+    molecule: Molecule,
+    options: Optional[EmitOptions] = None,
+    index: int = 1,
+) -> None:
+    """Write one molecule's atoms and bonds to an open scad file.
+
+    Statements are formatted in bulk: each chunk of rows is rendered by a
+    single %-format over a repeated template, then written to the stream.
+
+    Args:
+        f (IO[str]): open scad file
+        molecule (Molecule): molecule to write
+        options (EmitOptions, optional): output settings
+        index (int): position of the molecule in the file, naming its arrays
+            in loop mode
+    """
+    options = options or EmitOptions()
+    radii = options.atom_radii(molecule)
+    if options.mode == "loop":
+        _write_arrays(f, molecule, radii, options, index)
+        return
+
+    coord = f"%.{options.precision}f"
+
+    #  Atoms output
+    atom_template = f"atom(%g, {coord}, {coord}, {coord}); // %d \n"
+    for start in range(0, molecule.n_atoms, EMIT_CHUNK):
+        stop = min(start + EMIT_CHUNK, molecule.n_atoms)
+        x, y, z = molecule.coords[start:stop].T.tolist()
+        rows = zip(radii[start:stop].tolist(), x, y, z, range(start + 1, stop + 1))
+        f.write((atom_template * (stop - start)) % tuple(chain.from_iterable(rows)))
 
     # Bonds output
+    bond_template = "bond( {0}); // %d - %d \n".format(", ".join([coord] * 6))
+    for start in range(0, molecule.n_bonds, EMIT_CHUNK):
+        stop = min(start + EMIT_CHUNK, molecule.n_bonds)
+        bonds = molecule.bonds[start:stop]
+        columns = numpy.hstack(
+            [molecule.coords[bonds[:, 0]], molecule.coords[bonds[:, 1]]]
+        ).T.tolist()
+        first, second = (bonds + 1).T.tolist()
+        rows = zip(*columns, first, second)
+        f.write((bond_template * (stop - start)) % tuple(chain.from_iterable(rows)))
+
+
+def _write_arrays(
+    f: IO[str], molecule: Molecule, radii: "NDArray", options: EmitOptions, index: int
+) -> None:
+    # Write atoms and bonds as OpenSCAD vector literals for loop mode
+    coord = f"%.{options.precision}f"
+
+    f.write(f"atoms_{index} = [")
+    atom_template = f",\n[%g,{coord},{coord},{coord}]"
+    for start in range(0, molecule.n_atoms, EMIT_CHUNK):
+        stop = min(start + EMIT_CHUNK, molecule.n_atoms)
+        x, y, z = molecule.coords[start:stop].T.tolist()
+        rows = zip(radii[start:stop].tolist(), x, y, z)
+        text = (atom_template * (stop - start)) % tuple(chain.from_iterable(rows))
+        f.write(text[1:] if start == 0 else text)  # no comma before the first
+    f.write("\n];\n")
+
+    f.write(f"bonds_{index} = [")
+    for start in range(0, molecule.n_bonds, EMIT_CHUNK):
+        stop = min(start + EMIT_CHUNK, molecule.n_bonds)
+        text = (",\n[%d,%d]" * (stop - start)) % tuple(
+            molecule.bonds[start:stop].ravel().tolist()
+        )
+        f.write(text[1:] if start == 0 else text)
+    f.write("\n];\n")
+
+
+def _orient_outward(triangles: "NDArray") -> "NDArray":
+    # Flip triangles of a convex, origin-centered mesh to wind counterclockwise
+    normals = numpy.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    inward = numpy.einsum("ij,ij->i", normals, triangles.mean(axis=1)) < 0
+    triangles[inward] = triangles[inward][:, ::-1]
+    return triangles
+
+
+def _polygon_fan(ring: "NDArray") -> List["NDArray"]:
+    # Triangulate a convex polygon cap
+    return [
+        numpy.array([ring[0], ring[j], ring[j + 1]]) for j in range(1, len(ring) - 1)
+    ]
 
-    output_bonds = []
-
-    for row in bonds_list:
-        part_one = atoms_list[int(row[0]) - 1]
-        part_two = atoms_list[int(row[1]) - 1]
-        output_bonds.append(
-            "bond( {0}, {1}, {2}, {3}, {4}, {5}); // {6} - {7} \n".format(
-                part_one[0],
-                part_one[1],
-                part_one[2],
-                part_two[0],
-                part_two[1],
-                part_two[2],
-                str(int(row[0])),
-                str(int(row[1])),
+
+@lru_cache(maxsize=None)
+def unit_sphere(segments: int = SEGMENTS) -> "NDArray":
+    """Triangles of a unit sphere tessellated like OpenSCAD's sphere($fn).
+
+    Args:
+        segments (int): points per ring, as OpenSCAD's $fn
+
+    Returns:
+        numpy.ndarray: triangle vertices, shape (T, 3, 3)
+    """
+    rings = (segments + 1) // 2
+    phi = numpy.pi * (numpy.arange(rings) + 0.5) / rings
+    theta = 2 * numpy.pi * numpy.arange(segments) / segments
+    points = numpy.stack(
+        [
+            numpy.outer(numpy.sin(phi), numpy.cos(theta)),
+            numpy.outer(numpy.sin(phi), numpy.sin(theta)),
+            numpy.outer(numpy.cos(phi), numpy.ones(segments)),
+        ],
+        axis=-1,
+    )
+
+    triangles = _polygon_fan(points[0]) + _polygon_fan(points[-1])
+    for i in range(rings - 1):
+        for j in range(segments):
+            k = (j + 1) % segments
+            triangles.append(
+                numpy.array([points[i, j], points[i + 1, j], points[i, k]])
+            )
+            triangles.append(
+                numpy.array([points[i, k], points[i + 1, j], points[i + 1, k]])
             )
+    return _orient_outward(numpy.array(triangles))
+
+
+@lru_cache(maxsize=None)
+def unit_cylinder(segments: int = SEGMENTS) -> "NDArray":
+    """Triangles of a radius 1, height 1 cylinder centered on the origin along z.
+
+    Args:
+        segments (int): points per circle, as OpenSCAD's $fn
+
+    Returns:
+        numpy.ndarray: triangle vertices, shape (T, 3, 3)
+    """
+    theta = 2 * numpy.pi * numpy.arange(segments) / segments
+    bottom = numpy.stack(
+        [numpy.cos(theta), numpy.sin(theta), numpy.full(segments, -0.5)], axis=-1
+    )
+    top = bottom + [0.0, 0.0, 1.0]
+
+    triangles = _polygon_fan(bottom) + _polygon_fan(top)
+    for j in range(segments):
+        k = (j + 1) % segments
+        triangles.append(numpy.array([bottom[j], top[j], bottom[k]]))
+        triangles.append(numpy.array([bottom[k], top[j], top[k]]))
+    return _orient_outward(numpy.array(triangles))
+
+
+def _write_triangles(f: BinaryIO, triangles: "NDArray") -> None:
+    # Write (N, 3, 3) triangle vertices as binary STL records
+    normals = numpy.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    lengths = numpy.linalg.norm(normals, axis=1, keepdims=True)
+    records = numpy.zeros(len(triangles), dtype=STL_DTYPE)
+    records["normal"] = numpy.divide(
+        normals, lengths, out=numpy.zeros_like(normals), where=lengths > 0
+    )
+    records["vertices"] = triangles
+    f.write(records.tobytes())
+
+
+def sphere_triangles(segments: int) -> int:
+    """Number of triangles in a sphere tessellated with segments."""
+    return 2 * segments * ((segments + 1) // 2 - 1) + 2 * (segments - 2)
+
+
+def cylinder_triangles(segments: int) -> int:
+    """Number of triangles in a cylinder tessellated with segments."""
+    return 4 * segments - 4
+
+
+def write_stl_body(
+    f: BinaryIO, molecule: Molecule, options: Optional[EmitOptions] = None
+) -> int:
+    """Write one molecule's atoms and bonds to an open binary STL file.
+
+    Spheres and cylinders are instanced from cached unit meshes by scaling,
+    rotation and translation in vectorized chunks. The shapes are written as
+    separate, overlapping shells; slicers union them when printing.
+
+    Args:
+        f (BinaryIO): open stl file, positioned after the header
+        molecule (Molecule): molecule to write
+        options (EmitOptions, optional): output settings
+
+    Returns:
+        int: number of triangles written
+    """
+    options = options or EmitOptions()
+    segments = options.resolve_segments(molecule)
+    sphere = unit_sphere(segments)
+    cylinder = unit_cylinder(segments)
+    radii = options.atom_radii(molecule)
+
+    # Atoms: scale and translate the unit sphere
+    for start in range(0, molecule.n_atoms, STL_CHUNK):
+        stop = min(start + STL_CHUNK, molecule.n_atoms)
+        triangles = (
+            sphere[None] * radii[start:stop, None, None, None]
+            + molecule.coords[start:stop, None, None, :]
         )
+        _write_triangles(f, triangles.reshape(-1, 3, 3))
 
-    output_two = "".join(output_bonds)
+    # Bonds: scale the unit cylinder to (r, r, length), then rotate its z axis
+    # onto the bond and translate it to the bond midpoint
+    for start in range(0, molecule.n_bonds, STL_CHUNK):
+        stop = min(start + STL_CHUNK, molecule.n_bonds)
+        ends = molecule.coords[molecule.bonds[start:stop]]
+        axis = ends[:, 0] - ends[:, 1]
+        length = numpy.linalg.norm(axis, axis=1)
+        direction = numpy.divide(
+            axis,
+            length[:, None],
+            out=numpy.tile([0.0, 0.0, 1.0], (len(axis), 1)),
+            where=length[:, None] > 0,
+        )
+        helper = numpy.where(
+            (numpy.abs(direction[:, 2]) < 0.9)[:, None],
+            [0.0, 0.0, 1.0],
+            [1.0, 0.0, 0.0],
+        )
+        u = numpy.cross(helper, direction)
+        u /= numpy.linalg.norm(u, axis=1, keepdims=True)
+        v = numpy.cross(direction, u)
+        rotation = numpy.stack([u, v, direction], axis=-1)  # columns map x, y, z
 
-    output = COMMON_START + output_one + output_two + """}"""
+        scale = numpy.stack(
+            [
+                numpy.full_like(length, BOND_RADIUS),
+                numpy.full_like(length, BOND_RADIUS),
+                length,
+            ],
+            axis=-1,
+        )
+        local = cylinder[None] * scale[:, None, None, :]
+        triangles = (
+            numpy.einsum("nij,ntkj->ntki", rotation, local)
+            + ends.mean(axis=1)[:, None, None, :]
+        )
+        _write_triangles(f, triangles.reshape(-1, 3, 3))
 
-    return output
+    return molecule.n_atoms * len(sphere) + molecule.n_bonds * len(cylinder)
 
 
 def write_file(output: str, outputfile: str) -> None:
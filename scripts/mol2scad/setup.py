@@ -1,10 +1,10 @@
-"""Setup module for mol2scad.
-"""
+"""Setup module for mol2scad."""
 
 # Always prefer setuptools over distutils
-from setuptools import setup
 from pathlib import Path
 
+from setuptools import setup
+
 here = Path(__file__).parent.resolve()
 
 # Get the long description from the README file
@@ -24,7 +24,6 @@ setup(
     py_modules=["mol2scad"],
     classifiers=[
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -33,6 +32,9 @@ setup(
         "Operating System :: OS Independent",
     ],
     keywords="chemistry, buffer, biochemistry",
-    python_requires=">=3.6",
-    entry_points={"console_scripts": ["mol2scad = mol2scad:main"],},
+    python_requires=">=3.7",
+    install_requires=["numpy"],
+    entry_points={
+        "console_scripts": ["mol2scad = mol2scad:main"],
+    },
 )
@@ -0,0 +1,258 @@
+"""Tests for mol2scad."""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy
+import pytest
+from mol2scad import (
+    EmitOptions,
+    batch_outputs,
+    convert_batch,
+    format_output,
+    iter_cached_molecules,
+    iter_molecules,
+    main,
+    make_atoms_and_bonds_lists,
+    parse_counts_line,
+    parse_molfile,
+    process_lines,
+    read_molfile,
+)
+
+XYZ = "2\nwater fragment\nO 0.0 0.0 0.0\nH 0.96 0.0 0.0\n"
+
+# One water molecule per format; the pdb and mmcif copies give the second
+# hydrogen an alternate location, which the readers skip
+WATER_XYZ = """3
+water
+O 0.000 0.000 0.117
+H 0.757 0.000 -0.469
+H -0.757 0.000 -0.469
+3
+water again
+O 0.000 0.000 0.117
+H 0.757 0.000 -0.469
+H -0.757 0.000 -0.469
+"""
+WATER_PDB = """\
+HEADER    WATER
+HETATM    1 O    HOH A   1       0.000   0.000   0.117  1.00  0.00           O
+HETATM    2 H1   HOH A   1       0.757   0.000  -0.469  1.00  0.00           H
+HETATM    3 H2  AHOH A   1      -0.757   0.000  -0.469  0.50  0.00           H
+HETATM    4 H2  BHOH A   1      -0.700   0.100  -0.400  0.50  0.00           H
+END
+"""
+WATER_CIF = """\
+data_water
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.pdbx_PDB_model_num
+HETATM 1 O O . 0.000 0.000 0.117 1
+HETATM 2 H H1 . 0.757 0.000 -0.469 1
+HETATM 3 H 'H2' A -0.757 0.000 -0.469 1
+HETATM 4 H 'H2' B -0.700 0.100 -0.400 1
+#
+"""
+
+
+def chain_coords(n_atoms: int) -> numpy.ndarray:
+    """Coordinates of a zig-zag chain wide enough to fill the 10-column fields."""
+    index = numpy.arange(n_atoms)
+    return numpy.stack(
+        [
+            -1000.0 - 1.25 * index,
+            -2000.0 - 0.8 * (index % 2),
+            numpy.full(n_atoms, -3e3),
+        ],
+        axis=1,
+    )
+
+
+def chain_molfile(n_atoms: int, whitespace: bool = False, newline: str = "\n") -> str:
+    """Write a carbon chain as a V2000 molfile.
+
+    Fixed-column files let coordinates and 3-digit counts run together, as the
+    spec allows; whitespace-separated files are how wider counts get written.
+    """
+    lines = [f"chain{n_atoms}", "  mol2scad-test", ""]
+    if whitespace:
+        lines.append(f"{n_atoms} {n_atoms - 1} 0 0 0 0 0 0 0 0999 V2000")
+        atom, bond = "{:.4f} {:.4f} {:.4f} C 0 0 0", "{} {} 1 0"
+    else:
+        lines.append(f"{n_atoms:>3}{n_atoms - 1:>3}  0  0  0  0  0  0  0  0999 V2000")
+        atom = "{:10.4f}{:10.4f}{:10.4f} C   0  0  0  0  0  0  0  0  0  0  0  0"
+        bond = "{:>3}{:>3}  1  0  0  0  0"
+    lines += [atom.format(*row) for row in chain_coords(n_atoms).tolist()]
+    lines += [bond.format(i, i + 1) for i in range(1, n_atoms)]
+    lines.append("M  END")
+    return newline.join(lines) + newline
+
+
+def test_counts_line_fixed_columns_may_run_together() -> None:
+    assert parse_counts_line("120118  0  0  0  0  0  0  0  0999 V2000") == (
+        120,
+        118,
+        True,
+    )
+    assert parse_counts_line("1200 1199 0 0 0 0 0 0 0 0999 V2000") == (
+        1200,
+        1199,
+        False,
+    )
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize(
+    "n_atoms, whitespace", [(5, False), (999, False), (1200, True), (5, True)]
+)
+def test_molfile_parsers_read_every_atom_and_bond(
+    tmp_path: Path, n_atoms: int, whitespace: bool, newline: str
+) -> None:
+    text = chain_molfile(n_atoms, whitespace, newline)
+    path = tmp_path / "chain.mol"
+    path.write_bytes(text.encode())
+
+    # Small records are parsed by line, large ones from the memory map
+    (from_file,) = read_molfile(str(path))
+    from_lines = parse_molfile(text.splitlines(keepends=True))
+
+    for molecule in (from_file, from_lines):
+        assert molecule.title == f"chain{n_atoms}"
+        assert (molecule.n_atoms, molecule.n_bonds) == (n_atoms, n_atoms - 1)
+        numpy.testing.assert_allclose(molecule.coords, chain_coords(n_atoms))
+        assert set(molecule.symbols()) == {"C"}
+        numpy.testing.assert_array_equal(
+            molecule.bonds,
+            numpy.stack([numpy.arange(n_atoms - 1)] * 2, axis=1) + [0, 1],
+        )
+
+
+@pytest.mark.parametrize(
+    "name, text, frames",
+    [
+        ("water.xyz", WATER_XYZ, 2),
+        ("water.pdb", WATER_PDB, 1),
+        ("water.cif", WATER_CIF, 1),
+    ],
+)
+def test_readers_count_atoms_and_bonds(
+    tmp_path: Path, name: str, text: str, frames: int
+) -> None:
+    path = tmp_path / name
+    path.write_text(text)
+
+    # None of these formats list bonds, so the two O-H bonds are perceived
+    molecules = list(iter_molecules(str(path), EmitOptions(cache_dir=None)))
+
+    assert [(molecule.n_atoms, molecule.n_bonds) for molecule in molecules] == [
+        (3, 2)
+    ] * frames
+    assert all(molecule.symbols() == ["O", "H", "H"] for molecule in molecules)
+    numpy.testing.assert_array_equal(molecules[0].bonds, [[0, 1], [0, 2]])
+
+
+def test_deprecated_1_0_api_matches_parse_molfile(tmp_path: Path) -> None:
+    # The 1.0 API split lines on whitespace, so its fields must not run together
+    text = chain_molfile(5, whitespace=True)
+    path = tmp_path / "chain.mol"
+    path.write_text(text)
+
+    with pytest.deprecated_call():
+        lines = process_lines(str(path))
+        atoms_list, bonds_list = make_atoms_and_bonds_lists(lines)
+        output = format_output(atoms_list, bonds_list)
+
+    assert [row[3] for row in atoms_list] == ["C"] * 5
+    assert [row[:2] for row in bonds_list] == [
+        ["1", "2"],
+        ["2", "3"],
+        ["3", "4"],
+        ["4", "5"],
+    ]
+    assert output == format_output(parse_molfile(text.splitlines()))
+
+
+def test_batch_outputs_named_by_stem() -> None:
+    outputs = batch_outputs(["a/x.mol", "a/y.sdf"], Path("out"), ".scad")
+    assert outputs == [str(Path("out", "x.scad")), str(Path("out", "y.scad"))]
+
+
+def test_batch_outputs_unique_for_shared_stems() -> None:
+    inputs = ["a/x.mol", "b/x.mol", "b/x.xyz", "b/y.mol"]
+    outputs = batch_outputs(inputs, Path("out"), ".scad")
+    assert [Path(output).name for output in outputs] == [
+        "a_x.mol.scad",
+        "b_x.mol.scad",
+        "b_x.xyz.scad",
+        "y.scad",
+    ]
+
+
+def test_batch_outputs_rejects_one_file_given_twice(tmp_path: Path) -> None:
+    inputs = [str(tmp_path / "x.xyz"), f"{tmp_path}/./x.xyz"]
+    with pytest.raises(ValueError, match="same output"):
+        batch_outputs(inputs, tmp_path, ".scad")
+
+
+def test_convert_batch_writes_every_input(tmp_path: Path) -> None:
+    inputs = []
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        path = tmp_path / directory / "x.xyz"
+        path.write_text(XYZ)
+        inputs.append(str(path))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    jobs = list(zip(inputs, batch_outputs(inputs, output_dir, ".scad")))
+
+    results = convert_batch(jobs, workers=2, options=EmitOptions(cache_dir=None))
+
+    assert all(result.ok for result in results)
+    assert sorted(path.name for path in output_dir.iterdir()) == [
+        "a_x.xyz.scad",
+        "b_x.xyz.scad",
+    ]
+
+
+def test_cache_hit_survives_failed_utime(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "x.xyz"
+    path.write_text(XYZ)
+    options = EmitOptions(cache_dir=str(tmp_path / "cache"))
+    first = list(iter_cached_molecules(str(path), options, str(tmp_path / "cache")))
+
+    def read_only(*args: object) -> None:
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(os, "utime", read_only)
+    again = list(iter_cached_molecules(str(path), options, str(tmp_path / "cache")))
+    assert [len(molecule.coords) for molecule in again] == [
+        len(molecule.coords) for molecule in first
+    ]
+
+
+def test_no_cache_overrides_environment(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "x.xyz"
+    path.write_text(XYZ)
+    output = tmp_path / "x.scad"
+    monkeypatch.setenv("MOL2SCAD_CACHE", str(tmp_path / "cache"))
+    argv = ["mol2scad", "-i", str(path), "-o", str(output), "--no-cache"]
+    monkeypatch.setattr(sys, "argv", argv)
+
+    main()
+
+    assert output.exists()
+    assert not (tmp_path / "cache").exists()